@@ -0,0 +1,286 @@
+"""
+Bulk Catalog Ingestion
+Imports a supplier catalog of saved product pages (a directory, or a .zip/.tar archive)
+into bean_profiles in one run
+
+Pages are parsed in a process pool with SweetMariasParser, normalized with the same
+dropdown mapping as the parse-HTML endpoint, deduped by content hash and bulk-inserted.
+Re-importing the same catalog is safe: (user_id, source_content_hash) is unique.
+
+Usage:
+    cd backend
+    python -m OLD_vendor_parsers.bulk_ingest path/to/catalog.zip --user-id <uuid> [--workers 4] [--dry-run]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import tarfile
+import zipfile
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
+
+from .sweet_marias.sweet_marias_parser import create_parser
+from .profile_mapping import build_sweet_marias_profile
+
+logger = logging.getLogger(__name__)
+
+PAGE_EXTENSIONS = ('.html', '.htm')
+INSERT_BATCH_SIZE = 100
+
+# Pages submitted to the pool ahead of completed ones (per worker) - bounds memory on big archives
+IN_FLIGHT_PER_WORKER = 4
+
+# Columns a parsed profile may fill (mirrors POST /bean-profiles)
+BEAN_PROFILE_COLUMNS = (
+    'name', 'origin', 'bean_type', 'espresso_suitable', 'notes', 'supplier_url', 'supplier_name',
+    'moisture_content_pct', 'density_g_ml', 'process_method', 'recommended_roast_levels',
+    'screen_size', 'variety', 'altitude_m', 'body_intensity', 'harvest_year', 'acidity_intensity',
+    'flavor_notes', 'cupping_score', 'fragrance_score', 'floral_intensity', 'honey_intensity',
+    'sugars_intensity', 'caramel_intensity', 'fruits_intensity', 'citrus_intensity', 'berry_intensity',
+    'cocoa_intensity', 'nuts_intensity', 'rustic_intensity', 'spice_intensity', 'roasting_notes'
+)
+
+
+@dataclass
+class PageResult:
+    """Outcome of parsing one catalog page"""
+    name: str
+    content_hash: str
+    elapsed_ms: float
+    profile: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestReport:
+    """Summary of a catalog import"""
+    source: str
+    total_pages: int = 0
+    parsed: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    inserted: int = 0
+    already_imported: int = 0
+    elapsed_seconds: float = 0.0
+    page_timings_ms: Dict[str, float] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        timings = sorted(self.page_timings_ms.values())
+        summary = asdict(self)
+        summary['avg_page_ms'] = round(sum(timings) / len(timings), 1) if timings else 0.0
+        summary['p95_page_ms'] = round(timings[int(len(timings) * 0.95) - 1], 1) if timings else 0.0
+        return summary
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@contextlib.contextmanager
+def open_catalog(source: str) -> Iterator[Tuple[List[str], Callable[[str], bytes]]]:
+    """
+    Open a directory or archive of saved pages.
+
+    Yields (page names, read function); names are listed up front so progress has a total.
+    """
+    is_page = lambda name: name.lower().endswith(PAGE_EXTENSIONS)
+
+    if os.path.isdir(source):
+        names = sorted(
+            os.path.relpath(os.path.join(root, filename), source)
+            for root, _, filenames in os.walk(source)
+            for filename in filenames if is_page(filename)
+        )
+
+        def read(name: str) -> bytes:
+            with open(os.path.join(source, name), 'rb') as f:
+                return f.read()
+
+        yield names, read
+
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = [info.filename for info in archive.infolist() if not info.is_dir() and is_page(info.filename)]
+            yield names, archive.read
+
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source, 'r:*') as archive:
+            members = {member.name: member for member in archive.getmembers() if member.isfile() and is_page(member.name)}
+
+            def read_member(name: str) -> bytes:
+                extracted = archive.extractfile(members[name])
+                if extracted is None:
+                    raise ValueError(f"{name} is not a regular file in {source}")
+                return extracted.read()
+
+            yield list(members), read_member
+
+    else:
+        raise ValueError(f"{source} is not a directory, .zip or .tar archive")
+
+
+def parse_page(name: str, data: bytes, page_hash: str) -> PageResult:
+    """Parse one saved page into a bean profile (runs in a worker process)"""
+    start = time.perf_counter()
+    try:
+        html_content = data.decode('utf-8', errors='replace')
+        # The parser prints debug output per page - keep worker stdout quiet
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser = create_parser()
+            raw_data = parser.parse_html(html_content)
+            ai_data = parser.get_ai_optimized_data()
+
+        if not raw_data.get('name'):
+            raise ValueError("No product name found - not a product page")
+
+        profile = build_sweet_marias_profile(raw_data, ai_data, html_content)
+        profile['espresso_suitable'] = raw_data.get('espresso_suitable')
+        return PageResult(name, page_hash, (time.perf_counter() - start) * 1000, profile=profile)
+    except Exception as e:
+        return PageResult(name, page_hash, (time.perf_counter() - start) * 1000, error=str(e))
+
+
+def to_bean_profile_row(profile: Dict[str, Any], user_id: str, page_hash: str) -> Dict[str, Any]:
+    row = {column: profile[column] for column in BEAN_PROFILE_COLUMNS if profile.get(column) is not None}
+    row['user_id'] = user_id
+    row['source_content_hash'] = page_hash
+    return row
+
+
+def insert_bean_profiles(rows: List[Dict[str, Any]]) -> int:
+    """
+    Bulk-insert profile rows, skipping pages this user already imported.
+
+    Returns the number of rows actually inserted.
+    """
+    from utils.database import get_supabase
+
+    sb = get_supabase()
+    inserted = 0
+
+    # PostgREST bulk inserts need every object in a request to have the same keys
+    groups: Dict[frozenset, List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(frozenset(row), []).append(row)
+
+    for group in groups.values():
+        for start in range(0, len(group), INSERT_BATCH_SIZE):
+            result = sb.table("bean_profiles").upsert(
+                group[start:start + INSERT_BATCH_SIZE],
+                on_conflict="user_id,source_content_hash",
+                ignore_duplicates=True
+            ).execute()
+            inserted += len(result.data or [])
+    return inserted
+
+
+def ingest_catalog(
+    source: str,
+    user_id: str,
+    workers: Optional[int] = None,
+    dry_run: bool = False,
+    on_progress: Optional[Callable[[int, int, PageResult], None]] = None
+) -> IngestReport:
+    """
+    Parse every page in a catalog and insert the resulting bean profiles.
+
+    Args:
+        source: Directory or .zip/.tar(.gz) archive of saved product pages
+        user_id: Owner of the imported bean profiles
+        workers: Parser processes (defaults to the CPU count)
+        dry_run: Parse and report without inserting anything
+        on_progress: Called with (pages done, total pages, PageResult) as each page finishes
+    """
+    start = time.perf_counter()
+    report = IngestReport(source=source)
+    workers = workers or os.cpu_count() or 1
+    pending_rows: List[Dict[str, Any]] = []
+    seen_hashes = set()
+    done = 0
+
+    def flush():
+        if pending_rows and not dry_run:
+            inserted = insert_bean_profiles(pending_rows)
+            report.inserted += inserted
+            report.already_imported += len(pending_rows) - inserted
+        pending_rows.clear()
+
+    def collect(result: PageResult):
+        nonlocal done
+        done += 1
+        report.page_timings_ms[result.name] = round(result.elapsed_ms, 1)
+        if result.profile is None:
+            report.failed += 1
+            report.errors[result.name] = result.error or "No profile parsed"
+            logger.warning(f"Failed to parse {result.name}: {result.error}")
+        else:
+            report.parsed += 1
+            pending_rows.append(to_bean_profile_row(result.profile, user_id, result.content_hash))
+            if len(pending_rows) >= INSERT_BATCH_SIZE:
+                flush()
+        if on_progress:
+            on_progress(done, report.total_pages, result)
+
+    with open_catalog(source) as (names, read):
+        report.total_pages = len(names)
+        in_flight = set()
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for name in names:
+                data = read(name)
+                page_hash = content_hash(data)
+                if page_hash in seen_hashes:
+                    # Same page saved twice - don't parse it again
+                    report.duplicates += 1
+                    done += 1
+                    continue
+                seen_hashes.add(page_hash)
+
+                in_flight.add(executor.submit(parse_page, name, data, page_hash))
+                if len(in_flight) >= workers * IN_FLIGHT_PER_WORKER:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        collect(future.result())
+
+            for future in wait(in_flight).done:
+                collect(future.result())
+
+    flush()
+    report.elapsed_seconds = round(time.perf_counter() - start, 2)
+    logger.info(
+        f"Ingested {source}: {report.parsed} parsed, {report.inserted} inserted, "
+        f"{report.duplicates} duplicates, {report.failed} failed in {report.elapsed_seconds}s"
+    )
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk-import saved supplier pages into bean_profiles")
+    parser.add_argument('source', help="Directory or .zip/.tar archive of saved product pages")
+    parser.add_argument('--user-id', required=True, help="Owner of the imported bean profiles")
+    parser.add_argument('--workers', type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument('--dry-run', action='store_true', help="Parse and report without inserting")
+    args = parser.parse_args(argv)
+
+    def progress(done: int, total: int, result: PageResult):
+        status = result.profile.get('name', '') if result.profile is not None else f"ERROR {result.error}"
+        print(f"[{done}/{total}] {result.name} {result.elapsed_ms:.1f} ms - {status}")
+
+    report = ingest_catalog(args.source, args.user_id, args.workers, args.dry_run, progress)
+    summary = report.to_dict()
+    summary.pop('page_timings_ms')
+    print(json.dumps(summary, indent=2))
+    return 0 if not report.failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
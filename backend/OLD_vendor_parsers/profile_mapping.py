@@ -0,0 +1,174 @@
+"""
+Bean Profile Mapping
+Normalizes parsed supplier data (origin, variety, process, roast levels, bean type)
+into the values used by the bean profile dropdowns
+"""
+
+import re
+from typing import Dict, Any, List
+
+# Dropdown values - anything else maps to 'Other'
+DROPDOWN_ORIGINS = [
+    'Ethiopia', 'Colombia', 'Guatemala', 'Costa Rica', 'Kenya', 'Brazil', 'Peru', 'Honduras', 'Nicaragua',
+    'El Salvador', 'Panama', 'Mexico', 'Rwanda', 'Burundi', 'Tanzania', 'Uganda', 'Yemen', 'Indonesia'
+]
+DROPDOWN_PROCESSES = ['Washed', 'Natural', 'Honey', 'Semi-Washed', 'Anaerobic', 'Carbonic Maceration']
+
+# (keywords, dropdown value) - first rule with a keyword in the text wins
+ORIGIN_RULES = [
+    (('Sumatra', 'Kerinci', 'Gunung'), 'Indonesia'),
+    (('Ethiopia',), 'Ethiopia'),
+    (('Colombia',), 'Colombia'),
+    (('Guatemala',), 'Guatemala'),
+    (('Costa Rica',), 'Costa Rica'),
+    (('Kenya', 'Nyeri', 'Karima'), 'Kenya'),
+    (('Brazil',), 'Brazil'),
+    (('Peru',), 'Peru'),
+    (('Honduras',), 'Honduras'),
+    (('Nicaragua',), 'Nicaragua'),
+    (('El Salvador',), 'El Salvador'),
+    (('Panama',), 'Panama'),
+    (('Mexico',), 'Mexico'),
+    (('Rwanda',), 'Rwanda'),
+    (('Burundi',), 'Burundi'),
+    (('Tanzania',), 'Tanzania'),
+    (('Uganda',), 'Uganda'),
+    (('Yemen',), 'Yemen')
+]
+PROCESS_RULES = [
+    (('Dry Process', 'Natural'), 'Natural'),
+    (('Washed', 'Wet Process'), 'Washed'),
+    (('Honey',), 'Honey'),
+    (('Semi-Washed',), 'Semi-Washed'),
+    (('Anaerobic',), 'Anaerobic'),
+    (('Carbonic Maceration',), 'Carbonic Maceration')
+]
+
+# Specific Indonesian varieties without their own dropdown entry
+OTHER_VARIETIES = ('Ateng', 'Jember', 'Tim Tim')
+
+# Bean type indicators - matched in specific contexts, not just anywhere
+PEABERRY_PATTERNS = [
+    'peaberry coffee', 'peaberry beans', 'peaberry selection', 'peaberry lot', 'peaberry grade',
+    'peaberry screen', 'peaberry only', '100% peaberry', 'pure peaberry'
+]
+MARAGOGYPE_PATTERNS = [
+    'maragogype coffee', 'maragogype beans', 'maragogype selection', 'maragogype lot', 'maragogype grade',
+    'maragogype screen', 'maragogype only', '100% maragogype', 'pure maragogype'
+]
+BEAN_TYPE_PATTERN = re.compile(
+    f"(?P<peaberry>{'|'.join(re.escape(p) for p in PEABERRY_PATTERNS)})"
+    f"|(?P<maragogype>{'|'.join(re.escape(p) for p in MARAGOGYPE_PATTERNS)})"
+    f"|(?P<mixed>mixed)",
+    re.IGNORECASE
+)
+
+
+def _apply_rules(text: str, rules, known: List[str]) -> str:
+    for keywords, value in rules:
+        if any(keyword in text for keyword in keywords):
+            return value
+    if text and text not in known:
+        return 'Other'
+    return text
+
+
+def map_origin(origin: str) -> str:
+    """Map a parsed origin/region to a dropdown origin"""
+    return _apply_rules(origin, ORIGIN_RULES, DROPDOWN_ORIGINS)
+
+
+def map_process_method(process_method: str) -> str:
+    """Map a parsed processing description to a dropdown process"""
+    return _apply_rules(process_method, PROCESS_RULES, DROPDOWN_PROCESSES)
+
+
+def map_variety(variety: str) -> str:
+    """Map a parsed cultivar to a dropdown variety"""
+    if any(name in variety for name in OTHER_VARIETIES):
+        return 'Other'
+    return variety
+
+
+def map_roast_levels(raw_data: Dict[str, Any]) -> List[str]:
+    """Expand roast recommendation ranges to every level in the range"""
+    recommended_roast_levels = raw_data.get('recommended_roast_levels', [])
+    if 'City to Full City+' in str(recommended_roast_levels) or 'City to Full City+' in raw_data.get('roast_recommendations', ''):
+        recommended_roast_levels = ['City', 'City+', 'Full City', 'Full City+']
+    return recommended_roast_levels
+
+
+def detect_bean_type(html_content: str) -> str:
+    """Peaberry / Maragogype / Mixed / Regular from one scan of the page"""
+    found = set()
+    for match in BEAN_TYPE_PATTERN.finditer(html_content):
+        found.add(match.lastgroup)
+        if len(found) == 3:
+            break
+
+    peaberry_found = 'peaberry' in found
+    maragogype_found = 'maragogype' in found
+
+    # Also check for mixed content
+    if 'mixed' in found and (peaberry_found or maragogype_found):
+        return 'Mixed'
+    elif peaberry_found:
+        return 'Peaberry'
+    elif maragogype_found:
+        return 'Maragogype'
+    return 'Regular'
+
+
+def build_sweet_marias_profile(raw_data: Dict[str, Any], ai_data: Dict[str, Any],
+                               html_content: str) -> Dict[str, Any]:
+    """Combine SweetMariasParser output into a dropdown-compatible bean profile"""
+    return {
+        # Basic info
+        'name': raw_data.get('name', ''),
+        'origin': map_origin(raw_data.get('origin', '')),
+        'variety': map_variety(raw_data.get('variety', '')),
+        'process_method': map_process_method(raw_data.get('process_method', '')),
+        'bean_type': detect_bean_type(html_content),
+        'description': raw_data.get('description', ''),
+        'recommended_roast_levels': map_roast_levels(raw_data),
+
+        # Technical specs
+        'screen_size': raw_data.get('screen_size', ''),
+        'density_g_ml': raw_data.get('density_g_ml'),
+        'altitude_m': ai_data.get('altitude_m'),
+        'harvest_year': None,  # Not typically available
+
+        # Cupping scores - prioritize raw data over AI data
+        'cupping_score': raw_data.get('total_score') or ai_data.get('cupping_score'),
+        'fragrance_score': None,  # Not directly available
+
+        # Flavor profile
+        'body_intensity': ai_data.get('body_intensity', 0),
+        'acidity_intensity': ai_data.get('acidity_intensity', 0),
+        'floral_intensity': ai_data.get('floral_intensity', 0),
+        'honey_intensity': ai_data.get('honey_intensity', 0),
+        'sugars_intensity': ai_data.get('sugars_intensity', 0),
+        'caramel_intensity': ai_data.get('caramel_intensity', 0),
+        'fruits_intensity': ai_data.get('fruits_intensity', 0),
+        'citrus_intensity': ai_data.get('citrus_intensity', 0),
+        'berry_intensity': ai_data.get('berry_intensity', 0),
+        'cocoa_intensity': ai_data.get('cocoa_intensity', 0),
+        'nuts_intensity': ai_data.get('nuts_intensity', 0),
+        'rustic_intensity': ai_data.get('rustic_intensity', 0),
+        'spice_intensity': ai_data.get('spice_intensity', 0),
+
+        # Supplier info
+        'supplier_name': 'Sweet Maria\'s',
+        'supplier_url': '',  # Will be set by user
+
+        # Additional data
+        'notes': raw_data.get('cupping_notes', ''),
+        'roasting_notes': raw_data.get('roast_recommendations', ''),
+
+        # Critical AI coaching data (will need manual input)
+        'moisture_content_pct': None,
+
+        # Metadata
+        'vendor_detected': 'sweet_marias',
+        'parsing_confidence': 'high' if raw_data.get('name') else 'medium'
+    }
@@ -3,9 +3,18 @@ Sweet Maria's Parser Package
 Contains parsers and utilities for Sweet Maria's coffee supplier
 """
 
-from .sweet_marias_parser import parse_sweet_marias_html, get_ai_optimized_data
+from .sweet_marias_parser import (
+    SweetMariasParser,
+    LxmlSweetMariasParser,
+    create_parser,
+    parse_sweet_marias_html,
+    get_ai_optimized_data
+)
 
 __all__ = [
+    'SweetMariasParser',
+    'LxmlSweetMariasParser',
+    'create_parser',
     'parse_sweet_marias_html',
     'get_ai_optimized_data'
 ]
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the Sweet Maria's parser backends
+
+Parses the real-page fixture padded out to a full product page (related
+products, reviews) with each backend and reports pages/second.
+
+Usage: python benchmark_parser.py [iterations] [related_items]
+"""
+
+import io
+import sys
+import time
+import contextlib
+from sweet_marias_parser import SweetMariasParser, LxmlSweetMariasParser, LXML_AVAILABLE
+from test_real_html import REAL_HTML
+
+
+def build_page(related_items: int) -> str:
+    """The fixture plus the kind of bulk a live product page carries"""
+    related = ''.join(
+        f'<div class="product-item"><a href="/coffee-{i}">Related Coffee {i}</a>'
+        f'<div class="product-item-details"><span class="price">${8 + i % 5}.50</span>'
+        f'<p>Notes of cocoa, dried fruit and spice. Lot {i}.</p></div></div>'
+        for i in range(related_items)
+    )
+    return REAL_HTML.replace('</body>', f'<div class="related">{related}</div></body>')
+
+
+def run(parser_class, html_content: str, iterations: int) -> float:
+    """Pages per second for one backend"""
+    # The parsers print debug output - keep it out of the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            parser = parser_class()
+            parser.parse_html(html_content)
+            parser.get_ai_optimized_data()
+        elapsed = time.perf_counter() - start
+    return iterations / elapsed
+
+
+def benchmark(iterations: int = 20, related_items: int = 1000):
+    html_content = build_page(related_items)
+    print(f"Page size: {len(html_content) / 1024:.0f} KB, {iterations} iterations")
+    print("=" * 50)
+
+    bs4_rate = run(SweetMariasParser, html_content, iterations)
+    print(f"html.parser (BeautifulSoup): {bs4_rate:8.1f} pages/s")
+
+    if not LXML_AVAILABLE:
+        print("lxml not installed - skipping lxml backend")
+        return
+
+    lxml_rate = run(LxmlSweetMariasParser, html_content, iterations)
+    print(f"lxml (XPath):                {lxml_rate:8.1f} pages/s")
+    print(f"Speedup: {lxml_rate / bs4_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    benchmark(*args)
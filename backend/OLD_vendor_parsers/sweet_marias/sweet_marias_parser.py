@@ -1,6 +1,10 @@
 """
 Sweet Maria's HTML Parser
 Extracts comprehensive coffee bean data from Sweet Maria's product pages
+
+SweetMariasParser walks a BeautifulSoup tree. LxmlSweetMariasParser runs the
+same extraction over an lxml tree with precompiled XPath selectors - several
+times faster on full product pages - and is used when lxml is installed.
 """
 
 import re
@@ -8,25 +12,77 @@ import json
 from typing import Dict, List, Optional, Any
 from bs4 import BeautifulSoup
 
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Every element lookup the extractors make: name -> (tag(s), class)
+# A class containing spaces must match the whole class attribute (BeautifulSoup semantics)
+SELECTORS = {
+    'title': ('h1', 'page-title'),
+    'price': ('span', 'price'),
+    'overview': ('div', 'product attribute overview'),
+    'value': ('div', 'value'),
+    'stock': ('div', 'stock'),
+    'chart': ('div', 'forix-chartjs'),
+    'specs_table': ('table', 'additional-attributes-table'),
+    'specs_table_alt': ('table', 'data table additional-attributes'),
+    'specs_div': ('div', 'additional-attributes-table'),
+    'table': ('table', None),
+    'row': ('tr', None),
+    'cell': (['th', 'td'], None),
+    'cupping_notes': ('div', 'product attribute cupping-notes')
+}
+
 
 class SweetMariasParser:
     def __init__(self):
         self.parsed_data = {}
     
+    # DOM access - the only BeautifulSoup-specific code, overridden by the lxml backend
+    
+    def _find_all(self, root, selector: str) -> List[Any]:
+        tag, class_ = SELECTORS[selector]
+        if class_ is None:
+            return root.find_all(tag)
+        return root.find_all(tag, class_=class_)
+    
+    def _find(self, root, selector: str):
+        tag, class_ = SELECTORS[selector]
+        if class_ is None:
+            return root.find(tag)
+        return root.find(tag, class_=class_)
+    
+    def _text(self, element) -> str:
+        return element.get_text()
+    
     def parse_html(self, html_content: str) -> Dict[str, Any]:
         """
         Parse Sweet Maria's HTML content and extract coffee bean data
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
+        return self.parse_soup(BeautifulSoup(html_content, 'html.parser'))
+    
+    def parse_soup(self, soup: BeautifulSoup) -> Dict[str, Any]:
+        """
+        Extract coffee bean data from an already-parsed document
         
+        Lets callers that also run other extractors over the same page build
+        the DOM once and share it.
+        """
         # Extract basic product info
         self._extract_basic_info(soup)
         
+        # Cupping and flavor charts share one lookup
+        chart_divs = self._find_all(soup, 'chart')
+        
         # Extract cupping scores from chart data
-        self._extract_cupping_scores(soup)
+        self._extract_cupping_scores(chart_divs)
         
         # Extract flavor profile from chart data
-        self._extract_flavor_profile(soup)
+        self._extract_flavor_profile(chart_divs)
         
         # Extract technical specifications
         self._extract_specifications(soup)
@@ -42,36 +98,34 @@ class SweetMariasParser:
     def _extract_basic_info(self, soup: BeautifulSoup):
         """Extract basic product information"""
         # Product name
-        title = soup.find('h1', class_='page-title')
-        if title:
-            self.parsed_data['name'] = title.get_text().strip()
+        title = self._find(soup, 'title')
+        if title is not None:
+            self.parsed_data['name'] = self._text(title).strip()
         
         # Price
-        price_element = soup.find('span', class_='price')
-        if price_element:
-            price_text = price_element.get_text().strip()
+        price_element = self._find(soup, 'price')
+        if price_element is not None:
+            price_text = self._text(price_element).strip()
             # Extract numeric price
             price_match = re.search(r'\$(\d+\.?\d*)', price_text)
             if price_match:
                 self.parsed_data['price'] = float(price_match.group(1))
         
         # Description
-        description = soup.find('div', class_='product attribute overview')
-        if description:
-            desc_text = description.find('div', class_='value')
-            if desc_text:
-                self.parsed_data['description'] = desc_text.get_text().strip()
+        description = self._find(soup, 'overview')
+        if description is not None:
+            desc_text = self._find(description, 'value')
+            if desc_text is not None:
+                self.parsed_data['description'] = self._text(desc_text).strip()
         
         # Stock status
-        stock = soup.find('div', class_='stock')
-        if stock:
-            self.parsed_data['stock_status'] = stock.get_text().strip()
+        stock = self._find(soup, 'stock')
+        if stock is not None:
+            self.parsed_data['stock_status'] = self._text(stock).strip()
     
-    def _extract_cupping_scores(self, soup: BeautifulSoup):
+    def _extract_cupping_scores(self, chart_divs: List[Any]):
         """Extract cupping scores from chart data"""
         # Look for chart data in div elements with data attributes
-        chart_divs = soup.find_all('div', class_='forix-chartjs')
-        
         for div in chart_divs:
             # Check for cupping chart data
             cupping_data = div.get('data-chart-value')
@@ -101,11 +155,9 @@ class SweetMariasParser:
         
         self.parsed_data['cupping_scores'] = scores
     
-    def _extract_flavor_profile(self, soup: BeautifulSoup):
+    def _extract_flavor_profile(self, chart_divs: List[Any]):
         """Extract flavor profile from chart data"""
         # Look for chart data in div elements with data attributes
-        chart_divs = soup.find_all('div', class_='forix-chartjs')
-        
         for div in chart_divs:
             # Check for flavor chart data
             chart_type = div.get('data-chart-type')
@@ -131,30 +183,30 @@ class SweetMariasParser:
     
     def _extract_specifications(self, soup: BeautifulSoup):
         """Extract technical specifications from specs table"""
-        specs_table = soup.find('table', class_='additional-attributes-table')
-        if not specs_table:
+        specs_table = self._find(soup, 'specs_table')
+        if specs_table is None:
             # Try alternative selectors for specs table
-            specs_table = soup.find('table', class_='data table additional-attributes')
-            if not specs_table:
-                specs_table = soup.find('div', class_='additional-attributes-table')
-                if specs_table:
+            specs_table = self._find(soup, 'specs_table_alt')
+            if specs_table is None:
+                specs_table = self._find(soup, 'specs_div')
+                if specs_table is not None:
                     # Handle div-based specs
-                    specs_table = specs_table.find('table')
+                    specs_table = self._find(specs_table, 'table')
         
-        if not specs_table:
+        if specs_table is None:
             print("DEBUG: No specifications table found, trying fallback extraction")
             self._extract_from_description(soup)
             return
         
         print("DEBUG: Found specifications table")
         specs = {}
-        rows = specs_table.find_all('tr')
+        rows = self._find_all(specs_table, 'row')
         
         for row in rows:
-            cells = row.find_all(['th', 'td'])
+            cells = self._find_all(row, 'cell')
             if len(cells) >= 2:
-                key = cells[0].get_text().strip()
-                value = cells[1].get_text().strip()
+                key = self._text(cells[0]).strip()
+                value = self._text(cells[1]).strip()
                 specs[key] = value
                 print(f"DEBUG: Found spec - {key}: {value}")
         
@@ -299,7 +351,7 @@ class SweetMariasParser:
         print("DEBUG: Using fallback extraction from description")
         
         # Get all text content
-        all_text = soup.get_text()
+        all_text = self._text(soup)
         
         # Look for origin/country
         countries = ['Ethiopia', 'Colombia', 'Guatemala', 'Costa Rica', 'Kenya', 'Yemen', 'Brazil', 'Peru', 'Honduras', 'Nicaragua', 'El Salvador', 'Panama', 'Mexico', 'Rwanda', 'Burundi', 'Tanzania', 'India', 'Indonesia', 'Sumatra', 'Java', 'Sulawesi', 'Timor']
@@ -332,10 +384,10 @@ class SweetMariasParser:
     def _extract_farm_info(self, soup: BeautifulSoup):
         """Extract farm information from content"""
         # Look for altitude information in text content
-        content_divs = soup.find_all('div', class_='value')
+        content_divs = self._find_all(soup, 'value')
         
         for div in content_divs:
-            text = div.get_text()
+            text = self._text(div)
             # Look for altitude information (various formats)
             altitude_match = re.search(r'(?:between\s+)?(\d+)\s*(?:to|-)\s*(\d+)\s*meters?', text, re.IGNORECASE)
             if altitude_match:
@@ -345,14 +397,14 @@ class SweetMariasParser:
         
         # Look for farmer count
         for div in content_divs:
-            text = div.get_text()
+            text = self._text(div)
             farmer_match = re.search(r'(\d+)\s*farmers?', text, re.IGNORECASE)
             if farmer_match:
                 self.parsed_data['farmer_count'] = int(farmer_match.group(1))
                 break
         
         # Also look in all text content for altitude
-        all_text = soup.get_text()
+        all_text = self._text(soup)
         altitude_match = re.search(r'(?:between\s+)?(\d+)\s*(?:to|-)\s*(\d+)\s*meters?', all_text, re.IGNORECASE)
         if altitude_match and 'altitude_min' not in self.parsed_data:
             self.parsed_data['altitude_min'] = int(altitude_match.group(1))
@@ -360,11 +412,11 @@ class SweetMariasParser:
     
     def _extract_cupping_notes(self, soup: BeautifulSoup):
         """Extract detailed cupping notes"""
-        cupping_notes = soup.find('div', class_='product attribute cupping-notes')
-        if cupping_notes:
-            notes_div = cupping_notes.find('div', class_='value')
-            if notes_div:
-                self.parsed_data['cupping_notes'] = notes_div.get_text().strip()
+        cupping_notes = self._find(soup, 'cupping_notes')
+        if cupping_notes is not None:
+            notes_div = self._find(cupping_notes, 'value')
+            if notes_div is not None:
+                self.parsed_data['cupping_notes'] = self._text(notes_div).strip()
     
     def get_ai_optimized_data(self) -> Dict[str, Any]:
         """
@@ -419,19 +471,88 @@ class SweetMariasParser:
         return ai_data
 
 
-def parse_sweet_marias_html(html_content: str) -> Dict[str, Any]:
+def _class_test(class_: str) -> str:
+    """XPath predicate matching BeautifulSoup's class_ semantics"""
+    if ' ' in class_:
+        return f"normalize-space(@class)='{class_}'"
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_} ')"
+
+
+def _selector_xpath(tag, class_: Optional[str]) -> str:
+    tags = [tag] if isinstance(tag, str) else tag
+    predicates = [' or '.join(f"self::{name}" for name in tags)]
+    if class_ is not None:
+        predicates.append(_class_test(class_))
+    return f"descendant::*[{' and '.join(f'({p})' for p in predicates)}]"
+
+
+if LXML_AVAILABLE:
+    _XPATH_ALL = {name: etree.XPath(_selector_xpath(*selector)) for name, selector in SELECTORS.items()}
+    _XPATH_FIRST = {name: etree.XPath(f"({_selector_xpath(*selector)})[1]") for name, selector in SELECTORS.items()}
+    # get_text() skips script/style/template contents - so do we
+    _XPATH_TEXT = etree.XPath(
+        "descendant-or-self::text()[not(ancestor::script) and not(ancestor::style) and not(ancestor::template)]"
+    )
+
+
+class LxmlSweetMariasParser(SweetMariasParser):
+    """SweetMariasParser over an lxml tree with precompiled XPath selectors"""
+    
+    def __init__(self):
+        if not LXML_AVAILABLE:
+            raise ImportError("lxml is required for LxmlSweetMariasParser")
+        super().__init__()
+    
+    def parse_html(self, html_content: str) -> Dict[str, Any]:
+        """
+        Parse Sweet Maria's HTML content and extract coffee bean data
+        """
+        if not html_content.strip():
+            return self.parsed_data
+        try:
+            root = lxml_html.document_fromstring(html_content)
+        except ValueError:
+            # lxml rejects str input that carries an XML encoding declaration
+            root = lxml_html.document_fromstring(html_content.encode('utf-8'))
+        return self.parse_tree(root)
+    
+    def parse_tree(self, root) -> Dict[str, Any]:
+        """Extract coffee bean data from an already-parsed lxml document"""
+        return self.parse_soup(root)
+    
+    def _find_all(self, root, selector: str) -> List[Any]:
+        return _XPATH_ALL[selector](root)
+    
+    def _find(self, root, selector: str):
+        found = _XPATH_FIRST[selector](root)
+        return found[0] if found else None
+    
+    def _text(self, element) -> str:
+        return ''.join(_XPATH_TEXT(element))
+
+
+def create_parser(fast: bool = True) -> SweetMariasParser:
+    """
+    Get a parser instance - the lxml backend when fast and lxml is installed
+    """
+    if fast and LXML_AVAILABLE:
+        return LxmlSweetMariasParser()
+    return SweetMariasParser()
+
+
+def parse_sweet_marias_html(html_content: str, fast: bool = False) -> Dict[str, Any]:
     """
     Main function to parse Sweet Maria's HTML content
     """
-    parser = SweetMariasParser()
+    parser = create_parser(fast)
     return parser.parse_html(html_content)
 
 
-def get_ai_optimized_data(html_content: str) -> Dict[str, Any]:
+def get_ai_optimized_data(html_content: str, fast: bool = False) -> Dict[str, Any]:
     """
     Get AI-optimized data from Sweet Maria's HTML
     """
-    parser = SweetMariasParser()
+    parser = create_parser(fast)
     parser.parse_html(html_content)
     return parser.get_ai_optimized_data()
 
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Parity test for the lxml parser backend
+
+Both backends must produce the same parsed dict and AI-optimized data for
+every fixture.
+"""
+
+import json
+from sweet_marias_parser import SweetMariasParser, LxmlSweetMariasParser
+from test_real_html import REAL_HTML
+from test_parser import SAMPLE_HTML
+
+# Variations of the real page that take the other extraction branches
+FIXTURES = {
+    'real_html': REAL_HTML,
+    'sample_html': SAMPLE_HTML,
+    'div_wrapped_specs': REAL_HTML.replace(
+        '<table class="additional-attributes-table">',
+        '<div class="additional-attributes-table"><table class="data">'
+    ).replace('</table>', '</table></div>'),
+    'no_specs_table': REAL_HTML.replace('additional-attributes-table', 'specs'),
+    'script_and_style_text': REAL_HTML.replace(
+        '<body>',
+        '<body><style>.value { color: red }</style><script>var note = "1000 to 1200 meters";</script>'
+    ),
+    'empty': ''
+}
+
+
+def parse_both(html_content: str):
+    bs4_parser = SweetMariasParser()
+    lxml_parser = LxmlSweetMariasParser()
+    return (
+        (bs4_parser.parse_html(html_content), bs4_parser.get_ai_optimized_data()),
+        (lxml_parser.parse_html(html_content), lxml_parser.get_ai_optimized_data())
+    )
+
+
+def test_lxml_parity():
+    """lxml and BeautifulSoup backends agree on every fixture"""
+    mismatches = []
+    for name, html_content in FIXTURES.items():
+        (bs4_data, bs4_ai), (lxml_data, lxml_ai) = parse_both(html_content)
+        if bs4_data != lxml_data or bs4_ai != lxml_ai:
+            mismatches.append(name)
+            print(f"MISMATCH in {name}:")
+            print("html.parser:", json.dumps([bs4_data, bs4_ai], indent=2))
+            print("lxml:       ", json.dumps([lxml_data, lxml_ai], indent=2))
+        else:
+            print(f"OK: {name}")
+
+    assert not mismatches, f"Backends disagree on: {', '.join(mismatches)}"
+
+
+if __name__ == "__main__":
+    test_lxml_parity()
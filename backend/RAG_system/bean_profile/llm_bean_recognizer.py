@@ -1,116 +1,477 @@
 """
 LLM-Powered Bean Recognition System
 Extracts roasting-relevant characteristics from any input using LLM intelligence
+
+Results are cached by a hash of the normalized input (in memory, backed by a
+JSONL file), so pasting the same supplier description again costs nothing.
+recognize_many() handles whole offering lists: cache hits are served
+immediately and the misses go out several descriptions per prompt, with
+prompts running concurrently.
+
+Descriptions go through the rule-based extractor first: when origin, process
+and variety are all stated outright the LLM is skipped, otherwise it is only
+asked for the fields the rules did not find. Each result's "sources" maps
+fields to the path that produced them ("rules", "llm" or "cache").
 """
 
+import os
+import re
+import json
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 from RAG_system.llm_integration import llm_copilot
+from RAG_system.bean_profile.rule_extractor import bean_rule_extractor, RECOGNITION_FIELDS
 
 logger = logging.getLogger(__name__)
 
+# Bump when the prompt changes so cached results from the old prompt are ignored
+PROMPT_VERSION = 1
+
+RECOGNITION_CACHE_FILE = "bean_recognition_cache.jsonl"
+RECOGNITION_CACHE_MAX_ENTRIES = 5000
+
+LLM_TIMEOUT_SECONDS = 30
+BATCH_PROMPT_SIZE = 8          # descriptions per batched prompt
+MAX_CONCURRENT_LLM_CALLS = 4
+
+RECOGNITION_FIELD_PROMPTS = {
+    "origin": '- origin: country/region (e.g., "Kenya", "Ethiopia", "Colombia")',
+    "process": '- process: processing method (e.g., "Natural", "Washed", "Honey", "Anaerobic")',
+    "variety": '- variety: coffee variety (e.g., "Bourbon", "Typica", "Geisha", "Peaberry", "SL28")',
+    "altitude": '- altitude: altitude in meters if mentioned (e.g., 1800, 2000)',
+    "density": '- density: bean density if mentioned ("high", "medium", "low")',
+    "cupping_score": '- cupping_score: if mentioned (e.g., 87.5, 90)',
+    "screen_size": '- screen_size: if mentioned (e.g., "16-18", "15+")',
+    "moisture_content": '- moisture_content: if mentioned (e.g., 11.5, 12.0)',
+    "harvest_year": '- harvest_year: if mentioned (e.g., 2024, 2023)'
+}
+RECOGNITION_FIELDS_PROMPT = "\n".join(RECOGNITION_FIELD_PROMPTS[field] for field in RECOGNITION_FIELDS)
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+# LaTeX-ish wrappers some models put around braces: $$\{$$ ... $$\}$$
+_BRACE_NOISE = re.compile(r"\$\$|\\(?=[{}\[\]])")
+_JSON_START = re.compile(r"[{\[]")
+_decoder = json.JSONDecoder()
+
+
+def extract_json(response: str) -> Optional[Any]:
+    """
+    Pull the first JSON object/array out of an LLM response.
+
+    Tries a straight parse first, then strips code fences and brace escapes and
+    decodes from each candidate opening bracket. Returns None if nothing parses.
+    """
+    text = response.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    fenced = _CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    text = _BRACE_NOISE.sub('', text)
+
+    for match in _JSON_START.finditer(text):
+        try:
+            value, _ = _decoder.raw_decode(text, match.start())
+            return value
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_input(input_text: str) -> str:
+    return ' '.join(input_text.split())
+
+
+def recognition_key(input_text: str, fields: Optional[List[str]] = None) -> str:
+    """Content hash of the normalized input (and prompt version, and field subset if any)"""
+    scope = f"{PROMPT_VERSION}:{','.join(fields)}" if fields else f"{PROMPT_VERSION}"
+    return hashlib.sha256(f"{scope}:{normalize_input(input_text)}".encode('utf-8')).hexdigest()
+
+
+def merge_characteristics(rule_fields: Dict[str, Any], llm_fields: Optional[Dict[str, Any]],
+                          llm_source: str = "llm") -> Dict[str, Any]:
+    """
+    Combine rule and LLM fields into one recognition result body.
+
+    Rule fields win (they were stated verbatim); "sources" records where each
+    non-null field came from.
+    """
+    llm_fields = llm_fields or {}
+    characteristics: Dict[str, Any] = {}
+    sources: Dict[str, str] = {}
+    for field in RECOGNITION_FIELDS:
+        if rule_fields.get(field) is not None:
+            characteristics[field] = rule_fields[field]
+            sources[field] = "rules"
+        else:
+            characteristics[field] = llm_fields.get(field)
+            if characteristics[field] is not None:
+                sources[field] = llm_source
+    return {"characteristics": characteristics, "sources": sources}
+
+
+class RecognitionCache:
+    """
+    LRU cache of recognized characteristics with an append-only JSONL tier.
+
+    The file is loaded on first use and compacted once it holds twice the
+    in-memory limit.
+    """
+
+    def __init__(self, cache_file: str = RECOGNITION_CACHE_FILE,
+                 max_entries: int = RECOGNITION_CACHE_MAX_ENTRIES):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._file_lines = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        """Load the persisted tier (callers hold the lock)"""
+        self._loaded = True
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                for line in f:
+                    self._file_lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._entries[record["key"]] = record["characteristics"]
+                    self._entries.move_to_end(record["key"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logger.info(f"📦 Loaded {len(self._entries)} cached bean recognitions")
+        except Exception as e:
+            logger.error(f"❌ Failed to load bean recognition cache: {e}")
+
+    def _compact(self):
+        """Rewrite the file with only the live entries (callers hold the lock)"""
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            for key, characteristics in self._entries.items():
+                f.write(json.dumps({"key": key, "characteristics": characteristics}) + "\n")
+        os.replace(tmp_file, self.cache_file)
+        self._file_lines = len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            characteristics = self._entries.get(key)
+            if characteristics is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return characteristics
+
+    def put(self, key: str, characteristics: Dict[str, Any]):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._entries[key] = characteristics
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            try:
+                if self._file_lines >= 2 * self.max_entries:
+                    self._compact()
+                else:
+                    with open(self.cache_file, 'a') as f:
+                        f.write(json.dumps({"key": key, "characteristics": characteristics}) + "\n")
+                    self._file_lines += 1
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to persist bean recognition: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+
 class LLMBeanRecognizer:
     """
     Uses LLM to intelligently extract bean characteristics for roasting
     """
-    
-    def __init__(self):
+
+    def __init__(self, cache: Optional[RecognitionCache] = None, use_rules: bool = True):
         self.llm = llm_copilot
-    
-    def recognize_bean_characteristics(self, input_text: str) -> Dict[str, Any]:
-        """
-        Use LLM to extract key roasting characteristics from any input
-        """
-        try:
-            prompt = f"""
+        self.cache = cache or recognition_cache
+        self.rules = bean_rule_extractor if use_rules else None
+
+    def _extract_rules(self, input_text: str) -> Dict[str, Any]:
+        return self.rules.extract(input_text) if self.rules else {}
+
+    def _complete(self, prompt: str, max_tokens: int) -> str:
+        """One blocking chat completion against the primary model"""
+        if not self.llm.client:
+            raise RuntimeError("LLM client not configured")
+
+        response = self.llm.client.chat.completions.create(
+            model=self.llm.primary_model,
+            messages=[
+                {"role": "system", "content": "You are an expert coffee roaster analyzing bean characteristics."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=max_tokens,
+            timeout=LLM_TIMEOUT_SECONDS  # Add timeout to prevent hanging
+        )
+        return response.choices[0].message.content
+
+    def _recognize_uncached(self, input_text: str,
+                            fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Single-description LLM call (optionally for a subset of fields); None if the response has no JSON object"""
+        fields_prompt = (
+            "\n".join(RECOGNITION_FIELD_PROMPTS[field] for field in fields) if fields else RECOGNITION_FIELDS_PROMPT
+        )
+        prompt = f"""
 You are an expert coffee roaster analyzing bean characteristics for roasting guidance.
 
 Input: {input_text}
 
 Extract the key characteristics that affect roasting and return ONLY a JSON object with these fields:
-- origin: country/region (e.g., "Kenya", "Ethiopia", "Colombia")
-- process: processing method (e.g., "Natural", "Washed", "Honey", "Anaerobic")
-- variety: coffee variety (e.g., "Bourbon", "Typica", "Geisha", "Peaberry", "SL28")
-- altitude: altitude in meters if mentioned (e.g., 1800, 2000)
-- density: bean density if mentioned ("high", "medium", "low")
-- cupping_score: if mentioned (e.g., 87.5, 90)
-- screen_size: if mentioned (e.g., "16-18", "15+")
-- moisture_content: if mentioned (e.g., 11.5, 12.0)
-- harvest_year: if mentioned (e.g., 2024, 2023)
+{fields_prompt}
 
 If a field is not mentioned or unclear, use null.
 Return ONLY valid JSON, no other text.
 """
+        response = self._complete(prompt, max_tokens=500)
+        characteristics = extract_json(response)
+        if not isinstance(characteristics, dict):
+            logger.error(f"Failed to parse LLM response as JSON: {response}")
+            return None
+        return characteristics
+
+    def _recognize_batch_uncached(self, input_texts: List[str],
+                                  fields: Optional[List[str]] = None) -> List[Optional[Dict[str, Any]]]:
+        """Several descriptions in one prompt (optionally for a subset of fields); entries the model skipped come back None"""
+        if len(input_texts) == 1:
+            return [self._recognize_uncached(input_texts[0], fields)]
+
+        fields_prompt = (
+            "\n".join(RECOGNITION_FIELD_PROMPTS[field] for field in fields) if fields else RECOGNITION_FIELDS_PROMPT
+        )
+
+        inputs = "\n\n".join(f"[{i}] {text}" for i, text in enumerate(input_texts, 1))
+        prompt = f"""
+You are an expert coffee roaster analyzing bean characteristics for roasting guidance.
+
+Below are {len(input_texts)} numbered coffee descriptions.
+
+{inputs}
+
+For EACH description, extract the key characteristics that affect roasting as a JSON object with an
+"index" field (the description number) and these fields:
+{fields_prompt}
+
+If a field is not mentioned or unclear, use null.
+Return ONLY a JSON array with one object per description, no other text.
+"""
+        response = self._complete(prompt, max_tokens=300 * len(input_texts))
+        parsed = extract_json(response)
+        if isinstance(parsed, dict):
+            parsed = parsed.get("results", [parsed])
+        if not isinstance(parsed, list):
+            return [None] * len(input_texts)
 
-            # Use configured models with fallback
-            model_name = self.llm.primary_model
-            response = self.llm.client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "system", "content": "You are an expert coffee roaster analyzing bean characteristics."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=500,
-                timeout=30  # Add timeout to prevent hanging
-            )
-            response = response.choices[0].message.content
-            
-            # Parse JSON response
-            import json
+        results: List[Optional[Dict[str, Any]]] = [None] * len(input_texts)
+        for position, item in enumerate(parsed):
+            if not isinstance(item, dict):
+                continue
             try:
-                # Clean the response - remove any markdown formatting and special characters
-                cleaned_response = response.strip()
-                if cleaned_response.startswith('```json'):
-                    cleaned_response = cleaned_response[7:]
-                if cleaned_response.endswith('```'):
-                    cleaned_response = cleaned_response[:-3]
-                
-                # Remove all $$ characters and special formatting
-                cleaned_response = cleaned_response.replace('$$', '')
-                # Remove specific patterns like $$\{$$ and $$\}$$
-                cleaned_response = cleaned_response.replace('\\{$$', '{')
-                cleaned_response = cleaned_response.replace('\\}$$', '}')
-                # Remove any remaining special characters
-                cleaned_response = cleaned_response.replace('\\{', '{')
-                cleaned_response = cleaned_response.replace('\\}', '}')
-                
-                # Find the first { and last } to extract just the JSON
-                start_idx = cleaned_response.find('{')
-                end_idx = cleaned_response.rfind('}')
-                if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                    cleaned_response = cleaned_response[start_idx:end_idx+1]
-                
-                cleaned_response = cleaned_response.strip()
-                
-                logger.info(f"Raw LLM response: {response}")
-                logger.info(f"Cleaned response: {cleaned_response}")
-                
-                characteristics = json.loads(cleaned_response)
-                logger.info(f"LLM extracted characteristics: {characteristics}")
+                slot = int(item.pop("index", position + 1)) - 1
+            except (TypeError, ValueError):
+                slot = position
+            if not 0 <= slot < len(results):
+                slot = position
+            if slot < len(results) and results[slot] is None:
+                results[slot] = item
+        return results
+
+    def recognize_bean_characteristics(self, input_text: str) -> Dict[str, Any]:
+        """
+        Extract key roasting characteristics from any input.
+
+        Rule-extracted fields come back without an LLM call; the LLM (or the
+        cache) only supplies the fields the rules could not find.
+        """
+        rule_fields = self._extract_rules(input_text)
+        if self.rules and self.rules.is_confident(rule_fields):
+            logger.info(f"⚡ Rule-based bean recognition: {rule_fields}")
+            return {
+                "success": True,
+                **merge_characteristics(rule_fields, None),
+                "raw_input": input_text,
+                "cached": False
+            }
+
+        remaining = [field for field in RECOGNITION_FIELDS if field not in rule_fields]
+        try:
+            # Ask only for what's missing - but keep the full-field cache entry when the rules found nothing
+            fields = remaining if rule_fields else None
+            key = recognition_key(input_text, fields)
+            characteristics = self.cache.get(key)
+            if characteristics is not None:
                 return {
                     "success": True,
-                    "characteristics": characteristics,
-                    "raw_input": input_text
-                }
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse LLM response as JSON: {e}")
-                logger.error(f"Raw response: {response}")
-                return {
-                    "success": False,
-                    "error": f"Failed to parse LLM response: {e}",
-                    "raw_input": input_text
+                    **merge_characteristics(rule_fields, characteristics, "cache"),
+                    "raw_input": input_text,
+                    "cached": True
                 }
-                
+
+            characteristics = self._recognize_uncached(input_text, fields)
+            if characteristics is None:
+                raise ValueError("Failed to parse LLM response")
+
+            self.cache.put(key, characteristics)
+            logger.info(f"LLM extracted characteristics: {characteristics}")
+            return {
+                "success": True,
+                **merge_characteristics(rule_fields, characteristics),
+                "raw_input": input_text,
+                "cached": False
+            }
+
         except Exception as e:
             logger.error(f"Error in LLM bean recognition: {e}")
+            if rule_fields:
+                # Partial answer beats none - report what the rules found
+                return {
+                    "success": True,
+                    **merge_characteristics(rule_fields, None),
+                    "raw_input": input_text,
+                    "cached": False,
+                    "llm_error": str(e)
+                }
             return {
                 "success": False,
                 "error": str(e),
                 "raw_input": input_text
             }
 
-# Global instance
+    async def arecognize_bean_characteristics(self, input_text: str) -> Dict[str, Any]:
+        """Async wrapper - runs the blocking LLM call off the event loop"""
+        return await asyncio.to_thread(self.recognize_bean_characteristics, input_text)
+
+    async def recognize_many(self, input_texts: List[str],
+                             batch_size: int = BATCH_PROMPT_SIZE,
+                             max_concurrency: int = MAX_CONCURRENT_LLM_CALLS) -> List[Dict[str, Any]]:
+        """
+        Recognize a list of descriptions (e.g. a green-coffee offering list).
+
+        Descriptions the rules fully cover, cached and repeated ones are answered
+        without the LLM. As in the single-description path, the LLM is only
+        asked for the fields the rules did not find: misses are grouped by that
+        field set and go out batch_size per prompt with up to max_concurrency
+        prompts in flight. Results are in input order, each shaped like
+        recognize_bean_characteristics().
+        """
+        keys = [recognition_key(text) for text in input_texts]
+        rule_fields: Dict[str, Dict[str, Any]] = {}
+        resolved: Dict[str, Dict[str, Any]] = {}
+        cached_keys = set()
+        # field subset (None = all fields) -> {input key: (cache key, text)}
+        misses: "OrderedDict[Optional[tuple], OrderedDict[str, tuple]]" = OrderedDict()
+
+        for key, text in zip(keys, input_texts):
+            if key in rule_fields:
+                continue
+            found = rule_fields[key] = self._extract_rules(text)
+            if self.rules and self.rules.is_confident(found):
+                continue
+            fields = tuple(field for field in RECOGNITION_FIELDS if field not in found) if found else None
+            cache_key = recognition_key(text, list(fields) if fields else None)
+            characteristics = self.cache.get(cache_key)
+            if characteristics is not None:
+                resolved[key] = characteristics
+                cached_keys.add(key)
+            else:
+                misses.setdefault(fields, OrderedDict())[key] = (cache_key, text)
+
+        errors: Dict[str, str] = {}
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_batch(fields: Optional[List[str]], batch):
+            async with semaphore:
+                try:
+                    results = await asyncio.to_thread(
+                        self._recognize_batch_uncached, [text for _, (_, text) in batch], fields
+                    )
+                except Exception as e:
+                    logger.warning(f"⚠️ Batched bean recognition failed, retrying individually: {e}")
+                    results = [None] * len(batch)
+
+                for (key, (cache_key, text)), characteristics in zip(batch, results):
+                    if characteristics is None:
+                        # Model skipped or garbled this one - ask for it on its own
+                        try:
+                            characteristics = await asyncio.to_thread(self._recognize_uncached, text, fields)
+                        except Exception as e:
+                            errors[key] = str(e)
+                            continue
+                    if characteristics is None:
+                        errors[key] = "Failed to parse LLM response"
+                        continue
+                    resolved[key] = characteristics
+                    self.cache.put(cache_key, characteristics)
+
+        batches = []
+        for fields, group in misses.items():
+            items = list(group.items())
+            for start in range(0, len(items), max(batch_size, 1)):
+                batches.append(run_batch(list(fields) if fields else None, items[start:start + batch_size]))
+        await asyncio.gather(*batches)
+
+        miss_count = sum(len(group) for group in misses.values())
+
+        rules_only = len(rule_fields) - len(cached_keys) - miss_count
+        logger.info(
+            f"🫘 Recognized {len(input_texts)} descriptions: {rules_only} by rules, {len(cached_keys)} cached, "
+            f"{miss_count} sent to LLM, {len(errors)} failed"
+        )
+
+        results = []
+        for key, text in zip(keys, input_texts):
+            found = rule_fields[key]
+            if key in resolved or found:
+                result = {
+                    "success": True,
+                    **merge_characteristics(found, resolved.get(key), "cache" if key in cached_keys else "llm"),
+                    "raw_input": text,
+                    "cached": key in cached_keys
+                }
+                if key in errors:
+                    result["llm_error"] = errors[key]
+                results.append(result)
+            else:
+                results.append({
+                    "success": False,
+                    "error": errors.get(key, "Recognition failed"),
+                    "raw_input": text
+                })
+        return results
+
+# Global instances
+recognition_cache = RecognitionCache()
 _llm_bean_recognizer_instance: Optional[LLMBeanRecognizer] = None
 
 def get_llm_bean_recognizer() -> LLMBeanRecognizer:
@@ -0,0 +1,314 @@
+"""
+Rule-Based Bean Characteristic Extractor
+Deterministic fast path in front of the LLM bean recognizer
+
+Most supplier descriptions state origin, process and variety outright
+("Kenya Nyeri Karima AA, washed SL28 & SL34, 1700-1800 masl"). This pulls
+those out with one pass of a precompiled trie regex built from
+shared/data/coffee_regions.json and the dropdown origin/process mapping, plus
+regexes for the numeric fields, so the LLM is only asked about what is left.
+"""
+
+import os
+import re
+import json
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from OLD_vendor_parsers.profile_mapping import ORIGIN_RULES, PROCESS_RULES, OTHER_VARIETIES
+
+logger = logging.getLogger(__name__)
+
+COFFEE_REGIONS_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'shared', 'data', 'coffee_regions.json'
+)
+
+# Every field the recognizer returns, in prompt order
+RECOGNITION_FIELDS = (
+    'origin', 'process', 'variety', 'altitude', 'density',
+    'cupping_score', 'screen_size', 'moisture_content', 'harvest_year'
+)
+
+# When the rules find all of these the LLM is skipped entirely
+CORE_FIELDS = ('origin', 'process', 'variety')
+
+# Growing regions that name their country - on top of the profile_mapping keywords
+ORIGIN_ALIASES = {
+    'Ethiopia': ('Yirgacheffe', 'Yirgacheffee', 'Sidamo', 'Sidama', 'Guji', 'Harrar', 'Harar', 'Limu', 'Jimma'),
+    'Kenya': ('Kirinyaga', 'Embu', "Murang'a", 'Kiambu'),
+    'Colombia': ('Huila', 'Nariño', 'Narino', 'Cauca', 'Tolima', 'Antioquia'),
+    'Guatemala': ('Huehuetenango', 'Antigua', 'Atitlan', 'Acatenango'),
+    'Costa Rica': ('Tarrazu', 'Tarrazú', 'West Valley'),
+    'Brazil': ('Cerrado', 'Mogiana', 'Sul de Minas'),
+    'Indonesia': ('Aceh', 'Sulawesi', 'Toraja', 'Flores', 'Bali Kintamani'),
+    'Hawaii': ('Kona',),
+    'Rwanda': ('Nyamasheke', 'Huye'),
+    'Burundi': ('Kayanza', 'Ngozi')
+}
+
+PROCESS_ALIASES = {
+    'Natural': ('Dry Processed', 'Sun Dried', 'Unwashed'),
+    'Washed': ('Fully Washed', 'Wet Processed'),
+    'Honey': ('Pulped Natural', 'Red Honey', 'Yellow Honey', 'Black Honey', 'White Honey'),
+    'Semi-Washed': ('Semi Washed', 'Wet Hulled', 'Wet-Hulled', 'Giling Basah'),
+    'Anaerobic': ('Anaerobic Natural', 'Anaerobic Washed', 'Anaerobic Fermentation'),
+    'Carbonic Maceration': ('Carbonic',)
+}
+
+# Canonical variety name -> spellings seen in supplier copy
+VARIETIES = {
+    'Bourbon': ('Bourbon',),
+    'Red Bourbon': ('Red Bourbon',),
+    'Yellow Bourbon': ('Yellow Bourbon',),
+    'Pink Bourbon': ('Pink Bourbon',),
+    'Typica': ('Typica',),
+    'Caturra': ('Caturra',),
+    'Catuai': ('Catuai', 'Catuaí'),
+    'Castillo': ('Castillo',),
+    'Catimor': ('Catimor',),
+    'Pacamara': ('Pacamara',),
+    'Pacas': ('Pacas',),
+    'Villa Sarchi': ('Villa Sarchi',),
+    'Mundo Novo': ('Mundo Novo',),
+    'Maragogype': ('Maragogype', 'Maragogipe'),
+    'Geisha': ('Geisha', 'Gesha'),
+    'SL28': ('SL28', 'SL-28', 'SL 28'),
+    'SL34': ('SL34', 'SL-34', 'SL 34'),
+    'Ruiru 11': ('Ruiru 11', 'Ruiru'),
+    'Batian': ('Batian',),
+    'Heirloom': ('Heirloom', 'Ethiopian Heirloom', 'Landrace', 'Ethiopian Landrace'),
+    '74110': ('74110',),
+    '74112': ('74112',),
+    'Java': ('Java',),
+    'Peaberry': ('Peaberry',),
+    'Other': OTHER_VARIETIES
+}
+
+# Process words that double as tasting notes ("natural sweetness", "notes of
+# honey") - taken as the process unless they read as a tasting note; a label
+# ("Natural process", "Process: Honey") always wins
+AMBIGUOUS_PROCESS_TERMS = ('natural', 'honey')
+
+DENSITY_TERMS = {
+    'high': ('High Density', 'Hard Bean', 'Strictly Hard Bean', 'SHB', 'Very Dense'),
+    'medium': ('Medium Density',),
+    'low': ('Low Density', 'Soft Bean')
+}
+
+FEET_PER_METER = 3.28084
+
+_ALTITUDE = re.compile(
+    r'(?<![\d.,])(\d{1,2},?\d{3}|\d{3,4})(?:\s*(?:-|–|to)\s*(\d{1,2},?\d{3}|\d{3,4}))?\s*'
+    r'(masl|m\.a\.s\.l\.?|meters|metres|m|feet|ft)\b',
+    re.IGNORECASE
+)
+_SCREEN_SIZE = re.compile(
+    r'\bscreen(?:\s*size)?\s*:?\s*(\d{2})(?:\s*(?:-|/|to)\s*(\d{2})|(\+))?'
+    r'|\b(\d{2})(?:\s*(?:-|/|to)\s*(\d{2})|(\+))?\s*screen\b',
+    re.IGNORECASE
+)
+_CUPPING_SCORE = re.compile(
+    r'\b(?:cupping\s*score|cup\s*score|total\s*score|sca\s*score|score)\s*:?\s*(\d{2}(?:\.\d{1,2})?)'
+    r'|\b(\d{2}(?:\.\d{1,2})?)\s*(?:points|pts|point score)\b',
+    re.IGNORECASE
+)
+_MOISTURE = re.compile(
+    r'\bmoisture(?:\s*content)?\s*(?:of|:)?\s*(\d{1,2}(?:\.\d+)?)\s*%'
+    r'|(\d{1,2}(?:\.\d+)?)\s*%\s*moisture',
+    re.IGNORECASE
+)
+_PROCESS_BEFORE = re.compile(r'\b(?:process(?:ing)?|processed|method)\s*[:\-–]?\s*$', re.IGNORECASE)
+_PROCESS_AFTER = re.compile(r'^\s*[\-–]?\s*(?:process(?:ed|ing)?|method)\b', re.IGNORECASE)
+# Tasting-note context: earlier in the same clause ("notes of peach, honey") or right after ("natural sweetness")
+_TASTING_BEFORE = re.compile(
+    r'\b(?:notes?|hints?|tones?|flavou?rs?|aromas?|tastes?|tasting|palate|reminiscent|like)\b[^.;:!?]*$',
+    re.IGNORECASE
+)
+_TASTING_AFTER = re.compile(
+    r'^\s*-?\s*(?:sweetness|sweet|flavou?rs?|notes?|tones?|acidity|aromas?|finish|body|like|character)\b',
+    re.IGNORECASE
+)
+_HARVEST_YEAR = re.compile(
+    r'\b(?:harvest(?:ed)?|crop(?:\s*year)?)\s*(?:year\s*)?(?:in\s*)?:?\s*(20\d{2})(?:\s*[/-]\s*(?:20)?\d{2})?'
+    r'|\b(20\d{2})(?:\s*[/-]\s*(?:20)?\d{2})?\s*(?:harvest|crop)\b',
+    re.IGNORECASE
+)
+
+
+def _trie_pattern(terms: List[str]) -> str:
+    """
+    Regex source for a character trie of the (lowercased) terms.
+
+    Shared prefixes are factored out, so the engine walks each position once
+    per trie level instead of trying every term; optional tails are greedy,
+    so the longest term wins ("semi-washed" over "washed").
+    """
+    trie: Dict[str, Any] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if '' in node else body
+
+    return emit(trie)
+
+
+def _load_regions(path: str = COFFEE_REGIONS_FILE) -> List[str]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [region for region in json.load(f).get('regions', []) if region != 'Other']
+    except Exception as e:
+        logger.warning(f"⚠️ Could not load coffee regions for rule extraction: {e}")
+        return []
+
+
+class BeanRuleExtractor:
+    """
+    Compiled vocabulary matcher plus numeric-field regexes.
+
+    Build once (the global instance below) and call extract() per description.
+    """
+
+    def __init__(self, regions: Optional[List[str]] = None):
+        regions = _load_regions() if regions is None else regions
+
+        # lowercased term -> (field, canonical value); later entries don't override earlier ones
+        self.terms: Dict[str, Tuple[str, str]] = {}
+
+        def add(field: str, value: str, spellings):
+            for spelling in spellings:
+                self.terms.setdefault(' '.join(spelling.lower().split()), (field, value))
+
+        for region in regions:
+            add('origin', region, (region,))
+        for keywords, value in ORIGIN_RULES:
+            add('origin', value, keywords)
+        for value, aliases in ORIGIN_ALIASES.items():
+            add('origin', value, aliases)
+        for value, aliases in PROCESS_ALIASES.items():
+            add('process', value, aliases)
+        for keywords, value in PROCESS_RULES:
+            add('process', value, keywords)
+        for value, spellings in VARIETIES.items():
+            add('variety', value, spellings)
+        for value, spellings in DENSITY_TERMS.items():
+            add('density', value, spellings)
+
+        self.pattern = re.compile(
+            rf"(?<!\w)({_trie_pattern(list(self.terms))})(?!\w)",
+            re.IGNORECASE
+        )
+
+    @staticmethod
+    def _in_process_context(text: str, start: int, end: int) -> bool:
+        """True if the term at text[start:end] is labelled as the process"""
+        return bool(_PROCESS_BEFORE.search(text[max(0, start - 20):start]) or _PROCESS_AFTER.match(text[end:end + 20]))
+
+    @staticmethod
+    def _in_tasting_context(text: str, start: int, end: int) -> bool:
+        """True if the term at text[start:end] reads as a tasting note"""
+        return bool(_TASTING_BEFORE.search(text[max(0, start - 60):start]) or _TASTING_AFTER.match(text[end:end + 20]))
+
+    def _is_stated_process(self, text: str, term: str, start: int, end: int) -> bool:
+        if term not in AMBIGUOUS_PROCESS_TERMS or self._in_process_context(text, start, end):
+            return True
+        return not self._in_tasting_context(text, start, end)
+
+    def _match_vocabulary(self, text: str) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        varieties: List[str] = []
+        process_term = ''
+        for match in self.pattern.finditer(text):
+            term = match.group(1).lower()
+            field, value = self.terms[term]
+            if field == 'variety':
+                if value not in varieties:
+                    varieties.append(value)
+            elif field == 'process':
+                if not self._is_stated_process(text, term, match.start(1), match.end(1)):
+                    continue
+                # Most specific stated process wins ("fully washed" over "washed")
+                if len(term) > len(process_term):
+                    process_term = term
+                    found[field] = value
+            elif field not in found:
+                found[field] = value
+        if varieties:
+            # "SL28 & SL34" style lots keep every named cultivar
+            found['variety'] = ', '.join(varieties)
+        return found
+
+    @staticmethod
+    def _altitude(text: str) -> Optional[int]:
+        for match in _ALTITUDE.finditer(text):
+            low = int(match.group(1).replace(',', ''))
+            high = int(match.group(2).replace(',', '')) if match.group(2) else low
+            meters = (low + high) / 2
+            if match.group(3).lower() in ('feet', 'ft'):
+                meters /= FEET_PER_METER
+            if 200 <= meters <= 3000:
+                return int(round(meters))
+        return None
+
+    @staticmethod
+    def _screen_size(text: str) -> Optional[str]:
+        match = _SCREEN_SIZE.search(text)
+        if not match:
+            return None
+        low, high, plus = match.group(1, 2, 3) if match.group(1) else match.group(4, 5, 6)
+        if high:
+            return f"{low}-{high}"
+        return f"{low}+" if plus else low
+
+    @staticmethod
+    def _cupping_score(text: str) -> Optional[float]:
+        for match in _CUPPING_SCORE.finditer(text):
+            score = float(match.group(1) or match.group(2))
+            if 60 <= score <= 100:
+                return score
+        return None
+
+    @staticmethod
+    def _moisture(text: str) -> Optional[float]:
+        for match in _MOISTURE.finditer(text):
+            moisture = float(match.group(1) or match.group(2))
+            if 5 <= moisture <= 20:
+                return moisture
+        return None
+
+    @staticmethod
+    def _harvest_year(text: str) -> Optional[int]:
+        match = _HARVEST_YEAR.search(text)
+        return int(match.group(1) or match.group(2)) if match else None
+
+    def extract(self, input_text: str) -> Dict[str, Any]:
+        """
+        Fields stated outright in the text; anything not found is left out
+        (not set to None) so callers can tell "not found" from "found".
+        """
+        text = ' '.join(input_text.split())
+        found: Dict[str, Any] = self._match_vocabulary(text)
+
+        numeric = {
+            'altitude': self._altitude(text),
+            'cupping_score': self._cupping_score(text),
+            'screen_size': self._screen_size(text),
+            'moisture_content': self._moisture(text),
+            'harvest_year': self._harvest_year(text)
+        }
+        found.update({field: value for field, value in numeric.items() if value is not None})
+        return found
+
+    @staticmethod
+    def is_confident(found: Dict[str, Any]) -> bool:
+        """All core fields stated - good enough to skip the LLM"""
+        return all(found.get(field) for field in CORE_FIELDS)
+
+# Global instance
+bean_rule_extractor = BeanRuleExtractor()
@@ -0,0 +1,247 @@
+"""
+Roast Curve Analysis Engine
+Computes curve metrics from a roast's logged events in one NumPy pass
+
+From the temp_f readings and milestone events it derives smoothed rate of rise
+(Savitzky-Golay or moving window), phase durations, DTR, turning point,
+post-first-crack ROR crash/flick and area under the curve. Coaching, the
+roast-outcome endpoint and roast analytics all read ROR from here instead of
+each computing their own.
+"""
+
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Any, List, Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RESAMPLE_STEP_SEC = 2.0          # readings are irregular - analysis runs on a uniform grid
+ROR_WINDOW_SEC = 30.0            # smoothing window for rate of rise
+SAVGOL_POLYORDER = 2
+TURNING_POINT_SEARCH_SEC = 180.0 # turning point must fall in the first 3 minutes
+TURNING_POINT_MIN_DIP_F = 1.0
+CRASH_WINDOW_SEC = 90.0
+CRASH_DROP_F_PER_MIN = 8.0       # ROR falling this much within CRASH_WINDOW_SEC after first crack
+FLICK_RISE_F_PER_MIN = 3.0       # ROR climbing back this much after its post-crack low
+
+SMOOTHING_METHODS = ("savgol", "moving")
+
+# Milestone event kinds (log_event's kinds and the coaching payload's event_type values)
+MILESTONE_KINDS = {
+    "CHARGE": "charge", "DRY_END": "dry_end", "FIRST_CRACK": "first_crack",
+    "SECOND_CRACK": "second_crack", "COOL": "drop", "END": "drop", "DROP": "drop"
+}
+
+
+@dataclass
+class CurveAnalysis:
+    """Metrics for one roast curve; times in seconds from roast start, temps in °F"""
+    has_data: bool = False
+    reading_count: int = 0
+    latest_temp: Optional[float] = None
+    ror_per_min: float = 0.0             # smoothed ROR at the latest reading
+    peak_ror: Optional[float] = None
+    avg_ror: Optional[float] = None      # turning point (or first reading) to last reading
+    last_segment_rate_per_sec: Optional[float] = None  # unsmoothed, between the last two readings
+    charge_temp_f: Optional[float] = None
+    max_temp_f: Optional[float] = None
+    first_crack_temp_f: Optional[float] = None
+    drop_temp_f: Optional[float] = None
+    turning_point_sec: Optional[float] = None
+    turning_point_temp_f: Optional[float] = None
+    milestones: Dict[str, float] = field(default_factory=dict)
+    drying_sec: Optional[float] = None
+    maillard_sec: Optional[float] = None
+    development_sec: Optional[float] = None
+    total_sec: Optional[float] = None
+    dtr_percent: Optional[float] = None
+    has_crash: bool = False
+    crash_sec: Optional[float] = None
+    has_flick: bool = False
+    flick_sec: Optional[float] = None
+    auc: Optional[float] = None          # °F·min above the turning point temperature
+    # Uniform-grid series (not part of to_dict unless asked for)
+    times: Any = None
+    temps: Any = None
+    ror: Any = None
+
+    def to_dict(self, include_series: bool = False) -> Dict[str, Any]:
+        result = {key: value for key, value in asdict(self).items() if key not in ("times", "temps", "ror")}
+        for key, value in result.items():
+            if isinstance(value, float):
+                result[key] = round(value, 2)
+        if include_series and self.times is not None:
+            result["series"] = {
+                "t_sec": self.times.round(1).tolist(),
+                "temp_f": self.temps.round(1).tolist(),
+                "ror_per_min": self.ror.round(2).tolist()
+            }
+        return result
+
+
+def _milestones(events: List[Dict[str, Any]]) -> Dict[str, float]:
+    found: Dict[str, float] = {}
+    for event in events:
+        kind = (event.get("kind") or event.get("event_type") or "").upper()
+        name = MILESTONE_KINDS.get(kind)
+        t_offset = event.get("t_offset_sec")
+        if name and t_offset is not None and name not in found:
+            found[name] = float(t_offset)
+    return found
+
+
+def _readings(events: List[Dict[str, Any]]):
+    """Sorted (times, temps) arrays of the temperature readings, one per timestamp (last wins)"""
+    pairs = [
+        (float(e["t_offset_sec"]), float(e["temp_f"]))
+        for e in events
+        if e.get("temp_f") is not None and e.get("t_offset_sec") is not None
+    ]
+    if not pairs:
+        return np.empty(0), np.empty(0)
+    data = np.asarray(pairs)
+    data = data[np.argsort(data[:, 0], kind="stable")]
+    # Keep the last reading logged at each second
+    last = np.append(data[1:, 0] != data[:-1, 0], True)
+    return data[last, 0], data[last, 1]
+
+
+def _savgol_derivative_kernel(half_width: int, polyorder: int) -> np.ndarray:
+    """Convolution kernel giving the Savitzky-Golay first derivative (per sample)"""
+    offsets = np.arange(-half_width, half_width + 1, dtype=float)
+    vander = np.vander(offsets, polyorder + 1, increasing=True)
+    return np.linalg.pinv(vander)[1][::-1]
+
+
+def smoothed_ror(temps: np.ndarray, step_sec: float = RESAMPLE_STEP_SEC,
+                 window_sec: float = ROR_WINDOW_SEC, method: str = "savgol") -> np.ndarray:
+    """Rate of rise in °F/min for a uniformly sampled temperature series"""
+    if temps.size < 2:
+        return np.zeros(temps.size)
+    ror = np.gradient(temps, step_sec) * 60.0
+    samples = max(int(round(window_sec / step_sec)), 2)
+
+    if method == "moving":
+        if temps.size > samples:
+            ror[samples:] = (temps[samples:] - temps[:-samples]) / (samples * step_sec) * 60.0
+        return ror
+
+    half_width = samples // 2
+    if temps.size >= 2 * half_width + 1 and half_width > SAVGOL_POLYORDER // 2:
+        kernel = _savgol_derivative_kernel(half_width, SAVGOL_POLYORDER)
+        ror[half_width:-half_width] = np.convolve(temps, kernel, mode="valid") / step_sec * 60.0
+        # The window is centered - at the live edge fall back to the trailing window
+        tail = temps[-(half_width + 1):]
+        ror[-half_width:] = (tail[-1] - tail[0]) / (half_width * step_sec) * 60.0
+    return ror
+
+
+def _crash_and_flick(times: np.ndarray, ror: np.ndarray, first_crack: float, result: CurveAnalysis):
+    post = times >= first_crack
+    if post.sum() < 3:
+        return
+    post_times, post_ror = times[post], ror[post]
+    samples = max(int(round(CRASH_WINDOW_SEC / RESAMPLE_STEP_SEC)), 1)
+    window = min(samples + 1, post_ror.size)
+    windows = np.lib.stride_tricks.sliding_window_view(post_ror, window)
+    drops = windows[:, 0] - windows.min(axis=1)
+    start = int(np.argmax(drops))
+    if drops[start] < CRASH_DROP_F_PER_MIN:
+        return
+
+    low = start + int(np.argmin(windows[start]))
+    result.has_crash = True
+    result.crash_sec = float(post_times[low])
+
+    rebound = post_ror[low:] - np.minimum.accumulate(post_ror[low:])
+    flicks = np.nonzero(rebound >= FLICK_RISE_F_PER_MIN)[0]
+    if flicks.size:
+        result.has_flick = True
+        result.flick_sec = float(post_times[low + flicks[0]])
+
+
+def analyze_curve(events: List[Dict[str, Any]], method: str = "savgol",
+                  window_sec: float = ROR_WINDOW_SEC) -> CurveAnalysis:
+    """
+    Analyze a roast's events (dicts with t_offset_sec, temp_f, kind).
+
+    Events may be unsorted and mix readings with milestones; anything without
+    temp_f still counts as a milestone.
+    """
+    if method not in SMOOTHING_METHODS:
+        raise ValueError(f"Unknown smoothing method: {method}")
+
+    result = CurveAnalysis(milestones=_milestones(events))
+    raw_times, raw_temps = _readings(events)
+    result.reading_count = int(raw_times.size)
+    if raw_times.size == 0:
+        return result
+
+    result.latest_temp = float(raw_temps[-1])
+    result.charge_temp_f = float(raw_temps[0])
+    result.max_temp_f = float(raw_temps.max())
+    if raw_times.size < 2:
+        return result
+    result.has_data = True
+    result.last_segment_rate_per_sec = float(
+        (raw_temps[-1] - raw_temps[-2]) / (raw_times[-1] - raw_times[-2])
+    )
+
+    step = RESAMPLE_STEP_SEC
+    times = np.arange(raw_times[0], raw_times[-1] + step / 2, step)
+    if times.size < 2:
+        # Readings closer together than one grid step - use the raw endpoints (ROR is their slope)
+        times, step = raw_times[[0, -1]], float(raw_times[-1] - raw_times[0])
+    temps = np.interp(times, raw_times, raw_temps)
+    ror = smoothed_ror(temps, step, window_sec, method)
+    result.times, result.temps, result.ror = times, temps, ror
+    result.ror_per_min = float(ror[-1])
+
+    # Turning point: a real dip in the first minutes (air roasters often start at room temp and never dip)
+    search = times <= times[0] + TURNING_POINT_SEARCH_SEC
+    tp_index = int(np.argmin(temps[search]))
+    if tp_index > 0 and temps[0] - temps[tp_index] >= TURNING_POINT_MIN_DIP_F:
+        result.turning_point_sec = float(times[tp_index])
+        result.turning_point_temp_f = float(temps[tp_index])
+    base_index = tp_index if result.turning_point_sec is not None else 0
+
+    # ROR statistics from the turning point on (pre-TP ROR is negative by definition)
+    result.peak_ror = float(ror[base_index:].max())
+    span_min = (times[-1] - times[base_index]) / 60.0
+    if span_min > 0:
+        result.avg_ror = float((temps[-1] - temps[base_index]) / span_min)
+
+    milestones = result.milestones
+    start = milestones.get("charge", 0.0)
+    drop = milestones.get("drop", float(raw_times[-1]))
+    dry_end = milestones.get("dry_end")
+    first_crack = milestones.get("first_crack")
+
+    def temp_at(t_offset: float) -> float:
+        return float(np.interp(t_offset, raw_times, raw_temps))
+
+    result.total_sec = drop - start
+    if "drop" in milestones:
+        result.drop_temp_f = temp_at(drop)
+    if dry_end is not None:
+        result.drying_sec = dry_end - start
+    if first_crack is not None:
+        result.first_crack_temp_f = temp_at(first_crack)
+        result.development_sec = max(drop - first_crack, 0.0)
+        if dry_end is not None:
+            result.maillard_sec = first_crack - dry_end
+        if result.total_sec > 0:
+            result.dtr_percent = result.development_sec / result.total_sec * 100.0
+        _crash_and_flick(times, ror, first_crack, result)
+
+    # Area under the curve above the base temperature, turning point to drop
+    in_roast = (times >= times[base_index]) & (times <= drop)
+    if in_roast.sum() >= 2:
+        above = np.clip(temps[in_roast] - temps[base_index], 0.0, None)
+        minutes = times[in_roast] / 60.0
+        # Trapezoid rule by hand: np.trapz is gone in NumPy 2, np.trapezoid missing before 2.0
+        result.auc = float(np.sum((above[1:] + above[:-1]) / 2.0 * np.diff(minutes)))
+
+    return result
@@ -17,6 +17,8 @@ from .conversation_state import conversation_manager
 from .machine_profiles import FreshRoastMachineProfiles
 from .dtr_coaching import build_dtr_coaching_context, DTRTargets
 from .temperature_calibration import temperature_calibrator
+from .curve_analysis import analyze_curve
+from .roast_stream import RoastStreamState, roast_streams, stream_for_progress
 
 # Load environment variables
 load_dotenv()
@@ -406,7 +408,7 @@ class DeepSeekRoastingCopilot:
                 current_phase = self.phase_detector.detect_phase(elapsed_seconds, current_temp)
             
             # Calculate temperature rate of rise and detect dangerous changes
-            temp_analysis = self._analyze_temperature_change(event_data, context.get('recent_events', []))
+            temp_analysis = self._analyze_temperature_change(event_data, context.get('recent_events', []), roast_id)
             
             # Check for dangerous temperature spikes first - this applies to ALL events
             if temp_analysis['has_spike'] or temp_analysis['is_fast']:
@@ -636,79 +638,33 @@ class DeepSeekRoastingCopilot:
                 "has_meaningful_advice": False
             }
     
-    def _analyze_temperature_change(self, current_event: Dict[str, Any], recent_events: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Analyze temperature rate of change to detect dangerous spikes"""
+    def _analyze_temperature_change(self, current_event: Dict[str, Any], recent_events: List[Dict[str, Any]],
+                                    roast_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyze temperature rate of change to detect dangerous spikes.
+        
+        Reads the roast's streaming state (already fed by log_event, so this is
+        O(1)); recent_events only seed it when the roast isn't tracked yet.
+        """
         current_temp = current_event.get('temp_f')
         current_time = current_event.get('t_offset_sec', 0)
-        
         logger.info(f"🔍 Analyzing temperature change: current={current_temp}°F at t={current_time}s")
-        logger.info(f"📊 Recent events count: {len(recent_events) if recent_events else 0}")
-        
-        # Default analysis result
-        analysis = {
-            'has_data': False,
-            'has_spike': False,
-            'is_fast': False,
-            'rate_per_min': 0.0,
-            'rate_per_sec': 0.0,
-            'temp_change': 0.0,
-            'time_diff': 0.0,
-            'prev_temp': None
-        }
         
-        if not current_temp or not recent_events:
-            logger.warning(f"⚠️ Cannot analyze: current_temp={current_temp}, recent_events={len(recent_events) if recent_events else 0}")
-            return analysis
-        
-        # Find the most recent event with temperature data
-        prev_event = None
-        for event in reversed(recent_events):
-            if event.get('temp_f') and event.get('t_offset_sec') != current_time:
-                prev_event = event
-                break
-        
-        if not prev_event:
-            logger.warning(f"⚠️ No previous event with temperature found")
-            return analysis
-        
-        prev_temp = prev_event.get('temp_f')
-        prev_time = prev_event.get('t_offset_sec', 0)
-        
-        logger.info(f"📈 Previous event: {prev_temp}°F at t={prev_time}s")
-        
-        # Calculate rate of change
-        time_diff = current_time - prev_time
-        if time_diff <= 0:
-            logger.warning(f"⚠️ Invalid time difference: {time_diff}s")
-            return analysis
-        
-        temp_change = current_temp - prev_temp
-        rate_per_sec = temp_change / time_diff
-        rate_per_min = rate_per_sec * 60
-        
-        logger.info(f"📊 Rate of rise: {rate_per_min:.1f}°F/min ({rate_per_sec:.1f}°F/sec)")
-        logger.info(f"🌡️ Change: {temp_change:.1f}°F over {time_diff:.0f}s")
-        
-        analysis.update({
-            'has_data': True,
-            'temp_change': temp_change,
-            'time_diff': time_diff,
-            'rate_per_sec': rate_per_sec,
-            'rate_per_min': rate_per_min,
-            'prev_temp': prev_temp,
-            'current_temp': current_temp
-        })
-        
-        # Detect dangerous spikes (>2°F/sec or >120°F/min)
-        if abs(rate_per_sec) > 2.0:
-            analysis['has_spike'] = True
-            logger.warning(f"🚨 DANGEROUS SPIKE DETECTED: {rate_per_sec:.1f}°F/sec!")
-        # Detect fast rise (>20°F/min)
-        elif rate_per_min > 20.0:
-            analysis['is_fast'] = True
-            logger.warning(f"⚡ FAST RISE DETECTED: {rate_per_min:.1f}°F/min")
+        if roast_id:
+            analysis = roast_streams.record(roast_id, current_event, recent_events, stored=False)
+        else:
+            state = RoastStreamState()
+            state.catch_up([e for e in recent_events or [] if e.get('t_offset_sec') != current_time])
+            analysis = state.update(current_event)
+        
+        if analysis['has_spike']:
+            logger.warning(f"🚨 DANGEROUS SPIKE DETECTED: {analysis['rate_per_sec']:.1f}°F/sec!")
+        elif analysis['is_fast']:
+            logger.warning(f"⚡ FAST RISE DETECTED: {analysis['rate_per_min']:.1f}°F/min")
+        elif analysis['has_data']:
+            logger.info(f"📊 Rate of rise: {analysis['rate_per_min']:.1f}°F/min (smoothed {analysis['smoothed_ror_per_min']:.1f}°F/min)")
         else:
-            logger.info(f"✅ Normal rate of rise")
+            logger.warning(f"⚠️ Cannot analyze: no previous temperature reading")
         
         return analysis
     
@@ -1295,8 +1251,8 @@ class MachineAwareLLMIntegration:
             current_fan
         )
         
-        # Analyze temperature trend
-        temp_analysis = self.analyze_temperature_trend(events)
+        # Temperature trend from the roast's streaming state
+        temp_analysis = stream_for_progress(roast_progress).trend()
         
         # Get specific recommendations
         if current_temp:
@@ -1355,7 +1311,8 @@ TEMPERATURE TARGETS FOR THIS SENSOR:
                     phase=current_phase,
                     sensor_type=sensor_type,
                     supabase=supabase,
-                    limit=3
+                    limit=3,
+                    query=user_message
                 )
                 
                 # Build few-shot section
@@ -1470,12 +1427,10 @@ RESPOND IN A HELPFUL, SPECIFIC, ACTIONABLE WAY FOR THE {profile.display_name}:
             )
             logger.info(f"🌡️ DTR-aware calibration: {calibrated_temp_info.raw_temp_f:.1f}°F → {calibrated_temp_info.calibrated_temp_f:.1f}°F ({machine_sensor_type})")
         
-        # Find first crack time
-        first_crack_time = None
-        for event in events:
-            if event.get('event_type') == 'first_crack':
-                first_crack_time = event.get('t_offset_sec')
-                break
+        # First crack time and smoothed ROR from the roast's streaming state
+        stream = stream_for_progress(roast_progress)
+        first_crack_time = int(stream.milestones['first_crack']) if 'first_crack' in stream.milestones else None
+        ror = stream.ror_per_min if stream.ror_per_min is not None else roast_progress.get('ror', 0)
         
         # Get machine profile
         try:
@@ -1533,7 +1488,7 @@ RESPOND IN A HELPFUL, SPECIFIC, ACTIONABLE WAY FOR THE {profile.display_name}:
                 current_heat=current_heat,
                 current_fan=current_fan,
                 current_temp=current_temp,
-                ror=roast_progress.get('ror', 0)
+                ror=ror
             )
         
         # Build DTR-enhanced system prompt with comprehensive context
@@ -1667,7 +1622,8 @@ Roast Level Target: {roast_level}
                     phase=current_phase_name,
                     sensor_type=sensor_type,
                     supabase=supabase,
-                    limit=3
+                    limit=3,
+                    query=user_message
                 )
                 
                 # Build few-shot section
@@ -1747,24 +1703,19 @@ RESPOND IN A HELPFUL, SPECIFIC, ACTIONABLE WAY FOR THE {profile.display_name} WI
     
     
     def analyze_temperature_trend(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Analyze temperature trend from events"""
+        """Analyze temperature trend from events (smoothed ROR and curve metrics)"""
         if not events:
             return {"summary": "No temperature data yet"}
         
-        # Simple trend analysis
-        temps = [e.get('temp_f') for e in events if e.get('temp_f')]
-        if len(temps) < 2:
+        curve = analyze_curve(events)
+        if not curve.has_data:
             return {"summary": "Insufficient temperature data"}
         
-        latest_temp = temps[-1]
-        temp_change = temps[-1] - temps[0] if len(temps) > 1 else 0
-        time_span = events[-1]['t_offset_sec'] - events[0]['t_offset_sec']
-        ror_per_min = (temp_change / time_span * 60) if time_span > 0 else 0
-        
         return {
-            "summary": f"Current: {latest_temp:.1f}°F, ROR: {ror_per_min:.1f}°F/min",
-            "ror_per_min": ror_per_min,
-            "latest_temp": latest_temp
+            "summary": f"Current: {curve.latest_temp:.1f}°F, ROR: {curve.ror_per_min:.1f}°F/min",
+            "ror_per_min": curve.ror_per_min,
+            "latest_temp": curve.latest_temp,
+            "curve": curve.to_dict()
         }
     
 
@@ -5,10 +5,17 @@ This module provides roasting phase detection and phase-specific coaching guidan
 to improve AI chatbot performance by understanding roasting phases and their characteristics.
 """
 
+import math
+import bisect
 from dataclasses import dataclass
-from typing import Dict, Optional, List, Any
+from typing import Dict, Optional, List, Any, Sequence
 import logging
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Handle relative imports gracefully
 try:
     from .machine_profiles import FreshRoastMachineProfiles, MachineCharacteristics
@@ -28,115 +35,253 @@ class RoastPhase:
     dos: List[str]
     donts: List[str]
 
+# Phase definitions shared by both detectors (dict order is PhaseDetector's match order)
+ROAST_PHASES = {
+    "drying": RoastPhase(
+        name="Drying Phase",
+        time_range=(0, 240),  # 0-4 minutes
+        temp_range=(200, 300),
+        indicators=[
+            "Beans turning from green to yellow",
+            "Grassy smell becoming sweet",
+            "Moisture evaporating"
+        ],
+        coaching_focus="Focus on moisture removal and even heat distribution",
+        dos=[
+            "Maintain steady heat",
+            "Allow moisture to escape gradually",
+            "Watch for color change to yellow"
+        ],
+        donts=[
+            "Don't rush this phase",
+            "Don't reduce fan too much (need airflow)",
+            "Don't expect cracking sounds yet"
+        ]
+    ),
+    "maillard": RoastPhase(
+        name="Maillard Reaction Phase",
+        time_range=(240, 480),  # 4-8 minutes
+        temp_range=(300, 380),
+        indicators=[
+            "Beans browning (Maillard reactions)",
+            "Sweet, bready aromas developing",
+            "Beans expanding in size"
+        ],
+        coaching_focus="Monitor browning rate and prepare for first crack",
+        dos=[
+            "Watch temperature rise rate (should be 8-12°F/min)",
+            "Adjust heat to control browning speed",
+            "Listen for beginning of first crack"
+        ],
+        donts=[
+            "Don't let temperature stall",
+            "Don't increase heat too aggressively",
+            "Don't expect full development yet"
+        ]
+    ),
+    "development": RoastPhase(
+        name="Development Phase",
+        time_range=(300, 480),  # 5-8 minutes
+        temp_range=(380, 435),
+        indicators=[
+            "First crack active or completed",
+            "Oils beginning to surface",
+            "Flavor compounds developing"
+        ],
+        coaching_focus="Control development time and roast level",
+        dos=[
+            "Time from first crack to drop (development time)",
+            "Adjust heat to control roast level",
+            "Monitor for desired roast color"
+        ],
+        donts=[
+            "Don't let temperature spike uncontrollably",
+            "Don't drop before first crack finishes (usually)",
+            "Don't ignore second crack if it starts"
+        ]
+    ),
+    "finishing": RoastPhase(
+        name="Finishing Phase",
+        time_range=(720, 900),  # 12-15 minutes
+        temp_range=(420, 450),
+        indicators=[
+            "Second crack may be approaching or active",
+            "Heavy oil development",
+            "Smoke increasing"
+        ],
+        coaching_focus="Decide drop point and cool quickly",
+        dos=[
+            "Decide your drop point based on desired roast",
+            "Cool beans immediately after drop",
+            "Be ready to drop quickly if needed"
+        ],
+        donts=[
+            "Don't go into second crack unless intentional",
+            "Don't delay drop if target reached",
+            "Don't let beans bake"
+        ]
+    )
+}
+
+# Machine-aware boundaries: time (seconds, scaled per machine) and bean temperature (°F)
+MACHINE_PHASE_ORDER = ("drying", "maillard", "development", "finishing")
+MACHINE_TIME_BOUNDS = (240, 480, 720)
+# bisect_right puts a reading equal to a bound in the later phase; 380°F itself is still Maillard
+MACHINE_TEMP_BOUNDS = (300, math.nextafter(380.0, math.inf), 420)
+REFERENCE_ROAST_MINUTES = 10
+
+
+def _first_match_time_bounds(phases: Dict[str, RoastPhase], default_key: str):
+    """
+    Flatten (possibly overlapping) phase time ranges into sorted boundaries.
+
+    Each segment between consecutive range edges gets the first phase (in dict
+    order) whose range contains it, and `default_key` where none does - exactly
+    what a loop over the ranges returns - so lookups become a bisect.
+    """
+    edges = sorted({edge for phase in phases.values() for edge in phase.time_range})
+    bounds: List[float] = []
+    keys = [default_key]  # before the first edge
+    for edge in edges:
+        key = next(
+            (k for k, phase in phases.items() if phase.time_range[0] <= edge < phase.time_range[1]),
+            default_key
+        )
+        if key != keys[-1]:
+            bounds.append(edge)
+            keys.append(key)
+    return bounds, keys
+
+
+class CompiledPhaseModel:
+    """
+    Phase boundaries for one configuration, precomputed as sorted arrays.
+
+    detect() is a bisect over elapsed time (or bean temperature, when the model
+    has temperature bounds and a reading is available); classify_series()
+    labels a whole event series at once.
+    """
+
+    def __init__(
+        self,
+        phases: Dict[str, RoastPhase],
+        time_bounds: Sequence[float],
+        time_keys: Sequence[str],
+        temp_bounds: Optional[Sequence[float]] = None,
+        temp_keys: Optional[Sequence[str]] = None,
+        profile: Optional[MachineCharacteristics] = None
+    ):
+        self.phases = phases
+        self.time_bounds = list(time_bounds)
+        self.time_keys = list(time_keys)
+        self.temp_bounds: Optional[List[float]] = list(temp_bounds) if temp_bounds and temp_keys else None
+        self.temp_keys: Optional[List[str]] = list(temp_keys) if temp_bounds and temp_keys else None
+        self.profile = profile
+
+    @classmethod
+    def for_machine(cls, phases: Dict[str, RoastPhase], profile: MachineCharacteristics) -> "CompiledPhaseModel":
+        # Phase timing scales with the machine's typical roast length
+        time_scale = sum(profile.typical_roast_time) / 2 / REFERENCE_ROAST_MINUTES
+        return cls(
+            phases,
+            [bound * time_scale for bound in MACHINE_TIME_BOUNDS], MACHINE_PHASE_ORDER,
+            MACHINE_TEMP_BOUNDS, MACHINE_PHASE_ORDER,
+            profile
+        )
+
+    @classmethod
+    def first_match(cls, phases: Dict[str, RoastPhase], default_key: str) -> "CompiledPhaseModel":
+        time_bounds, time_keys = _first_match_time_bounds(phases, default_key)
+        return cls(phases, time_bounds, time_keys)
+
+    def key_at_time(self, elapsed_seconds: float) -> str:
+        return self.time_keys[bisect.bisect_right(self.time_bounds, elapsed_seconds)]
+
+    def key_at_temp(self, temp_f: float) -> str:
+        if self.temp_bounds is None or self.temp_keys is None:
+            raise ValueError("Phase model has no temperature bounds")
+        return self.temp_keys[bisect.bisect_right(self.temp_bounds, temp_f)]
+
+    def is_temp_consistent(self, key: str, temp_f: float) -> bool:
+        """Temperature plausible for the phase (its range, +50°F tolerance above)"""
+        min_temp, max_temp = self.phases[key].temp_range
+        return min_temp <= temp_f <= max_temp + 50
+
+    def detect(self, elapsed_seconds: float, temp_f: Optional[float] = None) -> str:
+        """Phase key for one reading; temperature decides when the model has temperature bounds"""
+        time_key = self.key_at_time(elapsed_seconds)
+        if temp_f is None or self.temp_bounds is None:
+            return time_key
+        key = self.key_at_temp(temp_f)
+        if key != time_key:
+            logger.debug(f"Phase by temperature ({key}) differs from phase by time ({time_key}) at {elapsed_seconds}s")
+        return key
+
+    def classify_series(self, times, temps=None) -> List[str]:
+        """
+        Phase key per reading for a whole series (e.g. a historical roast).
+
+        `temps` may contain None for readings without a temperature; those fall
+        back to time, as detect() does.
+        """
+        if np is None:
+            temps = temps if temps is not None else [None] * len(times)
+            return [self.detect(t, temp) for t, temp in zip(times, temps)]
+
+        times = np.asarray(times, dtype=float)
+        indexes = np.searchsorted(self.time_bounds, times, side="right")
+        labels = np.asarray(self.time_keys, dtype=object)[indexes]
+        if temps is not None and self.temp_bounds is not None and self.temp_keys is not None:
+            temps = np.asarray([np.nan if temp is None else temp for temp in temps], dtype=float)
+            has_temp = ~np.isnan(temps)
+            temp_indexes = np.searchsorted(self.temp_bounds, temps[has_temp], side="right")
+            labels[has_temp] = np.asarray(self.temp_keys, dtype=object)[temp_indexes]
+        return labels.tolist()
+
+    def classify_events(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        [{t_offset_sec, temp_f, phase}] in time order - one per temperature
+        reading, or per timed event when the roast has no readings at all
+        """
+        timed = [e for e in events if e.get("t_offset_sec") is not None]
+        readings = [e for e in timed if e.get("temp_f") is not None]
+        timed = sorted(readings or timed, key=lambda e: e["t_offset_sec"])
+        temps = [e.get("temp_f") for e in timed]
+        keys = self.classify_series([e["t_offset_sec"] for e in timed], temps)
+        return [
+            {"t_offset_sec": e["t_offset_sec"], "temp_f": temp, "phase": key}
+            for e, temp, key in zip(timed, temps, keys)
+        ]
+
+
+def phase_durations(labeled_events: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Seconds spent in each phase from classify_events() output (each gap counts toward the earlier event's phase)"""
+    durations: Dict[str, float] = {}
+    for current, following in zip(labeled_events, labeled_events[1:]):
+        gap = following["t_offset_sec"] - current["t_offset_sec"]
+        durations[current["phase"]] = durations.get(current["phase"], 0.0) + gap
+    return durations
+
+
 class PhaseDetector:
     """Detects current roasting phase based on time and temperature with FreshRoast machine awareness"""
     
     def __init__(self):
         self.machine_profiles = FreshRoastMachineProfiles()
-        self.phases = {
-            "drying": RoastPhase(
-                name="Drying Phase",
-                time_range=(0, 240),  # 0-4 minutes
-                temp_range=(200, 300),
-                indicators=[
-                    "Beans turning from green to yellow",
-                    "Grassy smell becoming sweet",
-                    "Moisture evaporating"
-                ],
-                coaching_focus="Focus on moisture removal and even heat distribution",
-                dos=[
-                    "Maintain steady heat",
-                    "Allow moisture to escape gradually",
-                    "Watch for color change to yellow"
-                ],
-                donts=[
-                    "Don't rush this phase",
-                    "Don't reduce fan too much (need airflow)",
-                    "Don't expect cracking sounds yet"
-                ]
-            ),
-            "maillard": RoastPhase(
-                name="Maillard Reaction Phase",
-                time_range=(240, 480),  # 4-8 minutes
-                temp_range=(300, 380),
-                indicators=[
-                    "Beans browning (Maillard reactions)",
-                    "Sweet, bready aromas developing",
-                    "Beans expanding in size"
-                ],
-                coaching_focus="Monitor browning rate and prepare for first crack",
-                dos=[
-                    "Watch temperature rise rate (should be 8-12°F/min)",
-                    "Adjust heat to control browning speed",
-                    "Listen for beginning of first crack"
-                ],
-                donts=[
-                    "Don't let temperature stall",
-                    "Don't increase heat too aggressively",
-                    "Don't expect full development yet"
-                ]
-            ),
-            "development": RoastPhase(
-                name="Development Phase",
-                time_range=(300, 480),  # 5-8 minutes
-                temp_range=(380, 435),
-                indicators=[
-                    "First crack active or completed",
-                    "Oils beginning to surface",
-                    "Flavor compounds developing"
-                ],
-                coaching_focus="Control development time and roast level",
-                dos=[
-                    "Time from first crack to drop (development time)",
-                    "Adjust heat to control roast level",
-                    "Monitor for desired roast color"
-                ],
-                donts=[
-                    "Don't let temperature spike uncontrollably",
-                    "Don't drop before first crack finishes (usually)",
-                    "Don't ignore second crack if it starts"
-                ]
-            ),
-            "finishing": RoastPhase(
-                name="Finishing Phase",
-                time_range=(720, 900),  # 12-15 minutes
-                temp_range=(420, 450),
-                indicators=[
-                    "Second crack may be approaching or active",
-                    "Heavy oil development",
-                    "Smoke increasing"
-                ],
-                coaching_focus="Decide drop point and cool quickly",
-                dos=[
-                    "Decide your drop point based on desired roast",
-                    "Cool beans immediately after drop",
-                    "Be ready to drop quickly if needed"
-                ],
-                donts=[
-                    "Don't go into second crack unless intentional",
-                    "Don't delay drop if target reached",
-                    "Don't let beans bake"
-                ]
-            )
-        }
-    
+        self.phases = ROAST_PHASES
+        # Default to finishing if beyond expected time
+        self.model = CompiledPhaseModel.first_match(self.phases, "finishing")
+
     def detect_phase(self, elapsed_seconds: int, current_temp_f: Optional[float] = None) -> RoastPhase:
         """Detect current roasting phase"""
-        
+
         # Time-based detection (primary)
-        for phase_key, phase in self.phases.items():
-            min_time, max_time = phase.time_range
-            if min_time <= elapsed_seconds < max_time:
-                # If we have temperature, validate it makes sense
-                if current_temp_f:
-                    min_temp, max_temp = phase.temp_range
-                    if not (min_temp <= current_temp_f <= max_temp + 50):  # +50°F tolerance
-                        logger.warning(f"Temperature {current_temp_f}°F unusual for {phase.name} at {elapsed_seconds}s")
-                
-                return phase
-        
-        # Default to finishing if beyond expected time
-        return self.phases["finishing"]
+        key = self.model.key_at_time(elapsed_seconds)
+        phase = self.phases[key]
+        # If we have temperature, validate it makes sense
+        if current_temp_f and not self.model.is_temp_consistent(key, current_temp_f):
+            logger.warning(f"Temperature {current_temp_f}°F unusual for {phase.name} at {elapsed_seconds}s")
+        return phase
     
     def get_phase_context(self, phase: RoastPhase, elapsed_seconds: int, current_temp_f: Optional[float]) -> str:
         """Generate detailed phase context for AI prompt"""
@@ -239,94 +384,18 @@ class MachineAwarePhaseDetector:
     
     def __init__(self):
         self.machine_profiles = FreshRoastMachineProfiles()
-        # Keep existing RoastPhase definitions from PhaseDetector
-        self.phases = {
-            "drying": RoastPhase(
-                name="Drying Phase",
-                time_range=(0, 240),  # 0-4 minutes
-                temp_range=(200, 300),
-                indicators=[
-                    "Beans turning from green to yellow",
-                    "Grassy smell becoming sweet",
-                    "Moisture evaporating"
-                ],
-                coaching_focus="Focus on moisture removal and even heat distribution",
-                dos=[
-                    "Maintain steady heat",
-                    "Allow moisture to escape gradually",
-                    "Watch for color change to yellow"
-                ],
-                donts=[
-                    "Don't rush this phase",
-                    "Don't reduce fan too much (need airflow)",
-                    "Don't expect cracking sounds yet"
-                ]
-            ),
-            "maillard": RoastPhase(
-                name="Maillard Reaction Phase",
-                time_range=(240, 480),  # 4-8 minutes
-                temp_range=(300, 380),
-                indicators=[
-                    "Beans browning (Maillard reactions)",
-                    "Sweet, bready aromas developing",
-                    "Beans expanding in size"
-                ],
-                coaching_focus="Monitor browning rate and prepare for first crack",
-                dos=[
-                    "Watch temperature rise rate (should be 8-12°F/min)",
-                    "Adjust heat to control browning speed",
-                    "Listen for beginning of first crack"
-                ],
-                donts=[
-                    "Don't let temperature stall",
-                    "Don't increase heat too aggressively",
-                    "Don't expect full development yet"
-                ]
-            ),
-            "development": RoastPhase(
-                name="Development Phase",
-                time_range=(300, 480),  # 5-8 minutes
-                temp_range=(380, 435),
-                indicators=[
-                    "First crack active or completed",
-                    "Oils beginning to surface",
-                    "Flavor compounds developing"
-                ],
-                coaching_focus="Control development time and roast level",
-                dos=[
-                    "Time from first crack to drop (development time)",
-                    "Adjust heat to control roast level",
-                    "Monitor for desired roast color"
-                ],
-                donts=[
-                    "Don't let temperature spike uncontrollably",
-                    "Don't drop before first crack finishes (usually)",
-                    "Don't ignore second crack if it starts"
-                ]
-            ),
-            "finishing": RoastPhase(
-                name="Finishing Phase",
-                time_range=(720, 900),  # 12-15 minutes
-                temp_range=(420, 450),
-                indicators=[
-                    "Second crack may be approaching or active",
-                    "Heavy oil development",
-                    "Smoke increasing"
-                ],
-                coaching_focus="Decide drop point and cool quickly",
-                dos=[
-                    "Decide your drop point based on desired roast",
-                    "Cool beans immediately after drop",
-                    "Be ready to drop quickly if needed"
-                ],
-                donts=[
-                    "Don't go into second crack unless intentional",
-                    "Don't delay drop if target reached",
-                    "Don't let beans bake"
-                ]
-            )
-        }
-    
+        self.phases = ROAST_PHASES
+        self._models: Dict[tuple, CompiledPhaseModel] = {}
+
+    def get_model(self, machine_model: str, has_extension: bool) -> CompiledPhaseModel:
+        """Compiled phase model for a machine configuration (built once, then cached)"""
+        key = (machine_model, has_extension)
+        model = self._models.get(key)
+        if model is None:
+            profile = self.machine_profiles.get_profile(machine_model, has_extension)
+            model = self._models[key] = CompiledPhaseModel.for_machine(self.phases, profile)
+        return model
+
     def detect_phase_for_machine(
         self,
         machine_model: str,
@@ -335,37 +404,19 @@ class MachineAwarePhaseDetector:
         current_temp: Optional[float] = None
     ) -> tuple[RoastPhase, MachineCharacteristics]:
         """Detect phase with machine-specific expectations"""
-        
-        # Get machine profile
-        profile = self.machine_profiles.get_profile(machine_model, has_extension)
-        
-        # Adjust phase timing based on machine
-        typical_roast_time_minutes = sum(profile.typical_roast_time) / 2
-        time_scale = typical_roast_time_minutes / 10  # Scale to typical roast
-        
-        # If we have temperature, use temperature-based detection as primary
-        if current_temp is not None:
-            # Temperature-based phase detection (more accurate)
-            if current_temp < 300:
-                phase = self.phases["drying"]
-            elif current_temp <= 380:  # Include 380°F in Maillard phase
-                phase = self.phases["maillard"]
-            elif current_temp < 420:
-                phase = self.phases["development"]
-            else:
-                phase = self.phases["finishing"]
-        else:
-            # Fall back to time-based detection
-            if elapsed_seconds < 240 * time_scale:
-                phase = self.phases["drying"]
-            elif elapsed_seconds < 480 * time_scale:
-                phase = self.phases["maillard"]
-            elif elapsed_seconds < 720 * time_scale:
-                phase = self.phases["development"]
-            else:
-                phase = self.phases["finishing"]
-        
+
+        # If we have temperature, it decides (more accurate); otherwise machine-scaled time
+        model = self.get_model(machine_model, has_extension)
+        phase = self.phases[model.detect(elapsed_seconds, current_temp)]
+        profile = model.profile
+        if profile is None:
+            # get_model() always compiles with the profile; look it up rather than return None
+            profile = self.machine_profiles.get_profile(machine_model, has_extension)
         return phase, profile
+
+    def classify_events(self, machine_model: str, has_extension: bool, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Phase label for every event of a (historical) roast on this machine"""
+        return self.get_model(machine_model, has_extension).classify_events(events)
     
     def get_machine_specific_context(
         self,
@@ -449,6 +500,9 @@ Target Temperature: {phase_data['target_temp_range'][0]}-{phase_data['target_tem
         
         return context
 
+# Global instance
+machine_phase_detector = MachineAwarePhaseDetector()
+
 class PhaseAwarePromptBuilder:
     """Builds enhanced prompts with roasting phase knowledge and FreshRoast machine awareness"""
     
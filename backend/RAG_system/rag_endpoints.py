@@ -13,8 +13,11 @@ import logging
 
 # Import functions inside endpoints to avoid circular imports
 from main import get_supabase, verify_jwt_token
+from utils.pagination import fetch_roast_events
 from .llm_integration import llm_copilot, machine_aware_llm
 from .dtr_knowledge import DTRTargets, dtr_coach
+from .curve_analysis import analyze_curve
+from .roast_stream import stream_for_progress
 
 def get_freshroast_recommendations(roast_level: str, environmental_conditions: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
@@ -253,14 +256,27 @@ async def create_roast_outcome(
 ):
     """
     Create a roast outcome record for RAG system
+    
+    Curve metrics (phases, DTR, ROR, crash/flick, AUC) are computed from the
+    roast's logged events rather than trusted from the client.
     """
     try:
-        # For now, return a mock response
+        sb = get_supabase()
+        roast_result = sb.table("roast_entries").select("id").eq("id", request.roast_id).eq("user_id", user_id).execute()
+        if not roast_result.data:
+            raise HTTPException(status_code=404, detail="Roast not found")
+        
+        curve = analyze_curve(fetch_roast_events(sb, request.roast_id, "kind, t_offset_sec, temp_f"))
+        
+        # For now, return a mock outcome id
         return {
             "outcome_id": "mock_outcome_id",
-            "message": "Roast outcome created successfully (mock response)"
+            "message": "Roast outcome created successfully (mock response)",
+            "curve_metrics": curve.to_dict()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Create roast outcome error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -337,12 +353,9 @@ async def dtr_analysis(
         elapsed_time = roast_progress.get('elapsed_time', 0)
         current_temp = roast_progress.get('current_temp')
         
-        # Find first crack time
-        first_crack_time = None
-        for event in events:
-            if event.get('event_type') == 'first_crack':
-                first_crack_time = event.get('t_offset_sec')
-                break
+        # First crack time and smoothed ROR from the roast's streaming state
+        stream = stream_for_progress(roast_progress)
+        first_crack_time = int(stream.milestones['first_crack']) if 'first_crack' in stream.milestones else None
         
         # Get DTR analysis
         dtr_analysis = dtr_coach.get_dtr_aware_coaching(
@@ -351,7 +364,7 @@ async def dtr_analysis(
             elapsed_time=elapsed_time,
             first_crack_time=first_crack_time,
             current_temp=current_temp,
-            ror=roast_progress.get('ror', 0)
+            ror=stream.ror_per_min if stream.ror_per_min is not None else roast_progress.get('ror', 0)
         )
         
         # Get roast level profile
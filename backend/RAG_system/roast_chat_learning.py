@@ -1,12 +1,297 @@
 """
 Roast Chat Learning System - handles golden examples and feedback learning
 """
+import asyncio
+import bisect
 import logging
-from typing import Dict, Any, List, Optional
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Maximum golden examples kept per context (avoids overfitting)
+MAX_EXAMPLES_PER_CONTEXT = 10
+
+# Reload the whole index periodically to pick up other workers' inserts and score edits
+GOLDEN_INDEX_REFRESH_SECONDS = 600
+
+# Page size when loading the golden examples table
+GOLDEN_INDEX_PAGE_SIZE = 1000
+
+# Few-shot retrieval: candidates must share the sensor type (other sensors
+# are only used when there are none); exact extension-tube matches get a boost
+GOLDEN_EXAMPLE_TOKEN_BUDGET = 600
+EXACT_EXTENSION_BONUS = 0.10
+EFFECTIVENESS_WEIGHT = 0.15
+
+# Maximum cached example embeddings (least recently used are dropped)
+MAX_CACHED_EXAMPLE_VECTORS = 5000
+
+# Stored rows may have NULL context columns, so the parts are Optional
+ContextKey = Tuple[Optional[str], bool, Optional[str], Optional[str]]
+
+
+class GoldenExampleIndex:
+    """
+    In-memory index of roast_chat_golden_examples keyed by
+    (machine_model, has_extension, phase, sensor_type).
+    
+    Each context's examples are kept sorted by effectiveness_score (highest
+    first), so prompt building needs no database round-trip and counting a
+    context is O(1).
+    """
+    
+    def __init__(self):
+        self._examples: Dict[ContextKey, List[Dict[str, Any]]] = {}
+        self._neg_scores: Dict[ContextKey, List[float]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._load_lock = asyncio.Lock()
+    
+    @staticmethod
+    def context_key(machine_model: Optional[str], has_extension: bool, phase: Optional[str],
+                    sensor_type: Optional[str]) -> ContextKey:
+        return (machine_model, bool(has_extension), phase, sensor_type)
+    
+    def _key_for(self, example: Dict[str, Any]) -> ContextKey:
+        return self.context_key(
+            example.get('machine_model'),
+            example.get('has_extension', False),
+            example.get('roast_phase'),
+            example.get('temp_sensor_type')
+        )
+    
+    def _insert(self, examples, neg_scores, example: Dict[str, Any]):
+        """Insert keeping descending score order (callers hold the lock)"""
+        key = self._key_for(example)
+        bucket_scores = neg_scores.setdefault(key, [])
+        bucket = examples.setdefault(key, [])
+        neg_score = -float(example.get('effectiveness_score') or 0.0)
+        position = bisect.bisect_right(bucket_scores, neg_score)
+        bucket_scores.insert(position, neg_score)
+        bucket.insert(position, example)
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+    
+    @property
+    def is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.time() - self._loaded_at < GOLDEN_INDEX_REFRESH_SECONDS
+    
+    def load(self, supabase) -> bool:
+        """Load every golden example (paged) and swap in the new index"""
+        examples: Dict[ContextKey, List[Dict[str, Any]]] = {}
+        neg_scores: Dict[ContextKey, List[float]] = {}
+        total = 0
+        
+        try:
+            start = 0
+            while True:
+                result = supabase.table('roast_chat_golden_examples').select('*') \
+                    .range(start, start + GOLDEN_INDEX_PAGE_SIZE - 1).execute()
+                rows = result.data or []
+                for row in rows:
+                    self._insert(examples, neg_scores, row)
+                total += len(rows)
+                if len(rows) < GOLDEN_INDEX_PAGE_SIZE:
+                    break
+                start += GOLDEN_INDEX_PAGE_SIZE
+        except Exception as e:
+            logger.error(f"Error loading golden example index: {e}")
+            return False
+        
+        with self._lock:
+            self._examples = examples
+            self._neg_scores = neg_scores
+            self._loaded_at = time.time()
+        
+        logger.info(f"✅ Loaded {total} golden examples across {len(examples)} contexts")
+        return True
+    
+    async def ensure_loaded(self, supabase) -> bool:
+        """
+        Load on first use and refresh when stale. The paged load runs in a
+        worker thread and only one caller loads at a time; while a refresh is
+        in flight other callers keep using the current index.
+        """
+        if self.is_fresh:
+            return True
+        if supabase is None or (self.is_loaded and self._load_lock.locked()):
+            return self.is_loaded
+        
+        async with self._load_lock:
+            if self.is_fresh:
+                return True
+            loaded = await asyncio.to_thread(self.load, supabase)
+        return loaded or self.is_loaded
+    
+    def add(self, example: Dict[str, Any]):
+        """Incrementally add a newly inserted example"""
+        with self._lock:
+            self._insert(self._examples, self._neg_scores, example)
+    
+    def count(self, key: ContextKey) -> int:
+        with self._lock:
+            return len(self._examples.get(key, ()))
+    
+    def get(self, key: ContextKey, limit: int = 3) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._examples.get(key, ())[:limit])
+    
+    def total_count(self) -> int:
+        with self._lock:
+            return sum(len(bucket) for bucket in self._examples.values())
+    
+    def get_candidates(self, machine_model: str, phase: str) -> List[Dict[str, Any]]:
+        """All examples for a machine model and phase, across extension/sensor variants"""
+        with self._lock:
+            candidates = []
+            for key, bucket in self._examples.items():
+                if key[0] == machine_model and key[2] == phase:
+                    candidates.extend(bucket)
+            return candidates
+
+
+class GoldenExampleRetriever:
+    """
+    Ranks golden examples by embedding similarity to the current question
+    (FastEmbed, same model as the Weaviate pipeline) and packs the best ones
+    into a token budget. Example vectors are computed once and kept in a
+    bounded LRU cache.
+    """
+    
+    def __init__(self):
+        self._embedder = None
+        self._embedder_failed = False
+        self._vectors: "OrderedDict[Any, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _get_embedder(self):
+        if self._embedder is None and not self._embedder_failed:
+            try:
+                try:
+                    from .weaviate.weaviate_embeddings import EmbeddingGenerator
+                except ImportError:
+                    from RAG_system.weaviate.weaviate_embeddings import EmbeddingGenerator
+                embedder = EmbeddingGenerator()
+                if embedder.fastembed_model is None:
+                    raise RuntimeError("FastEmbed model unavailable")
+                self._embedder = embedder
+            except Exception as e:
+                logger.warning(f"⚠️ Golden example ranking disabled: {e}")
+                self._embedder_failed = True
+        return self._embedder
+    
+    @staticmethod
+    def _example_text(example: Dict[str, Any]) -> str:
+        return " ".join(filter(None, [example.get('user_question'), example.get('situation_summary')]))
+    
+    @staticmethod
+    def _normalize(vector: List[float]) -> List[float]:
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+    
+    @staticmethod
+    def _example_key(example: Dict[str, Any]):
+        return example.get('id') or example.get('source_feedback_id') or GoldenExampleRetriever._example_text(example)
+    
+    def _ensure_vectors(self, embedder, examples: List[Dict[str, Any]]) -> Dict[Any, List[float]]:
+        """Embed (in one batch) any examples not embedded yet; returns the examples' vectors"""
+        with self._lock:
+            missing = [e for e in examples if self._example_key(e) not in self._vectors]
+        
+        if missing:
+            vectors = embedder.generate_embeddings_batch([self._example_text(e) for e in missing])
+            with self._lock:
+                for example, vector in zip(missing, vectors):
+                    if vector:
+                        self._vectors[self._example_key(example)] = self._normalize(vector)
+        
+        with self._lock:
+            found = {}
+            for example in examples:
+                key = self._example_key(example)
+                vector = self._vectors.get(key)
+                if vector is not None:
+                    self._vectors.move_to_end(key)
+                    found[key] = vector
+            while len(self._vectors) > MAX_CACHED_EXAMPLE_VECTORS:
+                self._vectors.popitem(last=False)
+            return found
+    
+    def rank(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        has_extension: bool,
+        sensor_type: str,
+        limit: int = 3,
+        token_budget: int = GOLDEN_EXAMPLE_TOKEN_BUDGET
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Top-k most similar examples within the token budget; None if embeddings are unavailable"""
+        embedder = self._get_embedder()
+        if not embedder or not query:
+            return None
+        
+        query_vector = embedder.generate_embedding(query)
+        if not query_vector:
+            return None
+        query_vector = self._normalize(query_vector)
+        
+        # Readings from a different sensor aren't comparable - only fall back
+        # to them when there are no examples for this sensor type
+        same_sensor = [e for e in candidates if e.get('temp_sensor_type') == sensor_type]
+        if same_sensor:
+            candidates = same_sensor
+        
+        vectors = self._ensure_vectors(embedder, candidates)
+        
+        scored = []
+        for example in candidates:
+            vector = vectors.get(self._example_key(example))
+            if vector is None:
+                continue
+            score = sum(q * v for q, v in zip(query_vector, vector))
+            if bool(example.get('has_extension', False)) == bool(has_extension):
+                score += EXACT_EXTENSION_BONUS
+            score += EFFECTIVENESS_WEIGHT * float(example.get('effectiveness_score') or 0.0)
+            scored.append((score, example))
+        
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return fit_token_budget([example for _, example in scored], limit, token_budget)
+
+
+def fit_token_budget(examples: List[Dict[str, Any]], limit: int, token_budget: int) -> List[Dict[str, Any]]:
+    """Take examples in order until limit or the token budget is reached"""
+    selected = []
+    used_tokens = 0
+    for example in examples:
+        tokens = estimate_example_tokens(example)
+        if used_tokens + tokens > token_budget:
+            continue
+        selected.append(example)
+        used_tokens += tokens
+        if len(selected) >= limit:
+            break
+    return selected
+
+
+def estimate_example_tokens(example: Dict[str, Any]) -> int:
+    """Rough token estimate (~4 chars/token) of an example's few-shot block"""
+    text_length = sum(len(str(example.get(field) or '')) for field in
+                      ('situation_summary', 'user_question', 'excellent_response', 'why_its_good'))
+    return text_length // 4 + 20
+
+
+# Global instances
+golden_example_index = GoldenExampleIndex()
+golden_example_retriever = GoldenExampleRetriever()
+
 async def consider_for_golden_examples(feedback_id: str, feedback, user_id: str, supabase):
     """
     Consider adding positive feedback to golden examples for few-shot learning
@@ -19,16 +304,24 @@ async def consider_for_golden_examples(feedback_id: str, feedback, user_id: str,
         roast_phase = roast_context.get('phase', 'Unknown')
         temp_sensor_type = roast_context.get('temp_sensor_type', 'builtin')
         
-        # Check if we already have enough golden examples for this exact context
-        existing_examples = supabase.table('roast_chat_golden_examples').select('*').eq(
-            'machine_model', machine_model
-        ).eq('has_extension', has_extension).eq('roast_phase', roast_phase).eq(
-            'temp_sensor_type', temp_sensor_type
-        ).execute()
+        # Check if we already have enough golden examples for this exact context.
+        # A full bucket in this worker's index is final; otherwise ask the
+        # database, since other workers may have inserted since our last load.
+        context_key = GoldenExampleIndex.context_key(machine_model, has_extension, roast_phase, temp_sensor_type)
+        existing_count = 0
+        if await golden_example_index.ensure_loaded(supabase):
+            existing_count = golden_example_index.count(context_key)
+        if existing_count < MAX_EXAMPLES_PER_CONTEXT:
+            existing_examples = supabase.table('roast_chat_golden_examples').select('id', count='exact').eq(
+                'machine_model', machine_model
+            ).eq('has_extension', has_extension).eq('roast_phase', roast_phase).eq(
+                'temp_sensor_type', temp_sensor_type
+            ).limit(1).execute()
+            existing_count = existing_examples.count or 0
         
         # Limit to 10 examples per context to avoid overfitting
-        if len(existing_examples.data or []) >= 10:
-            logger.info(f"Already have 10+ golden examples for {machine_model}/{roast_phase}, skipping")
+        if existing_count >= MAX_EXAMPLES_PER_CONTEXT:
+            logger.info(f"Already have {MAX_EXAMPLES_PER_CONTEXT}+ golden examples for {machine_model}/{roast_phase}, skipping")
             return
         
         # Create situation summary
@@ -86,6 +379,8 @@ async def consider_for_golden_examples(feedback_id: str, feedback, user_id: str,
         result = supabase.table('roast_chat_golden_examples').insert(golden_example).execute()
         
         if result.data:
+            if golden_example_index.is_loaded:
+                golden_example_index.add(result.data[0])
             logger.info(f"✨ Added golden example from feedback {feedback_id}")
             logger.info(f"   Context: {situation_summary}")
             logger.info(f"   Response: {feedback.ai_message_text[:100]}...")
@@ -124,12 +419,38 @@ async def get_golden_examples_for_context(
     phase: str,
     sensor_type: str,
     supabase,
-    limit: int = 3
+    limit: int = 3,
+    query: Optional[str] = None,
+    token_budget: int = GOLDEN_EXAMPLE_TOKEN_BUDGET
 ) -> List[Dict[str, Any]]:
     """
     Retrieve golden examples for the given context for few-shot learning
+    
+    With a query (the user's question), examples for the machine/phase are
+    ranked by embedding similarity and packed into token_budget. Without one,
+    or if embeddings are unavailable, the exact context's best-scored
+    examples are returned (token_budget only applies to the ranked path).
     """
     try:
+        # Serve from the in-memory index when it's available
+        if await golden_example_index.ensure_loaded(supabase):
+            if query:
+                candidates = golden_example_index.get_candidates(machine_model, phase)
+                if candidates:
+                    # Embedding is CPU-bound - keep it off the event loop
+                    ranked = await asyncio.to_thread(
+                        golden_example_retriever.rank,
+                        query, candidates, has_extension, sensor_type, limit, token_budget
+                    )
+                    if ranked is not None:
+                        logger.info(f"Retrieved {len(ranked)} similarity-ranked golden examples for {machine_model}/{phase}")
+                        return ranked
+            
+            context_key = GoldenExampleIndex.context_key(machine_model, has_extension, phase, sensor_type)
+            examples = golden_example_index.get(context_key, limit)
+            logger.info(f"Retrieved {len(examples)} golden examples for {machine_model}/{phase} (index)")
+            return examples
+        
         # Query golden examples matching the context
         result = supabase.table('roast_chat_golden_examples').select('*').eq(
             'machine_model', machine_model
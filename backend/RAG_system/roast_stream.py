@@ -0,0 +1,328 @@
+"""
+Streaming Roast State
+Per-roast live temperature state updated in O(1) per logged reading
+
+Each active roast keeps a fixed-size ring buffer of recent readings, an
+exponentially smoothed rate of rise and spike/stall/crash/flick flags.
+log_event feeds readings in as they are logged; the coaching endpoints read
+the current state instead of rebuilding ROR from the full event list on every
+call. State is per worker: log_event checks it against the stored event count
+when the roast is new to the worker or hasn't been checked for
+STREAM_RESYNC_SECONDS, and catches up on (or rebuilds from) the stored events
+when readings were logged, edited or deleted through another worker.
+"""
+
+import math
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Any, List, Optional
+import logging
+
+from .curve_analysis import CRASH_DROP_F_PER_MIN, FLICK_RISE_F_PER_MIN, MILESTONE_KINDS
+
+logger = logging.getLogger(__name__)
+
+RING_BUFFER_SIZE = 64            # recent (t, temp) readings kept per roast
+ROR_EMA_TAU_SEC = 20.0           # time constant of the smoothed ROR
+SPIKE_RATE_PER_SEC = 2.0         # >2°F/sec between readings is a dangerous spike
+FAST_RISE_PER_MIN = 20.0         # >20°F/min between readings is a fast rise
+STALL_ROR_PER_MIN = 1.0          # smoothed ROR below this ...
+STALL_MIN_SECONDS = 60.0         # ... for this long (before first crack) is a stall
+STALL_GRACE_SECONDS = 120.0      # no stall calls during warm-up
+MAX_TRACKED_ROASTS = 1000
+STREAM_RESYNC_SECONDS = 30.0     # recheck against the stored events at most this often per roast
+
+
+class RoastStreamState:
+    """Live temperature state for one roast"""
+
+    def __init__(self, roast_id: Any = None, buffer_size: int = RING_BUFFER_SIZE):
+        self.roast_id = roast_id
+        self.readings: deque = deque(maxlen=buffer_size)
+        self.ror_per_min: Optional[float] = None
+        self.milestones: Dict[str, float] = {}
+        self.last_heat: Optional[int] = None
+        self.last_fan: Optional[int] = None
+        self.last_event_t: Optional[float] = None
+        self.stored_events = 0           # roast_events rows folded in (see RoastStreamRegistry.sync)
+        self.synced_at: Optional[float] = None
+        self.last_analysis: Dict[str, Any] = self._empty_analysis()
+
+        self.is_stalled = False
+        self._stall_since: Optional[float] = None
+        self.has_crash = False
+        self.has_flick = False
+        self._post_crack_peak: Optional[float] = None
+        self._post_crash_low: Optional[float] = None
+
+    @staticmethod
+    def _empty_analysis() -> Dict[str, Any]:
+        return {
+            'has_data': False,
+            'has_spike': False,
+            'is_fast': False,
+            'rate_per_min': 0.0,
+            'rate_per_sec': 0.0,
+            'temp_change': 0.0,
+            'time_diff': 0.0,
+            'prev_temp': None
+        }
+
+    @property
+    def latest(self) -> Optional[tuple]:
+        return self.readings[-1] if self.readings else None
+
+    def update(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fold one logged event into the state and return its temperature analysis
+        (the shape _analyze_temperature_change has always returned, plus the
+        smoothed ROR and stall/crash/flick flags).
+        """
+        t_offset = event.get('t_offset_sec')
+        if t_offset is None:
+            return self.last_analysis
+        t_offset = float(t_offset)
+
+        kind = MILESTONE_KINDS.get((event.get('kind') or event.get('event_type') or '').upper())
+        if kind and kind not in self.milestones:
+            self.milestones[kind] = t_offset
+        if event.get('heat_level') is not None:
+            self.last_heat = event['heat_level']
+        if event.get('fan_level') is not None:
+            self.last_fan = event['fan_level']
+        if self.last_event_t is None or t_offset > self.last_event_t:
+            self.last_event_t = t_offset
+
+        temp = event.get('temp_f')
+        if temp is None:
+            return self.last_analysis
+        temp = float(temp)
+
+        analysis = self._empty_analysis()
+        previous = self.latest
+        if previous is None:
+            self.readings.append((t_offset, temp))
+            analysis['current_temp'] = temp
+            self.last_analysis = analysis
+            return analysis
+
+        prev_time, prev_temp = previous
+        time_diff = t_offset - prev_time
+        if time_diff <= 0:
+            # Same-second or out-of-order reading (e.g. an edited event) - nothing new to learn
+            return self.last_analysis
+
+        self.readings.append((t_offset, temp))
+        temp_change = temp - prev_temp
+        rate_per_sec = temp_change / time_diff
+        rate_per_min = rate_per_sec * 60
+
+        # Time-aware EMA: irregular logging intervals weigh in proportion to the gap
+        alpha = 1.0 - math.exp(-time_diff / ROR_EMA_TAU_SEC)
+        self.ror_per_min = rate_per_min if self.ror_per_min is None else (
+            self.ror_per_min + alpha * (rate_per_min - self.ror_per_min)
+        )
+        self._update_flags(t_offset)
+
+        analysis.update({
+            'has_data': True,
+            'temp_change': temp_change,
+            'time_diff': time_diff,
+            'rate_per_sec': rate_per_sec,
+            'rate_per_min': rate_per_min,
+            'prev_temp': prev_temp,
+            'current_temp': temp,
+            'smoothed_ror_per_min': self.ror_per_min,
+            'is_stalled': self.is_stalled,
+            'has_crash': self.has_crash,
+            'has_flick': self.has_flick
+        })
+        # Detect dangerous spikes (>2°F/sec or >120°F/min), else fast rise (>20°F/min)
+        if abs(rate_per_sec) > SPIKE_RATE_PER_SEC:
+            analysis['has_spike'] = True
+        elif rate_per_min > FAST_RISE_PER_MIN:
+            analysis['is_fast'] = True
+
+        self.last_analysis = analysis
+        return analysis
+
+    def _update_flags(self, t_offset: float):
+        ror = self.ror_per_min
+        if ror is None:
+            return
+        first_crack = self.milestones.get('first_crack')
+
+        if first_crack is None:
+            if t_offset >= STALL_GRACE_SECONDS and ror < STALL_ROR_PER_MIN:
+                if self._stall_since is None:
+                    self._stall_since = t_offset
+                self.is_stalled = t_offset - self._stall_since >= STALL_MIN_SECONDS
+            else:
+                self._stall_since = None
+                self.is_stalled = False
+            return
+
+        self.is_stalled = False
+        if t_offset < first_crack:
+            return
+        if not self.has_crash:
+            peak = ror if self._post_crack_peak is None else max(self._post_crack_peak, ror)
+            self._post_crack_peak = peak
+            if peak - ror >= CRASH_DROP_F_PER_MIN:
+                self.has_crash = True
+                self._post_crash_low = ror
+        else:
+            low = ror if self._post_crash_low is None else min(self._post_crash_low, ror)
+            self._post_crash_low = low
+            if ror - low >= FLICK_RISE_F_PER_MIN:
+                self.has_flick = True
+
+    def catch_up(self, events: List[Dict[str, Any]]):
+        """Fold in any events newer than the state (e.g. logged on another worker)"""
+        if not events:
+            return
+        last = self.last_event_t
+        newer = []
+        for event in reversed(events):
+            t_offset = event.get('t_offset_sec')
+            if last is not None and t_offset is not None and t_offset <= last:
+                break
+            newer.append(event)
+        for event in sorted(newer, key=lambda e: e.get('t_offset_sec') or 0):
+            self.update(event)
+
+    def trend(self) -> Dict[str, Any]:
+        """analyze_temperature_trend()-shaped summary of the current state"""
+        if not self.readings:
+            return {"summary": "No temperature data yet"}
+        if self.ror_per_min is None:
+            return {"summary": "Insufficient temperature data"}
+        latest_temp = self.readings[-1][1]
+        return {
+            "summary": f"Current: {latest_temp:.1f}°F, ROR: {self.ror_per_min:.1f}°F/min",
+            "ror_per_min": self.ror_per_min,
+            "latest_temp": latest_temp,
+            "is_stalled": self.is_stalled,
+            "has_crash": self.has_crash,
+            "has_flick": self.has_flick
+        }
+
+
+class RoastStreamRegistry:
+    """Streaming state per active roast (bounded, least recently used dropped first)"""
+
+    def __init__(self, max_roasts: int = MAX_TRACKED_ROASTS):
+        self.max_roasts = max_roasts
+        self._states: "OrderedDict[str, RoastStreamState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_locked(self, roast_id: Any) -> RoastStreamState:
+        key = str(roast_id)
+        state = self._states.get(key)
+        if state is None:
+            state = RoastStreamState(roast_id)
+            self._install(key, state)
+        else:
+            self._states.move_to_end(key)
+        return state
+
+    def _install(self, key: str, state: RoastStreamState):
+        self._states[key] = state
+        self._states.move_to_end(key)
+        if len(self._states) > self.max_roasts:
+            self._states.popitem(last=False)
+
+    def get(self, roast_id: Any, events: Optional[List[Dict[str, Any]]] = None) -> RoastStreamState:
+        """
+        State for a roast, created on first use. `events` (the roast's event list,
+        if the caller has it) seeds a new state and catches an existing one up.
+        """
+        with self._lock:
+            state = self._get_locked(roast_id)
+            if events:
+                state.catch_up(events)
+            return state
+
+    def record(self, roast_id: Any, event: Dict[str, Any], events: Optional[List[Dict[str, Any]]] = None,
+               stored: bool = True) -> Dict[str, Any]:
+        """
+        Fold an event into the roast's state and return its analysis, all under
+        the registry lock. `events` catches the state up first (as in get());
+        `stored` is False for events that are not a newly inserted roast_events row.
+        """
+        with self._lock:
+            state = self._get_locked(roast_id)
+            if events:
+                state.catch_up(events)
+            analysis = state.update(event)
+            if stored:
+                state.stored_events += 1
+            return analysis
+
+    def needs_sync(self, roast_id: Any, max_age: float = STREAM_RESYNC_SECONDS) -> bool:
+        """True if the roast isn't tracked yet or wasn't checked against the stored events recently"""
+        with self._lock:
+            state = self._states.get(str(roast_id))
+            return state is None or state.synced_at is None or time.monotonic() - state.synced_at >= max_age
+
+    def sync(self, roast_id: Any, stored_count: int,
+             load_events: Callable[[Optional[float]], List[Dict[str, Any]]]):
+        """
+        Line the roast's state up with its stored events before a new one is logged.
+
+        load_events(after_t) returns the stored events newer than after_t (all of
+        them for None) in time order. Readings logged through another worker are
+        folded in; if the count still disagrees (events edited or deleted
+        elsewhere) the state is rebuilt from the full history.
+        """
+        key = str(roast_id)
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None and state.stored_events == stored_count:
+                state.synced_at = time.monotonic()
+                return
+            last_event_t = state.last_event_t if state is not None else None
+
+        if state is not None:
+            newer = load_events(last_event_t)
+            with self._lock:
+                if self._states.get(key) is state and state.stored_events + len(newer) == stored_count:
+                    for event in newer:
+                        state.update(event)
+                    state.stored_events = stored_count
+                    state.synced_at = time.monotonic()
+                    return
+
+        events = load_events(None)
+        rebuilt = RoastStreamState(roast_id)
+        for event in events:
+            rebuilt.update(event)
+        rebuilt.stored_events = len(events)
+        rebuilt.synced_at = time.monotonic()
+        with self._lock:
+            self._install(key, rebuilt)
+
+    def reset(self, roast_id: Any):
+        """Forget a roast (its history was edited or it was deleted) - rebuilt on next use"""
+        with self._lock:
+            self._states.pop(str(roast_id), None)
+
+
+def stream_for_progress(roast_progress: Dict[str, Any]) -> RoastStreamState:
+    """
+    The live state for a coaching request's roast_progress payload.
+
+    Uses roast_id when present (caught up with any newer events in the payload);
+    without one, a throwaway state is built from the payload's events.
+    """
+    events = roast_progress.get('events') or roast_progress.get('recent_events') or []
+    roast_id = roast_progress.get('roast_id')
+    if roast_id in (None, '', 'unknown'):
+        state = RoastStreamState()
+        state.catch_up(sorted(events, key=lambda e: e.get('t_offset_sec') or 0))
+        return state
+    return roast_streams.get(roast_id, events)
+
+# Global instance
+roast_streams = RoastStreamRegistry()
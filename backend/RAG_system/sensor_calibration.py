@@ -0,0 +1,388 @@
+"""
+Learned Built-in Sensor Calibration
+Per-machine offset curves fitted from the user's own roasts
+
+The default builtin_offsets schedule is one step table for every FreshRoast,
+but the gap between the chamber sensor and the beans varies by unit, extension
+tube, batch size and ambient temperature. This fits, per machine, the offset
+at each schedule anchor (interpolated in between) plus batch-size and ambient
+terms, from:
+  - paired readings: events where the user logged a reference probe
+    (probe_temp_f) next to the built-in reading (temp_f)
+  - milestones: the built-in reading at dry end and first crack against the
+    bean temperature those milestones happen at
+
+The fit is ridge regression toward the default schedule, so a machine with a
+few roasts moves only part way. Only the normal-equation sums are stored, so
+each new roast is folded in without revisiting the old ones. Writes are
+conditional on the row's version, so concurrent updates from several workers
+retry on fresh sums instead of overwriting each other.
+"""
+
+import time
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from .temperature_calibration import temperature_calibrator
+
+logger = logging.getLogger(__name__)
+
+MODELS_TABLE = "sensor_calibration_models"
+
+REFERENCE_BATCH_G = 100.0        # batch and ambient terms are relative to these ...
+REFERENCE_AMBIENT_F = 70.0
+BATCH_UNIT_G = 100.0             # ... in these units
+AMBIENT_UNIT_F = 10.0
+
+PRIOR_STRENGTH = 5.0             # pull toward the default schedule, in paired-sample equivalents
+MILESTONE_SAMPLE_WEIGHT = 0.5    # milestone bean temps are typical values, not measurements
+MIN_FITTED_SAMPLES = 3           # below this the default schedule is used
+OFFSET_SANITY_RANGE = (-20.0, 80.0)
+CACHE_TTL_SECONDS = 300
+SAVE_ATTEMPTS = 3                # reload-and-retry rounds when another worker saved first
+PAGE_SIZE = 1000                 # Supabase returns at most 1000 rows per request
+ROAST_CHUNK_SIZE = 200           # roast ids per in_() filter (keeps the URL short)
+UNIQUE_VIOLATION = "23505"
+EVENT_COLUMNS = "roast_id, kind, t_offset_sec, temp_f, probe_temp_f"
+
+# Bean temperature at milestone events (°F): end of drying per the phase table,
+# first crack at the middle of the probe first-crack target
+MILESTONE_BEAN_TEMPS = {
+    "DRY_END": 300.0,
+    "FIRST_CRACK": sum(temperature_calibrator.get_target_temperature_range('probe', 'first_crack')) / 2,
+}
+
+
+def _anchors() -> np.ndarray:
+    return temperature_calibrator.offset_schedule()[0]
+
+
+def _features(elapsed, batch_g: Optional[float], ambient_f: Optional[float]) -> np.ndarray:
+    """Design matrix: one hat function per schedule anchor, then batch and ambient terms"""
+    elapsed = np.atleast_1d(np.asarray(elapsed, dtype=float))
+    anchors = _anchors()
+    hats = np.column_stack([np.interp(elapsed, anchors, row) for row in np.eye(anchors.size)])
+    batch = 0.0 if batch_g is None else (batch_g - REFERENCE_BATCH_G) / BATCH_UNIT_G
+    ambient = 0.0 if ambient_f is None else (ambient_f - REFERENCE_AMBIENT_F) / AMBIENT_UNIT_F
+    extra = np.tile([batch, ambient], (elapsed.size, 1))
+    return np.hstack([hats, extra])
+
+
+def _prior() -> np.ndarray:
+    """Coefficients of the default schedule (no batch or ambient effect)"""
+    return np.concatenate([temperature_calibrator.offset_schedule()[1], [0.0, 0.0]])
+
+
+@dataclass
+class SensorCalibrationModel:
+    """Fitted built-in sensor offset curve for one machine"""
+    machine_id: Any
+    user_id: Optional[str] = None
+    xtx: Optional[np.ndarray] = None
+    xty: Optional[np.ndarray] = None
+    sample_count: float = 0.0
+    roast_ids: List[int] = field(default_factory=list)
+    coefficients: Optional[np.ndarray] = None
+    updated_at: Optional[str] = None
+    version: int = 0                 # row version this was loaded at (0: not stored yet)
+
+    def __post_init__(self):
+        self._normal_equations()
+        self._coefficients()
+
+    def _normal_equations(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self.xtx is None or self.xty is None:
+            size = _anchors().size + 2
+            self.xtx = np.zeros((size, size))
+            self.xty = np.zeros(size)
+        return self.xtx, self.xty
+
+    def _coefficients(self) -> np.ndarray:
+        if self.coefficients is None:
+            self.coefficients = _prior()
+        return self.coefficients
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.sample_count >= MIN_FITTED_SAMPLES
+
+    def add_samples(self, elapsed, offsets, weight: float = 1.0,
+                    batch_g: Optional[float] = None, ambient_f: Optional[float] = None):
+        """Fold (elapsed, built-in minus bean temp) samples into the normal equations"""
+        offsets = np.atleast_1d(np.asarray(offsets, dtype=float))
+        if offsets.size == 0:
+            return
+        design = _features(elapsed, batch_g, ambient_f)
+        xtx, xty = self._normal_equations()
+        xtx += weight * design.T @ design
+        xty += weight * design.T @ offsets
+        self.sample_count += weight * offsets.size
+
+    def solve(self):
+        prior = _prior()
+        regularizer = PRIOR_STRENGTH * np.eye(prior.size)
+        xtx, xty = self._normal_equations()
+        self.coefficients = np.linalg.solve(xtx + regularizer, xty + regularizer @ prior)
+
+    def offsets(self, elapsed, batch_g: Optional[float] = None, ambient_f: Optional[float] = None) -> np.ndarray:
+        """Built-in sensor offset (°F above bean temp) at each elapsed time"""
+        return _features(elapsed, batch_g, ambient_f) @ self._coefficients()
+
+    def summary(self) -> Dict[str, Any]:
+        anchors, defaults = temperature_calibrator.offset_schedule()
+        coefficients = self._coefficients()
+        return {
+            "machine_id": self.machine_id,
+            "is_fitted": self.is_fitted,
+            "sample_count": round(self.sample_count, 1),
+            "roast_count": len(self.roast_ids),
+            "offsets_f": [
+                {"t_offset_sec": float(t), "learned": round(float(v), 1), "default": float(d)}
+                for t, v, d in zip(anchors, coefficients, defaults)
+            ],
+            "per_100g_batch_f": round(float(coefficients[-2]), 2),
+            "per_10f_ambient_f": round(float(coefficients[-1]), 2),
+            "updated_at": self.updated_at
+        }
+
+    def to_row(self) -> Dict[str, Any]:
+        xtx, xty = self._normal_equations()
+        return {
+            "machine_id": self.machine_id,
+            "user_id": self.user_id,
+            "anchors": _anchors().tolist(),
+            "coefficients": self._coefficients().tolist(),
+            "xtx": xtx.tolist(),
+            "xty": xty.tolist(),
+            "sample_count": self.sample_count,
+            "roast_ids": self.roast_ids,
+            "updated_at": self.updated_at,
+            "version": self.version
+        }
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "SensorCalibrationModel":
+        if list(row.get("anchors") or []) != _anchors().tolist():
+            # The default schedule changed since this was fitted - the sums no longer line up
+            logger.info(f"🔄 Calibration anchors changed for machine {row.get('machine_id')}, starting over")
+            return cls(row.get("machine_id"), row.get("user_id"), version=int(row.get("version") or 0))
+        return cls(
+            machine_id=row["machine_id"],
+            user_id=row.get("user_id"),
+            xtx=np.asarray(row["xtx"], dtype=float),
+            xty=np.asarray(row["xty"], dtype=float),
+            sample_count=float(row.get("sample_count") or 0.0),
+            roast_ids=list(row.get("roast_ids") or []),
+            coefficients=np.asarray(row["coefficients"], dtype=float),
+            updated_at=row.get("updated_at"),
+            version=int(row.get("version") or 0)
+        )
+
+
+def calibration_samples(events: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    (elapsed, offsets, weight) from one built-in-sensor roast's events.
+
+    Paired probe readings are used when the roast has any; otherwise the
+    built-in reading at the milestones (interpolated from the readings when the
+    milestone itself has no temperature).
+    """
+    paired = [
+        (float(e["t_offset_sec"]), float(e["temp_f"]) - float(e["probe_temp_f"]))
+        for e in events
+        if e.get("t_offset_sec") is not None and e.get("temp_f") is not None and e.get("probe_temp_f") is not None
+    ]
+    weight = 1.0
+    if not paired:
+        weight = MILESTONE_SAMPLE_WEIGHT
+        readings = sorted(
+            (float(e["t_offset_sec"]), float(e["temp_f"]))
+            for e in events
+            if e.get("t_offset_sec") is not None and e.get("temp_f") is not None
+        )
+        seen = set()
+        for event in events:
+            kind = event.get("kind")
+            if kind not in MILESTONE_BEAN_TEMPS or kind in seen or event.get("t_offset_sec") is None:
+                continue
+            t_offset = float(event["t_offset_sec"])
+            if event.get("temp_f") is not None:
+                builtin = float(event["temp_f"])
+            elif readings and readings[0][0] <= t_offset <= readings[-1][0]:
+                times, temps = zip(*readings)
+                builtin = float(np.interp(t_offset, times, temps))
+            else:
+                continue
+            seen.add(kind)
+            paired.append((t_offset, builtin - MILESTONE_BEAN_TEMPS[kind]))
+
+    low, high = OFFSET_SANITY_RANGE
+    paired = [(t, offset) for t, offset in paired if low <= offset <= high]
+    if not paired:
+        return np.empty(0), np.empty(0), weight
+    elapsed, offsets = np.asarray(paired).T
+    return elapsed, offsets, weight
+
+
+class SensorCalibrationStore:
+    """Per-machine calibration models, cached in memory and persisted to Supabase"""
+
+    def __init__(self, ttl_seconds: float = CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._cache: Dict[str, Tuple[float, Optional[SensorCalibrationModel]]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, sb, machine_id) -> Optional[SensorCalibrationModel]:
+        result = sb.table(MODELS_TABLE).select("*").eq("machine_id", machine_id).execute()
+        return SensorCalibrationModel.from_row(result.data[0]) if result.data else None
+
+    def _save(self, sb, model: SensorCalibrationModel) -> bool:
+        """
+        Store the model unless another worker saved the machine's row since it
+        was loaded (compare-and-set on version). False means reload and retry.
+        """
+        model.updated_at = datetime.now(timezone.utc).isoformat()
+        row = dict(model.to_row(), version=model.version + 1)
+        if model.version == 0:
+            try:
+                sb.table(MODELS_TABLE).insert(row).execute()
+            except Exception as e:
+                if str(getattr(e, "code", "")) == UNIQUE_VIOLATION:
+                    return False
+                raise
+        else:
+            result = sb.table(MODELS_TABLE).update(row).eq("machine_id", model.machine_id).eq(
+                "version", model.version).execute()
+            if not result.data:
+                return False
+        model.version += 1
+        with self._lock:
+            self._cache[str(model.machine_id)] = (time.monotonic(), model)
+        return True
+
+    def get(self, sb, machine_id) -> Optional[SensorCalibrationModel]:
+        """The machine's model (None if it has never been fitted)"""
+        key = str(machine_id)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached and time.monotonic() - cached[0] < self.ttl_seconds:
+            return cached[1]
+        model = self._load(sb, machine_id)
+        with self._lock:
+            self._cache[key] = (time.monotonic(), model)
+        return model
+
+    def fitted(self, sb, machine_id) -> Optional[SensorCalibrationModel]:
+        """The machine's model if it has enough data to use, else None (default schedule)"""
+        if machine_id is None:
+            return None
+        try:
+            model = self.get(sb, machine_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load sensor calibration for machine {machine_id}: {e}")
+            return None
+        return model if model and model.is_fitted else None
+
+    @staticmethod
+    def _add_roast(model: SensorCalibrationModel, roast: Dict[str, Any], events: List[Dict[str, Any]]) -> bool:
+        elapsed, offsets, weight = calibration_samples(events)
+        if offsets.size == 0:
+            return False
+        model.add_samples(elapsed, offsets, weight, roast.get("weight_before_g"), roast.get("temperature_f"))
+        model.roast_ids.append(roast["id"])
+        return True
+
+    def update_from_roast(self, sb, roast_id: int) -> Optional[SensorCalibrationModel]:
+        """
+        Fold one finished roast into its machine's model (incremental refit).
+        No-op for probe machines and for roasts already folded in.
+
+        Always starts from the stored row (not the cache), so sums saved by
+        other workers are kept; a concurrent save makes this reload and retry.
+        """
+        roast_result = sb.table("roast_entries").select(
+            "id, user_id, machine_id, weight_before_g, temperature_f, machines(temp_sensor_type)"
+        ).eq("id", roast_id).execute()
+        if not roast_result.data:
+            return None
+        roast = roast_result.data[0]
+        machine_id = roast.get("machine_id")
+        if machine_id is None or ((roast.get("machines") or {}).get("temp_sensor_type") or "builtin") != "builtin":
+            return None
+
+        events: Optional[List[Dict[str, Any]]] = None
+        for _ in range(SAVE_ATTEMPTS):
+            model = self._load(sb, machine_id) or SensorCalibrationModel(machine_id, roast.get("user_id"))
+            if roast_id in model.roast_ids:
+                return model
+            if events is None:
+                events = _fetch_events(sb, [roast_id])
+            if not self._add_roast(model, roast, events):
+                return model
+            model.solve()
+            if self._save(sb, model):
+                logger.info(f"🌡️ Sensor calibration for machine {machine_id} updated from roast {roast_id} ({model.sample_count:.1f} samples)")
+                return model
+        logger.warning(f"⚠️ Sensor calibration for machine {machine_id} kept changing, roast {roast_id} not folded in")
+        return None
+
+    def refit(self, sb, machine_id, user_id: str) -> Optional[SensorCalibrationModel]:
+        """
+        Rebuild a machine's model from all of the user's roasts on it
+        (None if other workers kept saving it meanwhile)
+        """
+        roasts = _fetch_pages(
+            lambda: sb.table("roast_entries").select("id, weight_before_g, temperature_f").eq(
+                "machine_id", machine_id).eq("user_id", user_id),
+            "id"
+        )
+        by_roast: Dict[int, List[Dict[str, Any]]] = {}
+        for event in _fetch_events(sb, [roast["id"] for roast in roasts]):
+            by_roast.setdefault(event["roast_id"], []).append(event)
+
+        for _ in range(SAVE_ATTEMPTS):
+            stored = self._load(sb, machine_id)
+            model = SensorCalibrationModel(machine_id, user_id, version=stored.version if stored else 0)
+            for roast in roasts:
+                self._add_roast(model, roast, by_roast.get(roast["id"], []))
+            model.solve()
+            if self._save(sb, model):
+                logger.info(f"🌡️ Sensor calibration for machine {machine_id} refit from {len(model.roast_ids)} roasts")
+                return model
+        logger.warning(f"⚠️ Sensor calibration for machine {machine_id} kept changing during refit")
+        return None
+
+
+def _fetch_pages(build_query, order: str) -> List[Dict[str, Any]]:
+    """Every row of build_query(), paged past the per-request row cap (order must be total)"""
+    rows: List[Dict[str, Any]] = []
+    start = 0
+    while True:
+        query = build_query()
+        # postgrest-py 0.13 has no multi-column order(); set the parameter directly
+        query.params = query.params.add("order", order)
+        page = query.range(start, start + PAGE_SIZE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+def _fetch_events(sb, roast_ids: List[int]) -> List[Dict[str, Any]]:
+    """Calibration columns of every event of these roasts, in time order per roast"""
+    events: List[Dict[str, Any]] = []
+    for start in range(0, len(roast_ids), ROAST_CHUNK_SIZE):
+        chunk = roast_ids[start:start + ROAST_CHUNK_SIZE]
+        events.extend(_fetch_pages(
+            lambda: sb.table("roast_events").select(EVENT_COLUMNS).in_("roast_id", chunk),
+            "roast_id,t_offset_sec,id"
+        ))
+    return events
+
+# Global instance
+sensor_calibration = SensorCalibrationStore()
@@ -9,10 +9,13 @@ The built-in sensor reads 10-35°F higher than actual bean temperature,
 requiring calibration based on roast phase and elapsed time.
 """
 
+import bisect
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
 import logging
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -37,6 +40,7 @@ class TemperatureCalibrator:
             (420, 600): 10.0,    # 7-10 min: +10°F offset
             (600, float('inf')): 8.0  # 10+ min: +8°F offset
         }
+        self.compile_offsets()
         
         # Sensor-specific temperature targets for milestones
         self.milestone_targets = {
@@ -117,14 +121,115 @@ class TemperatureCalibrator:
                 offset_applied=0.0
             )
     
+    def compile_offsets(self):
+        """
+        Precompute the builtin_offsets schedule as sorted arrays (call again after
+        changing builtin_offsets): bucket starts and offsets for step lookups, and
+        anchor points (bucket midpoints, the open-ended last bucket at its start)
+        for interpolated ones.
+        """
+        buckets = sorted(self.builtin_offsets.items())
+        self._offset_starts = [start for (start, _), _ in buckets]
+        self._offset_values = np.array([offset for _, offset in buckets], dtype=float)
+        self._offset_anchors = np.array(
+            [start if end == float('inf') else (start + end) / 2 for (start, end), _ in buckets],
+            dtype=float
+        )
+        self._last_offset = float(self._offset_values[-1])
+
+    def offset_schedule(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(anchor times, offsets) of the default schedule - the points interpolation runs between"""
+        return self._offset_anchors, self._offset_values
+
     def _get_builtin_offset(self, elapsed_seconds: int) -> float:
         """Get built-in sensor offset based on elapsed time"""
-        for time_range, offset in self.builtin_offsets.items():
-            if time_range[0] <= elapsed_seconds < time_range[1]:
-                return offset
-        
-        # Fallback to last offset if time exceeds all ranges
-        return self.builtin_offsets[(600, float('inf'))]
+        index = bisect.bisect_right(self._offset_starts, elapsed_seconds) - 1
+        if index < 0:
+            # Fallback to last offset if time is outside all ranges
+            return self._last_offset
+        return float(self._offset_values[index])
+
+    def builtin_offset_series(self, elapsed_seconds, interpolate: bool = False) -> np.ndarray:
+        """
+        Built-in sensor offset for every elapsed time in an array.
+
+        Steps exactly like _get_builtin_offset(), or with interpolate=True ramps
+        linearly between bucket midpoints instead of jumping at bucket edges.
+        """
+        elapsed = np.asarray(elapsed_seconds, dtype=float)
+        if interpolate:
+            return np.interp(elapsed, self._offset_anchors, self._offset_values)
+        indexes = np.searchsorted(self._offset_starts, elapsed, side='right') - 1
+        return np.where(indexes < 0, self._last_offset, self._offset_values[np.maximum(indexes, 0)])
+
+    def _series_offsets(self, elapsed_seconds, interpolate: bool, model, batch_g, ambient_f) -> np.ndarray:
+        if model is not None:
+            return model.offsets(elapsed_seconds, batch_g, ambient_f)
+        return self.builtin_offset_series(elapsed_seconds, interpolate)
+
+    def calibrate_series(
+        self,
+        raw_temps,
+        elapsed_seconds,
+        sensor_type: Union[str, List[str]],
+        user_offset=None,
+        interpolate: bool = False,
+        model=None,
+        batch_g: Optional[float] = None,
+        ambient_f: Optional[float] = None
+    ) -> np.ndarray:
+        """
+        Calibrate a whole series of readings at once (a roast curve for charting
+        or analytics) - the array form of calibrate_reading().
+
+        Args:
+            raw_temps: Raw readings (None/NaN for missing ones, which stay NaN)
+            elapsed_seconds: Time of each reading since roast start
+            sensor_type: 'builtin' or 'probe', or one per reading
+            user_offset: Probe offset - one value or one per reading
+            interpolate: Interpolate built-in offsets between schedule buckets
+            model: Learned SensorCalibrationModel for the machine - replaces the
+                default built-in schedule (batch_g/ambient_f feed its terms)
+
+        Returns:
+            Calibrated temperatures as a float array
+        """
+        raw = np.array(raw_temps, dtype=float)
+        probe_offset = np.nan_to_num(np.array(user_offset if user_offset is not None else 0.0, dtype=float))
+        if isinstance(sensor_type, str):
+            if sensor_type == 'probe':
+                return raw + probe_offset
+            if sensor_type == 'builtin':
+                return raw - self._series_offsets(elapsed_seconds, interpolate, model, batch_g, ambient_f)
+            logger.warning(f"Unknown sensor type: {sensor_type}")
+            return raw
+
+        sensor_types = np.asarray(sensor_type)
+        builtin = raw - self._series_offsets(elapsed_seconds, interpolate, model, batch_g, ambient_f)
+        calibrated = np.where(sensor_types == 'probe', raw + probe_offset, raw)
+        return np.where(sensor_types == 'builtin', builtin, calibrated)
+
+    def calibrate_events(
+        self,
+        events: List[Dict[str, Any]],
+        sensor_type: str,
+        user_offset: Optional[float] = None,
+        interpolate: bool = False,
+        model=None,
+        batch_g: Optional[float] = None,
+        ambient_f: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Copies of roast events with temp_f calibrated (events without temp_f are unchanged)"""
+        indexes = [i for i, e in enumerate(events) if e.get('temp_f') is not None and e.get('t_offset_sec') is not None]
+        calibrated = self.calibrate_series(
+            [events[i]['temp_f'] for i in indexes],
+            [events[i]['t_offset_sec'] for i in indexes],
+            sensor_type, user_offset, interpolate, model, batch_g, ambient_f
+        )
+        result = [dict(event) for event in events]
+        for i, temp in zip(indexes, calibrated.tolist()):
+            result[i]['temp_f'] = round(temp, 1)
+        return result
     
     def get_target_temperature_range(
         self, 
@@ -0,0 +1,162 @@
+"""
+Test script for the Roast Curve Analysis Engine
+
+Checks the Savitzky-Golay / moving-window rate of rise against curves with a
+known derivative, post-first-crack crash and flick detection, and the
+short-curve edge cases. Needs NumPy; without it every test is skipped.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import numpy as np
+    from curve_analysis import analyze_curve, smoothed_ror, RESAMPLE_STEP_SEC
+    HAVE_NUMPY = True
+except ImportError as e:
+    HAVE_NUMPY = False
+    print(f"⚠️ Curve analysis tests skipped: {e}")
+
+
+def _events(times, temps, milestones=None):
+    events = [{"kind": "READING", "t_offset_sec": float(t), "temp_f": float(temp)} for t, temp in zip(times, temps)]
+    for kind, t_offset in (milestones or {}).items():
+        events.append({"kind": kind, "t_offset_sec": t_offset})
+    return events
+
+
+def _curve_from_ror(ror_per_min, step_sec=2.0, start_temp=200.0):
+    """Times and temperatures whose rate of rise follows ror_per_min(t)"""
+    times = np.arange(0.0, 720.0 + step_sec / 2, step_sec)
+    rates = np.array([ror_per_min(t) for t in times]) / 60.0
+    temps = start_temp + np.concatenate(([0.0], np.cumsum((rates[1:] + rates[:-1]) / 2 * step_sec)))
+    return times, temps
+
+
+def test_savgol_derivative_of_quadratic():
+    """Savitzky-Golay (order 2) is exact for a quadratic away from the live edge"""
+    if not HAVE_NUMPY:
+        return
+    step = RESAMPLE_STEP_SEC
+    times = np.arange(0.0, 600.0, step)
+    temps = 150.0 + 0.5 * times - 0.0003 * times ** 2
+    ror = smoothed_ror(temps, step, method="savgol")
+    expected = (0.5 - 0.0006 * times) * 60.0
+    half_width = int(round(30.0 / step)) // 2
+    assert np.allclose(ror[half_width:-half_width], expected[half_width:-half_width], atol=1e-6)
+
+
+def test_linear_ramp_has_constant_ror():
+    """Both smoothing methods give the exact slope of a straight line everywhere"""
+    if not HAVE_NUMPY:
+        return
+    times = np.arange(0.0, 300.0, RESAMPLE_STEP_SEC)
+    temps = 200.0 + times * (18.0 / 60.0)
+    for method in ("savgol", "moving"):
+        assert np.allclose(smoothed_ror(temps, RESAMPLE_STEP_SEC, method=method), 18.0), method
+
+
+def test_savgol_smooths_sensor_noise():
+    if not HAVE_NUMPY:
+        return
+    rng = np.random.default_rng(7)
+    times = np.arange(0.0, 600.0, RESAMPLE_STEP_SEC)
+    temps = 200.0 + times * (20.0 / 60.0) + rng.normal(0.0, 0.5, times.size)
+    raw = np.gradient(temps, RESAMPLE_STEP_SEC) * 60.0
+    smoothed = smoothed_ror(temps, RESAMPLE_STEP_SEC, method="savgol")
+    assert smoothed[20:-20].std() < raw[20:-20].std() / 5
+    assert abs(smoothed[20:-20].mean() - 20.0) < 1.0
+
+
+def test_crash_and_flick_detected():
+    """ROR collapsing after first crack and then climbing back is a crash followed by a flick"""
+    if not HAVE_NUMPY:
+        return
+
+    def ror(t):
+        if t < 480:
+            return 30.0 - t / 480 * 12.0          # steady decline to 18°F/min at first crack
+        if t < 540:
+            return 18.0 - (t - 480) / 60 * 16.0   # crash to 2°F/min within a minute
+        if t < 600:
+            return 2.0 + (t - 540) / 60 * 10.0    # flick back up to 12°F/min
+        return 12.0
+
+    times, temps = _curve_from_ror(ror)
+    result = analyze_curve(_events(times, temps, {"FIRST_CRACK": 480.0, "COOL": 720.0}))
+    assert result.has_crash and result.crash_sec is not None
+    assert 520 <= result.crash_sec <= 560
+    assert result.has_flick and result.flick_sec is not None
+    assert result.flick_sec > result.crash_sec
+
+
+def test_gentle_decline_is_not_a_crash():
+    if not HAVE_NUMPY:
+        return
+    times, temps = _curve_from_ror(lambda t: 25.0 - t / 720 * 15.0)
+    result = analyze_curve(_events(times, temps, {"FIRST_CRACK": 480.0, "COOL": 720.0}))
+    assert not result.has_crash
+    assert not result.has_flick
+    assert result.dtr_percent is not None and abs(result.dtr_percent - 240 / 720 * 100) < 0.01
+
+
+def test_area_under_linear_ramp():
+    """20°F/min for ten minutes above the turning point is 1000°F·min"""
+    if not HAVE_NUMPY:
+        return
+    times = np.arange(0.0, 601.0, 5.0)
+    result = analyze_curve(_events(times, 200.0 + times * (20.0 / 60.0), {"COOL": 600.0}))
+    assert result.auc is not None and abs(result.auc - 1000.0) < 1e-6
+
+
+def test_readings_closer_than_grid_step():
+    """Two readings under one resample step apart still give their slope as ROR"""
+    if not HAVE_NUMPY:
+        return
+    result = analyze_curve(_events([10.0, 11.0], [300.0, 301.0]))
+    assert result.has_data
+    assert abs(result.ror_per_min - 60.0) < 1e-9
+    assert result.times.size == 2
+
+
+def test_single_reading_has_no_ror():
+    if not HAVE_NUMPY:
+        return
+    result = analyze_curve(_events([10.0], [300.0]))
+    assert not result.has_data
+    assert result.reading_count == 1
+    assert result.latest_temp == 300.0
+
+
+def main():
+    """Run all curve analysis tests"""
+    print("🚀 Starting Curve Analysis Tests\n")
+    if not HAVE_NUMPY:
+        return
+
+    tests = [
+        test_savgol_derivative_of_quadratic,
+        test_linear_ramp_has_constant_ror,
+        test_savgol_smooths_sensor_noise,
+        test_crash_and_flick_detected,
+        test_gentle_decline_is_not_a_crash,
+        test_area_under_linear_ramp,
+        test_readings_closer_than_grid_step,
+        test_single_reading_has_no_ror
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+Test script for the golden example store behind few-shot prompting
+
+Checks the in-memory context index (score order, paged loading, incremental
+adds, cross-variant candidates), similarity ranking within the token budget
+and the per-context cap, against a stand-in for the
+roast_chat_golden_examples table and a keyword "embedder".
+"""
+
+import sys
+import os
+import asyncio
+from contextlib import contextmanager
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import RAG_system.roast_chat_learning as learning
+from RAG_system.roast_chat_learning import (
+    GoldenExampleIndex, GoldenExampleRetriever, MAX_EXAMPLES_PER_CONTEXT,
+    consider_for_golden_examples, estimate_example_tokens, fit_token_budget,
+    get_golden_examples_for_context
+)
+
+
+def _example(example_id, score, machine="SR800", extension=False, phase="Maillard", sensor="builtin", **fields):
+    return dict({
+        "id": example_id,
+        "machine_model": machine,
+        "has_extension": extension,
+        "roast_phase": phase,
+        "temp_sensor_type": sensor,
+        "effectiveness_score": score
+    }, **fields)
+
+
+class _Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _Query:
+    """Just enough of the PostgREST builder for the golden example queries"""
+
+    def __init__(self, table):
+        self.table = table
+        self.filters = {}
+        self.counting = False
+        self.inserting = False
+        self.window = None
+
+    def select(self, *columns, count=None):
+        self.counting = count == "exact"
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end)
+        return self
+
+    def limit(self, n):
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def insert(self, row):
+        self.table.inserted.append(row)
+        self.table.rows.append(dict(row, id=len(self.table.rows) + 1))
+        self.inserting = True
+        return self
+
+    def execute(self):
+        self.table.queries += 1
+        if self.inserting:
+            return _Result([self.table.rows[-1]])
+        matching = [r for r in self.table.rows if all(r.get(c) == v for c, v in self.filters.items())]
+        if self.window is not None:
+            start, end = self.window
+            matching = matching[start:end + 1]
+        return _Result(matching, len(matching) if self.counting else None)
+
+
+class _Supabase:
+    """Stand-in for the Supabase client holding one golden example table"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.inserted = []
+        self.queries = 0
+
+    def table(self, name):
+        assert name == "roast_chat_golden_examples"
+        return _Query(self)
+
+
+class _KeywordEmbedder:
+    """Embeds text as keyword counts, so similarity is predictable"""
+
+    KEYWORDS = ("heat", "fan", "crack", "stall")
+
+    def __init__(self):
+        self.embedded = 0
+
+    def generate_embedding(self, text):
+        vector = [float(text.lower().count(word)) for word in self.KEYWORDS]
+        return vector if any(vector) else [0.1] * len(self.KEYWORDS)
+
+    def generate_embeddings_batch(self, texts):
+        self.embedded += len(texts)
+        return [self.generate_embedding(text) for text in texts]
+
+
+class _KeywordRetriever(GoldenExampleRetriever):
+    def __init__(self):
+        super().__init__()
+        self.embedder = _KeywordEmbedder()
+
+    def _get_embedder(self):
+        return self.embedder
+
+
+@contextmanager
+def _globals(index, retriever):
+    """Swap in the module's index and retriever for a test"""
+    saved = learning.golden_example_index, learning.golden_example_retriever
+    learning.golden_example_index, learning.golden_example_retriever = index, retriever
+    try:
+        yield
+    finally:
+        learning.golden_example_index, learning.golden_example_retriever = saved
+
+
+def test_buckets_sorted_by_score():
+    index = GoldenExampleIndex()
+    assert index.load(_Supabase([_example(1, 0.2), _example(2, 0.9), _example(3, 0.5)]))
+    key = GoldenExampleIndex.context_key("SR800", False, "Maillard", "builtin")
+    assert [e["id"] for e in index.get(key, limit=3)] == [2, 3, 1]
+    assert index.count(key) == 3
+
+    index.add(_example(4, 0.7))
+    assert [e["id"] for e in index.get(key, limit=2)] == [2, 4]
+
+
+def test_load_pages_through_the_table():
+    page_size = learning.GOLDEN_INDEX_PAGE_SIZE
+    learning.GOLDEN_INDEX_PAGE_SIZE = 2
+    try:
+        supabase = _Supabase([_example(i, i / 10) for i in range(5)])
+        index = GoldenExampleIndex()
+        assert index.load(supabase)
+        assert index.total_count() == 5
+        assert supabase.queries == 3
+    finally:
+        learning.GOLDEN_INDEX_PAGE_SIZE = page_size
+
+
+def test_null_context_columns_get_their_own_key():
+    index = GoldenExampleIndex()
+    index.add(dict(_example(1, 1.0), temp_sensor_type=None))
+    assert index.count(GoldenExampleIndex.context_key("SR800", False, "Maillard", None)) == 1
+    assert index.count(GoldenExampleIndex.context_key("SR800", False, "Maillard", "builtin")) == 0
+
+
+def test_candidates_span_extension_and_sensor_variants():
+    index = GoldenExampleIndex()
+    for example in (_example(1, 1.0), _example(2, 1.0, extension=True), _example(3, 1.0, sensor="probe"),
+                    _example(4, 1.0, phase="Drying"), _example(5, 1.0, machine="SR540")):
+        index.add(example)
+    assert sorted(e["id"] for e in index.get_candidates("SR800", "Maillard")) == [1, 2, 3]
+
+
+def test_ensure_loaded_once_and_without_supabase():
+    index = GoldenExampleIndex()
+    assert not asyncio.run(index.ensure_loaded(None))
+
+    supabase = _Supabase([_example(1, 1.0)])
+    assert asyncio.run(index.ensure_loaded(supabase))
+    assert asyncio.run(index.ensure_loaded(supabase))
+    assert supabase.queries == 1
+
+
+def test_fit_token_budget_skips_oversized_examples():
+    small, large = {"user_question": "x" * 40}, {"user_question": "x" * 4000}
+    assert fit_token_budget([large, small, small], limit=2, token_budget=100) == [small, small]
+    assert estimate_example_tokens(small) == 30
+
+
+def test_rank_by_similarity():
+    candidates = [
+        _example(1, 0.0, user_question="How much fan?"),
+        _example(2, 0.0, user_question="Should I cut the heat?"),
+        _example(3, 0.0, user_question="Heat or fan before first crack?")
+    ]
+    ranked = _KeywordRetriever().rank("cut heat now?", candidates, False, "builtin", limit=2)
+    assert ranked is not None
+    assert [e["id"] for e in ranked] == [2, 3]
+
+
+def test_rank_prefers_matching_sensor_and_extension():
+    candidates = [
+        _example(1, 0.0, sensor="probe", user_question="heat"),
+        _example(2, 0.0, extension=True, user_question="heat"),
+        _example(3, 0.0, user_question="heat")
+    ]
+    ranked = _KeywordRetriever().rank("heat", candidates, False, "builtin", limit=3)
+    assert ranked is not None
+    assert [e["id"] for e in ranked] == [3, 2]                 # other sensor dropped
+
+
+def test_rank_embeds_each_example_once():
+    retriever = _KeywordRetriever()
+    candidates = [_example(i, 0.0, user_question="heat") for i in range(4)]
+    retriever.rank("heat", candidates, False, "builtin")
+    retriever.rank("fan", candidates, False, "builtin")
+    assert retriever.embedder.embedded == 4
+
+
+def test_rank_without_embedder_or_query():
+    retriever = GoldenExampleRetriever()
+    retriever._embedder_failed = True
+    assert retriever.rank("heat", [_example(1, 1.0)], False, "builtin") is None
+    assert _KeywordRetriever().rank("", [_example(1, 1.0)], False, "builtin") is None
+
+
+def test_fallback_ignores_the_token_budget():
+    """Without a query the context's top-scored examples come back whatever their size"""
+    index = GoldenExampleIndex()
+    index.add(_example(1, 0.9, excellent_response="x" * 4000))
+    index.add(_example(2, 0.5))
+    supabase = _Supabase([])
+    index._loaded_at = float("inf")
+    with _globals(index, _KeywordRetriever()):
+        examples = asyncio.run(get_golden_examples_for_context(
+            "SR800", False, "Maillard", "builtin", supabase, limit=3, token_budget=100
+        ))
+    assert [e["id"] for e in examples] == [1, 2]
+
+
+def test_ranked_path_uses_the_token_budget():
+    index = GoldenExampleIndex()
+    index.add(_example(1, 0.9, user_question="heat", excellent_response="x" * 4000))
+    index.add(_example(2, 0.5, user_question="heat"))
+    index._loaded_at = float("inf")
+    with _globals(index, _KeywordRetriever()):
+        examples = asyncio.run(get_golden_examples_for_context(
+            "SR800", False, "Maillard", "builtin", _Supabase([]), limit=3, query="heat", token_budget=100
+        ))
+    assert [e["id"] for e in examples] == [2]
+
+
+def _feedback():
+    return SimpleNamespace(
+        roast_context={"machine_model": "SR800", "has_extension": False, "phase": "Maillard",
+                       "temp_sensor_type": "builtin", "user_question": "heat?"},
+        ai_message_text="Drop the heat one step."
+    )
+
+
+def test_cap_counts_other_workers_examples():
+    """The local index may be behind; the database count decides"""
+    rows = [_example(i, 1.0) for i in range(MAX_EXAMPLES_PER_CONTEXT)]
+    index = GoldenExampleIndex()
+    for row in rows[:3]:
+        index.add(row)
+    index._loaded_at = float("inf")
+    supabase = _Supabase(rows)
+    with _globals(index, _KeywordRetriever()):
+        asyncio.run(consider_for_golden_examples("fb-1", _feedback(), "user-1", supabase))
+    assert supabase.inserted == []
+
+
+def test_cap_full_index_skips_the_database():
+    rows = [_example(i, 1.0) for i in range(MAX_EXAMPLES_PER_CONTEXT)]
+    index = GoldenExampleIndex()
+    for row in rows:
+        index.add(row)
+    index._loaded_at = float("inf")
+    supabase = _Supabase(rows)
+    with _globals(index, _KeywordRetriever()):
+        asyncio.run(consider_for_golden_examples("fb-1", _feedback(), "user-1", supabase))
+    assert supabase.queries == 0 and supabase.inserted == []
+
+
+def test_insert_below_cap_updates_the_index():
+    index = GoldenExampleIndex()
+    index._loaded_at = float("inf")
+    supabase = _Supabase([])
+    with _globals(index, _KeywordRetriever()):
+        asyncio.run(consider_for_golden_examples("fb-1", _feedback(), "user-1", supabase))
+    assert len(supabase.inserted) == 1
+    assert index.count(GoldenExampleIndex.context_key("SR800", False, "Maillard", "builtin")) == 1
+
+
+def main():
+    """Run all golden example tests"""
+    print("🚀 Starting Golden Example Tests\n")
+
+    tests = [
+        test_buckets_sorted_by_score,
+        test_load_pages_through_the_table,
+        test_null_context_columns_get_their_own_key,
+        test_candidates_span_extension_and_sensor_variants,
+        test_ensure_loaded_once_and_without_supabase,
+        test_fit_token_budget_skips_oversized_examples,
+        test_rank_by_similarity,
+        test_rank_prefers_matching_sensor_and_extension,
+        test_rank_embeds_each_example_once,
+        test_rank_without_embedder_or_query,
+        test_fallback_ignores_the_token_budget,
+        test_ranked_path_uses_the_token_budget,
+        test_cap_counts_other_workers_examples,
+        test_cap_full_index_skips_the_database,
+        test_insert_below_cap_updates_the_index
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled phase model
+
+The bisect lookups must return exactly what the old per-call loops over the
+phase dicts returned, including at every boundary; machine models scale
+their time bounds with the roast length and let temperature decide; and
+labeling a whole series (with or without NumPy) matches labeling each
+reading on its own.
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import phase_awareness
+from phase_awareness import (
+    CompiledPhaseModel, MachineAwarePhaseDetector, PhaseDetector, ROAST_PHASES, phase_durations
+)
+
+# Every phase edge, a hair either side of it, and some points in between
+PROBE_SECONDS = sorted({
+    edge + delta
+    for phase in ROAST_PHASES.values() for edge in phase.time_range
+    for delta in (-0.5, 0, 0.5)
+} | set(range(-60, 1200, 37)))
+
+
+def _loop_phase(elapsed_seconds):
+    """The per-call scan the compiled model replaced"""
+    for key, phase in ROAST_PHASES.items():
+        if phase.time_range[0] <= elapsed_seconds < phase.time_range[1]:
+            return key
+    return "finishing"
+
+
+def _loop_machine_phase(elapsed_seconds, temp_f, time_scale):
+    if temp_f is not None:
+        if temp_f < 300:
+            return "drying"
+        if temp_f <= 380:
+            return "maillard"
+        return "development" if temp_f < 420 else "finishing"
+    for key, bound in (("drying", 240), ("maillard", 480), ("development", 720)):
+        if elapsed_seconds < bound * time_scale:
+            return key
+    return "finishing"
+
+
+def test_first_match_equals_the_loop():
+    detector = PhaseDetector()
+    for elapsed_seconds in PROBE_SECONDS:
+        expected = ROAST_PHASES[_loop_phase(elapsed_seconds)]
+        assert detector.detect_phase(elapsed_seconds) is expected, elapsed_seconds
+    assert detector.model.time_bounds == [0, 240, 480]
+    assert detector.model.time_keys == ["finishing", "drying", "maillard", "finishing"]
+
+
+def test_machine_model_bounds():
+    detector = MachineAwarePhaseDetector()
+    for machine_model, has_extension in (("SR540", False), ("SR540", True), ("SR800", False), ("SR800", True)):
+        model = detector.get_model(machine_model, has_extension)
+        assert detector.get_model(machine_model, has_extension) is model          # compiled once
+        profile = model.profile
+        assert profile is not None
+        time_scale = sum(profile.typical_roast_time) / 2 / 10
+        for elapsed_seconds in PROBE_SECONDS:
+            for temp_f in (None, 250, 299.9, 300, 380, 380.1, 419.9, 420, 460):
+                phase, _ = detector.detect_phase_for_machine(machine_model, has_extension, elapsed_seconds, temp_f)
+                expected = _loop_machine_phase(elapsed_seconds, temp_f, time_scale)
+                assert phase is ROAST_PHASES[expected], (machine_model, has_extension, elapsed_seconds, temp_f)
+
+
+def test_series_matches_single_readings():
+    model = MachineAwarePhaseDetector().get_model("SR540", True)
+    temps = [None if i % 3 == 0 else 200 + i * 2.5 for i in range(len(PROBE_SECONDS))]
+    expected = [model.detect(t, temp) for t, temp in zip(PROBE_SECONDS, temps)]
+    assert model.classify_series(PROBE_SECONDS, temps) == expected
+    assert model.classify_series(PROBE_SECONDS) == [model.key_at_time(t) for t in PROBE_SECONDS]
+
+    numpy = phase_awareness.np
+    phase_awareness.np = None
+    try:
+        assert model.classify_series(PROBE_SECONDS, temps) == expected
+    finally:
+        phase_awareness.np = numpy
+
+
+def test_classify_events_and_durations():
+    events = [
+        {"kind": "CHARGE", "t_offset_sec": 0},
+        {"kind": "READING", "t_offset_sec": 120, "temp_f": 320},
+        {"kind": "READING", "t_offset_sec": 0, "temp_f": 150},
+        {"kind": "READING", "t_offset_sec": 400, "temp_f": 400},
+        {"kind": "READING", "t_offset_sec": 500, "temp_f": 425},
+        {"kind": "NOTE", "t_offset_sec": None, "temp_f": 500}
+    ]
+    labeled = MachineAwarePhaseDetector().classify_events("SR540", False, events)
+    assert [(e["t_offset_sec"], e["phase"]) for e in labeled] == [
+        (0, "drying"), (120, "maillard"), (400, "development"), (500, "finishing")
+    ]
+    assert phase_durations(labeled) == {"drying": 120, "maillard": 280, "development": 100}
+
+    no_readings = MachineAwarePhaseDetector().classify_events("SR540", False, [
+        {"kind": "CHARGE", "t_offset_sec": 0}, {"kind": "DROP", "t_offset_sec": 600}
+    ])
+    assert [e["phase"] for e in no_readings] == ["drying", "development"]
+
+
+def test_model_without_temperature_bounds():
+    model = CompiledPhaseModel.first_match(ROAST_PHASES, "finishing")
+    assert model.detect(100, 500) == "drying"                                  # time decides
+    try:
+        model.key_at_temp(300)
+    except ValueError:
+        return
+    assert False, "expected ValueError"
+
+
+def main():
+    """Run all phase model tests"""
+    print("🚀 Starting Phase Model Tests\n")
+
+    tests = [
+        test_first_match_equals_the_loop,
+        test_machine_model_bounds,
+        test_series_matches_single_readings,
+        test_classify_events_and_durations,
+        test_model_without_temperature_bounds
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
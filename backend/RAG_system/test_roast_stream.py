@@ -0,0 +1,219 @@
+"""
+Test script for the Streaming Roast State
+
+Checks the O(1) per-reading analysis (spikes, smoothed ROR, stall, crash and
+flick) and how the registry lines a worker's state up with the stored events:
+no-op when it matches, catch-up on readings logged elsewhere, rebuild after
+edits. Needs NumPy (via curve_analysis); without it every test is skipped.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from RAG_system.roast_stream import RoastStreamState, RoastStreamRegistry
+except ImportError as e:
+    RoastStreamState = None
+    print(f"⚠️ Roast stream tests skipped: {e}")
+
+
+def _reading(t_offset, temp_f, kind="READING"):
+    return {"kind": kind, "t_offset_sec": t_offset, "temp_f": temp_f}
+
+
+def _ramp(rate_per_min, until_sec, start_temp=200.0, step_sec=10):
+    return [_reading(t, start_temp + rate_per_min * t / 60.0) for t in range(0, until_sec + 1, step_sec)]
+
+
+class _StoredEvents:
+    """Stand-in for the roast_events table behind RoastStreamRegistry.sync"""
+
+    def __init__(self, events):
+        self.events = list(events)
+        self.loads = []
+
+    def load(self, after_t):
+        self.loads.append(after_t)
+        return [e for e in self.events if after_t is None or e["t_offset_sec"] > after_t]
+
+    def log(self, registry, event):
+        registry.sync(1, len(self.events), self.load)
+        self.events.append(event)
+        return registry.record(1, event)
+
+
+def test_steady_ramp_smoothed_ror():
+    """A constant rise gives that rate both per reading and smoothed"""
+    if RoastStreamState is None:
+        return
+    state = RoastStreamState()
+    for event in _ramp(12.0, 300):
+        analysis = state.update(event)
+    assert abs(analysis["rate_per_min"] - 12.0) < 1e-9
+    assert state.ror_per_min is not None and abs(state.ror_per_min - 12.0) < 1e-9
+    assert not analysis["has_spike"] and not analysis["is_fast"]
+
+
+def test_spike_and_fast_rise():
+    if RoastStreamState is None:
+        return
+    state = RoastStreamState()
+    state.update(_reading(0, 300.0))
+    assert state.update(_reading(10, 330.0))["has_spike"]       # 3°F/sec
+    assert state.update(_reading(70, 355.0))["is_fast"]         # 25°F/min
+
+
+def test_zero_degree_reading_is_a_reading():
+    """0.0°F is a (cold) temperature, not a missing one"""
+    if RoastStreamState is None:
+        return
+    state = RoastStreamState()
+    state.update(_reading(0, 0.0))
+    analysis = state.update(_reading(30, 15.0))
+    assert analysis["has_data"]
+    assert analysis["prev_temp"] == 0.0
+
+
+def test_out_of_order_reading_is_ignored():
+    if RoastStreamState is None:
+        return
+    state = RoastStreamState()
+    state.update(_reading(0, 200.0))
+    first = state.update(_reading(30, 210.0))
+    assert state.update(_reading(20, 400.0)) is first
+    assert state.latest == (30.0, 210.0)
+
+
+def test_stall_before_first_crack():
+    """Flat readings past the warm-up grace period become a stall after STALL_MIN_SECONDS"""
+    if RoastStreamState is None:
+        return
+    state = RoastStreamState()
+    for event in _ramp(20.0, 120) + [_reading(t, 240.0) for t in range(130, 600, 10)]:
+        state.update(event)
+    assert state.is_stalled
+    assert state.trend()["is_stalled"]
+
+
+def test_crash_then_flick_after_first_crack():
+    if RoastStreamState is None:
+        return
+    state = RoastStreamState()
+    temp = 200.0
+    rates = [(0, 480, 20.0), (480, 600, 1.0), (600, 900, 15.0)]
+    for start, end, rate in rates:
+        for t in range(start, end, 5):
+            if t == 480:
+                state.update({"kind": "FIRST_CRACK", "t_offset_sec": t})
+            state.update(_reading(t, temp))
+            temp += rate * 5 / 60.0
+    assert state.has_crash
+    assert state.has_flick
+
+
+def test_catch_up_folds_only_newer_events():
+    if RoastStreamState is None:
+        return
+    state = RoastStreamState()
+    events = _ramp(10.0, 120)
+    state.catch_up(events[:5])
+    state.catch_up(events)
+    assert [t for t, _ in state.readings] == [float(e["t_offset_sec"]) for e in events]
+
+
+def test_sync_noop_catch_up_and_rebuild():
+    if RoastStreamState is None:
+        return
+    stored = _StoredEvents(_ramp(10.0, 200))
+    here, elsewhere = RoastStreamRegistry(), RoastStreamRegistry()
+
+    stored.log(here, _reading(210, 235.0))
+    assert stored.loads == [None]                                 # new roast: full history
+
+    stored.log(elsewhere, _reading(220, 236.7))                   # another worker logs one
+    stored.loads.clear()
+    stored.log(here, _reading(230, 238.3))
+    assert stored.loads == [210.0]                                # caught up from its last reading
+    assert here.get(1).stored_events == len(stored.events)
+
+    stored.loads.clear()
+    stored.log(here, _reading(240, 240.0))
+    assert stored.loads == []                                     # counts agree: no reads
+
+    del stored.events[3]                                          # edited elsewhere
+    stored.loads.clear()
+    stored.log(here, _reading(250, 241.7))
+    assert stored.loads == [240.0, None]                          # catch-up can't explain it: rebuild
+    assert here.get(1).stored_events == len(stored.events)
+
+
+def test_needs_sync():
+    if RoastStreamState is None:
+        return
+    stored = _StoredEvents(_ramp(10.0, 60))
+    registry = RoastStreamRegistry()
+    assert registry.needs_sync(1)
+    registry.sync(1, len(stored.events), stored.load)
+    assert not registry.needs_sync(1)
+    assert registry.needs_sync(1, max_age=0.0)
+    registry.reset(1)
+    assert registry.needs_sync(1)
+
+
+def test_unstored_events_do_not_count():
+    """Coaching folds payload events in without claiming them as stored rows"""
+    if RoastStreamState is None:
+        return
+    registry = RoastStreamRegistry()
+    registry.record(1, _reading(0, 200.0), stored=False)
+    registry.record(1, _reading(10, 202.0))
+    assert registry.get(1).stored_events == 1
+
+
+def test_registry_drops_least_recently_used():
+    if RoastStreamState is None:
+        return
+    registry = RoastStreamRegistry(max_roasts=2)
+    registry.record(1, _reading(0, 200.0))
+    registry.record(2, _reading(0, 200.0))
+    registry.get(1)
+    registry.record(3, _reading(0, 200.0))
+    assert registry.get(1).latest == (0.0, 200.0)
+    assert registry.needs_sync(2) and registry.get(2).latest is None
+
+
+def main():
+    """Run all roast stream tests"""
+    print("🚀 Starting Roast Stream Tests\n")
+    if RoastStreamState is None:
+        return
+
+    tests = [
+        test_steady_ramp_smoothed_ror,
+        test_spike_and_fast_rise,
+        test_zero_degree_reading_is_a_reading,
+        test_out_of_order_reading_is_ignored,
+        test_stall_before_first_crack,
+        test_crash_then_flick_after_first_crack,
+        test_catch_up_folds_only_newer_events,
+        test_sync_noop_catch_up_and_rebuild,
+        test_needs_sync,
+        test_unstored_events_do_not_count,
+        test_registry_drops_least_recently_used
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
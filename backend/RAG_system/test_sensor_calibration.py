@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Tests for learned built-in sensor calibration
+
+The ridge fit recovers a machine's offset curve from paired probe readings
+(and only moves part way on little data), folding roasts in one at a time
+matches fitting them together, and saves are compare-and-set on the row
+version: a save that loses to another worker reloads the stored sums and
+retries. Runs against an in-memory stand-in for the Supabase tables. Needs
+NumPy; without it every test is skipped.
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import numpy as np
+    import RAG_system.sensor_calibration as calibration_module
+    from RAG_system.sensor_calibration import (
+        MODELS_TABLE, SAVE_ATTEMPTS, SensorCalibrationModel, SensorCalibrationStore, calibration_samples
+    )
+    from RAG_system.temperature_calibration import temperature_calibrator
+    HAVE_NUMPY = True
+except ImportError as e:
+    HAVE_NUMPY = False
+    print(f"⚠️ Sensor calibration tests skipped: {e}")
+
+MACHINE_ID = 7
+TRUE_SHIFT_F = 10.0          # this machine reads 10°F further above the beans than the default schedule
+
+
+class _Params:
+    """Immutable multi-value query parameters, like httpx.QueryParams"""
+
+    def __init__(self, items=()):
+        self.items = tuple(items)
+
+    def add(self, key, value):
+        return _Params(self.items + ((key, value),))
+
+    def get(self, key):
+        return next((value for k, value in self.items if k == key), None)
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _UniqueViolation(Exception):
+    code = "23505"
+
+
+class _Query:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.params = _Params()
+        self.filters = []
+        self.write = None
+        self.row = None
+        self.bounds = None
+
+    def select(self, columns):
+        return self
+
+    def insert(self, row):
+        self.write, self.row = "insert", row
+        return self
+
+    def update(self, row):
+        self.write, self.row = "update", row
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, [value]))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append((column, list(values)))
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def execute(self):
+        return self.client.execute(self)
+
+
+class _Supabase:
+    """
+    Stand-in for the Supabase client over roast_entries, roast_events and the
+    models table. before_write(client) runs ahead of each models-table write,
+    to play another worker saving first.
+    """
+
+    def __init__(self, roasts, events, before_write=None):
+        self.tables = {"roast_entries": roasts, "roast_events": events, MODELS_TABLE: []}
+        self.before_write = before_write
+        self.writes = []
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def execute(self, query):
+        rows = [r for r in self.tables[query.table]
+                if all(r.get(column) in values for column, values in query.filters)]
+        if query.write is None:
+            order = query.params.get("order")
+            if order:
+                rows.sort(key=lambda r: tuple(r.get(column) or 0 for column in order.split(",")))
+            if query.bounds:
+                rows = rows[query.bounds[0]:query.bounds[1] + 1]
+            return _Result([dict(r) for r in rows])
+
+        self.writes.append(query.write)
+        if self.before_write:
+            self.before_write(self)
+        if query.write == "insert":
+            if any(r["machine_id"] == query.row["machine_id"] for r in self.tables[query.table]):
+                raise _UniqueViolation("duplicate key value violates unique constraint")
+            self.tables[query.table].append(dict(query.row))
+            return _Result([dict(query.row)])
+        # Re-filter: before_write may have moved the version on
+        rows = [r for r in self.tables[query.table]
+                if all(r.get(column) in values for column, values in query.filters)]
+        for row in rows:
+            row.update(query.row)
+        return _Result([dict(r) for r in rows])
+
+
+def _true_offsets(elapsed):
+    return temperature_calibrator.builtin_offset_series(elapsed, interpolate=True) + TRUE_SHIFT_F
+
+
+def _roast_events(roast_id, step=30):
+    """Paired readings: built-in = probe + this machine's true offset"""
+    elapsed = np.arange(0, 660, step, dtype=float)
+    probe = 200.0 + elapsed / 3
+    builtin = probe + _true_offsets(elapsed)
+    return [
+        {"id": roast_id * 1000 + i, "roast_id": roast_id, "kind": "READING", "t_offset_sec": float(t),
+         "temp_f": float(b), "probe_temp_f": float(p)}
+        for i, (t, b, p) in enumerate(zip(elapsed, builtin, probe))
+    ]
+
+
+def _roast(roast_id):
+    return {"id": roast_id, "user_id": "user-1", "machine_id": MACHINE_ID, "weight_before_g": None,
+            "temperature_f": None, "machines": {"temp_sensor_type": "builtin"}}
+
+
+def _stored_model(roast_ids, version):
+    """A row as another worker would have saved it"""
+    model = SensorCalibrationModel(MACHINE_ID, "user-1", version=version - 1)
+    for roast_id in roast_ids:
+        SensorCalibrationStore._add_roast(model, _roast(roast_id), _roast_events(roast_id))
+    model.solve()
+    return dict(model.to_row(), version=version)
+
+
+def test_prior_is_the_default_schedule():
+    if not HAVE_NUMPY:
+        return
+    model = SensorCalibrationModel(MACHINE_ID)
+    elapsed = np.arange(0, 900, 15)
+    assert np.allclose(model.offsets(elapsed), temperature_calibrator.builtin_offset_series(elapsed, interpolate=True))
+    assert not model.is_fitted
+    model.solve()                                                     # no data: stays on the prior
+    assert np.allclose(model.offsets(elapsed), temperature_calibrator.builtin_offset_series(elapsed, interpolate=True))
+
+
+def _fit_error(roast_count):
+    """Worst error of the fitted curve after roast_count roasts of paired readings"""
+    model = SensorCalibrationModel(MACHINE_ID)
+    for roast_id in range(1, roast_count + 1):
+        elapsed, offsets, weight = calibration_samples(_roast_events(roast_id, step=10))
+        model.add_samples(elapsed, offsets, weight)
+    model.solve()
+    elapsed = np.arange(0, 660, 30)
+    return float(np.max(np.abs(model.offsets(elapsed) - _true_offsets(elapsed))))
+
+
+def test_ridge_fit_recovers_the_machine_curve():
+    if not HAVE_NUMPY:
+        return
+    errors = [_fit_error(roast_count) for roast_count in (1, 3, 10, 30)]
+    assert errors == sorted(errors, reverse=True)                     # converges as roasts arrive
+    assert errors[-1] < 0.25
+
+    one_sample = SensorCalibrationModel(MACHINE_ID)
+    one_sample.add_samples([240.0], _true_offsets([240.0]))
+    one_sample.solve()
+    shift = one_sample.offsets(240.0)[0] - temperature_calibrator.builtin_offset_series(240.0)
+    assert 0 < shift < TRUE_SHIFT_F / 2                               # pulled toward the default
+
+
+def _batch_ambient_terms(repeats):
+    model = SensorCalibrationModel(MACHINE_ID)
+    elapsed = np.arange(0, 660, 10, dtype=float)
+    base = temperature_calibrator.builtin_offset_series(elapsed, interpolate=True)
+    for _ in range(repeats):
+        for batch_g, ambient_f in ((80, 60), (100, 70), (120, 80), (150, 90), (100, 50)):
+            offsets = base + 4.0 * (batch_g - 100) / 100 - 1.5 * (ambient_f - 70) / 10
+            model.add_samples(elapsed, offsets, batch_g=batch_g, ambient_f=ambient_f)
+    model.solve()
+    summary = model.summary()
+    return summary["per_100g_batch_f"], summary["per_10f_ambient_f"]
+
+
+def test_batch_and_ambient_terms():
+    if not HAVE_NUMPY:
+        return
+    batch, ambient = _batch_ambient_terms(20)
+    assert abs(batch - 4.0) < 0.25 and abs(ambient + 1.5) < 0.1
+    few_batch, few_ambient = _batch_ambient_terms(1)
+    assert 0 < few_batch < batch and ambient < few_ambient < 0       # shrunk toward no effect
+
+
+def test_incremental_fit_matches_batch_fit():
+    if not HAVE_NUMPY:
+        return
+    incremental = SensorCalibrationModel(MACHINE_ID)
+    together = SensorCalibrationModel(MACHINE_ID)
+    samples = [calibration_samples(_roast_events(roast_id, step=45)) for roast_id in (1, 2)]
+    for elapsed, offsets, weight in samples:
+        incremental.add_samples(elapsed, offsets, weight)
+    together.add_samples(np.concatenate([s[0] for s in samples]), np.concatenate([s[1] for s in samples]))
+    incremental.solve()
+    together.solve()
+    assert incremental.coefficients is not None and together.coefficients is not None
+    assert np.allclose(incremental.coefficients, together.coefficients)
+
+    restored = SensorCalibrationModel.from_row(incremental.to_row())
+    assert np.allclose(restored.offsets([100, 500]), incremental.offsets([100, 500]))
+    changed = dict(incremental.to_row(), anchors=[0.0, 1.0])
+    assert SensorCalibrationModel.from_row(changed).sample_count == 0   # schedule changed: start over
+
+
+def test_milestone_samples():
+    if not HAVE_NUMPY:
+        return
+    events = [
+        {"kind": "READING", "t_offset_sec": 200, "temp_f": 310.0},
+        {"kind": "READING", "t_offset_sec": 300, "temp_f": 350.0},
+        {"kind": "DRY_END", "t_offset_sec": 250},
+        {"kind": "FIRST_CRACK", "t_offset_sec": 480, "temp_f": 420.0},
+        {"kind": "FIRST_CRACK", "t_offset_sec": 500, "temp_f": 430.0},     # only the first counts
+        {"kind": "DROP", "t_offset_sec": 560, "temp_f": 900.0}
+    ]
+    elapsed, offsets, weight = calibration_samples(events)
+    assert elapsed.tolist() == [250.0, 480.0]
+    assert offsets.tolist() == [30.0, 25.0]                               # 330 - 300, 420 - 395
+    assert weight == calibration_module.MILESTONE_SAMPLE_WEIGHT
+
+    paired = calibration_samples(events + [{"t_offset_sec": 100, "temp_f": 250.0, "probe_temp_f": 220.0}])
+    assert paired[1].tolist() == [30.0] and paired[2] == 1.0
+    assert calibration_samples([{"t_offset_sec": 100, "temp_f": 250.0, "probe_temp_f": 100.0}])[1].size == 0
+
+
+def test_update_from_roast_folds_in_once():
+    if not HAVE_NUMPY:
+        return
+    sb = _Supabase([_roast(1), _roast(2)], _roast_events(1) + _roast_events(2))
+    store = SensorCalibrationStore()
+    first = store.update_from_roast(sb, 1)
+    assert first is not None and first.version == 1 and first.roast_ids == [1]
+    second = store.update_from_roast(sb, 2)
+    assert second is not None and second.version == 2 and second.roast_ids == [1, 2]
+    assert store.update_from_roast(sb, 2) is not None
+    assert sb.writes == ["insert", "update"]                               # already folded in: no write
+    assert sb.tables[MODELS_TABLE][0]["roast_ids"] == [1, 2]
+    assert store.fitted(sb, MACHINE_ID) is second
+
+
+def test_lost_insert_reloads_and_keeps_the_other_workers_sums():
+    if not HAVE_NUMPY:
+        return
+
+    def other_worker_saves_first(client):
+        if not client.tables[MODELS_TABLE]:
+            client.tables[MODELS_TABLE].append(_stored_model([9], version=1))
+
+    sb = _Supabase([_roast(1)], _roast_events(1), before_write=other_worker_saves_first)
+    model = SensorCalibrationStore().update_from_roast(sb, 1)
+    assert model is not None and model.version == 2
+    assert sb.writes == ["insert", "update"]
+    row = sb.tables[MODELS_TABLE][0]
+    assert row["roast_ids"] == [9, 1] and row["version"] == 2
+    assert row["sample_count"] == 2 * len(_roast_events(1))
+
+
+def test_lost_update_retries_then_gives_up():
+    if not HAVE_NUMPY:
+        return
+    bumps = []
+
+    def other_worker_saves(client, times):
+        if len(bumps) < times:
+            bumps.append(1)
+            client.tables[MODELS_TABLE][0]["version"] += 1
+
+    sb = _Supabase([_roast(1)], _roast_events(1), before_write=lambda client: other_worker_saves(client, 1))
+    sb.tables[MODELS_TABLE].append(_stored_model([9], version=1))
+    model = SensorCalibrationStore().update_from_roast(sb, 1)
+    assert model is not None and model.version == 3 and model.roast_ids == [9, 1]
+    assert sb.writes == ["update", "update"]
+
+    bumps.clear()
+    sb = _Supabase([_roast(1)], _roast_events(1), before_write=lambda client: other_worker_saves(client, 99))
+    sb.tables[MODELS_TABLE].append(_stored_model([9], version=1))
+    assert SensorCalibrationStore().update_from_roast(sb, 1) is None
+    assert len(sb.writes) == SAVE_ATTEMPTS and sb.tables[MODELS_TABLE][0]["roast_ids"] == [9]
+
+
+def test_refit_pages_through_every_roast():
+    if not HAVE_NUMPY:
+        return
+    roast_ids = list(range(1, 6))
+    events = [event for roast_id in roast_ids for event in _roast_events(roast_id, step=120)]
+    sb = _Supabase([_roast(roast_id) for roast_id in roast_ids], events)
+    sb.tables[MODELS_TABLE].append(_stored_model([1], version=4))
+
+    page_size = calibration_module.PAGE_SIZE
+    calibration_module.PAGE_SIZE = 2
+    try:
+        model = SensorCalibrationStore().refit(sb, MACHINE_ID, "user-1")
+    finally:
+        calibration_module.PAGE_SIZE = page_size
+    assert model is not None and model.version == 5
+    assert model.roast_ids == roast_ids
+    assert model.sample_count == len(events)
+
+
+def main():
+    """Run all sensor calibration tests"""
+    print("🚀 Starting Sensor Calibration Tests\n")
+    if not HAVE_NUMPY:
+        return
+
+    tests = [
+        test_prior_is_the_default_schedule,
+        test_ridge_fit_recovers_the_machine_curve,
+        test_batch_and_ambient_terms,
+        test_incremental_fit_matches_batch_fit,
+        test_milestone_samples,
+        test_update_from_roast_folds_in_once,
+        test_lost_insert_reloads_and_keeps_the_other_workers_sums,
+        test_lost_update_retries_then_gives_up,
+        test_refit_pages_through_every_roast
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for vectorized temperature calibration
+
+builtin_offset_series() must agree with the original per-reading scan of
+builtin_offsets at and around every bucket edge, calibrate_series() must
+agree with calibrate_reading() point for point, and interpolation must pass
+through the schedule's anchors. Needs NumPy; without it every test is
+skipped.
+"""
+
+import os
+import sys
+import math
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import numpy as np
+    from temperature_calibration import TemperatureCalibrator
+    HAVE_NUMPY = True
+except ImportError as e:
+    HAVE_NUMPY = False
+    print(f"⚠️ Temperature calibration tests skipped: {e}")
+
+
+def _scan_offset(builtin_offsets, elapsed_seconds):
+    """The per-reading dict scan the bisect lookup replaced"""
+    for (start, end), offset in builtin_offsets.items():
+        if start <= elapsed_seconds < end:
+            return offset
+    return builtin_offsets[(600, float('inf'))]
+
+
+def _edge_times(builtin_offsets):
+    edges = {start for start, _ in builtin_offsets}
+    times = {edge + delta for edge in edges for delta in (-1, -1e-6, 0, 1e-6, 1)}
+    return sorted(times | {-30, 90, 10 ** 6})
+
+
+def test_series_offsets_equal_the_scan_at_bucket_edges():
+    if not HAVE_NUMPY:
+        return
+    calibrator = TemperatureCalibrator()
+    times = _edge_times(calibrator.builtin_offsets)
+    expected = [_scan_offset(calibrator.builtin_offsets, t) for t in times]
+    assert calibrator.builtin_offset_series(times).tolist() == expected
+    assert [calibrator._get_builtin_offset(t) for t in times] == expected
+    assert calibrator.builtin_offset_series(180.0).tolist() == 25.0            # scalars work too
+
+
+def test_recompiled_schedule():
+    if not HAVE_NUMPY:
+        return
+    calibrator = TemperatureCalibrator()
+    calibrator.builtin_offsets[(0, 180)] = 40.0
+    calibrator.compile_offsets()
+    assert calibrator._get_builtin_offset(0) == 40.0
+    assert calibrator.builtin_offset_series([179, 180]).tolist() == [40.0, 25.0]
+
+
+def test_series_matches_single_readings():
+    if not HAVE_NUMPY:
+        return
+    calibrator = TemperatureCalibrator()
+    times = _edge_times(calibrator.builtin_offsets)
+    raw = [300.0 + i for i in range(len(times))]
+    for sensor_type, user_offset in (("builtin", None), ("probe", None), ("probe", -3.5), ("thermocouple", None)):
+        expected = [calibrator.calibrate_reading(temp, sensor_type, t, user_offset).calibrated_temp_f
+                    for temp, t in zip(raw, times)]
+        assert calibrator.calibrate_series(raw, times, sensor_type, user_offset).tolist() == expected
+
+
+def test_mixed_sensors_and_missing_readings():
+    if not HAVE_NUMPY:
+        return
+    calibrator = TemperatureCalibrator()
+    calibrated = calibrator.calibrate_series(
+        [400.0, 400.0, None, 400.0], [0, 0, 0, 700], ["builtin", "probe", "builtin", "other"],
+        user_offset=[0.0, 2.0, 0.0, None]
+    )
+    assert calibrated[:2].tolist() == [365.0, 402.0]
+    assert math.isnan(calibrated[2]) and calibrated[3] == 400.0
+
+
+def test_interpolation_passes_through_anchors():
+    if not HAVE_NUMPY:
+        return
+    calibrator = TemperatureCalibrator()
+    anchors, offsets = calibrator.offset_schedule()
+    assert anchors.tolist() == [90.0, 240.0, 360.0, 510.0, 600.0]
+    assert calibrator.builtin_offset_series(anchors, interpolate=True).tolist() == offsets.tolist()
+    ramp = calibrator.builtin_offset_series(np.arange(0, 700, 10), interpolate=True)
+    assert np.all(np.diff(ramp) <= 0)                                          # offsets only shrink
+    assert ramp[0] == 35.0 and ramp[-1] == 8.0                                 # clamped outside the anchors
+    assert calibrator.builtin_offset_series(165, interpolate=True) == 30.0
+
+
+def test_calibrate_events():
+    if not HAVE_NUMPY:
+        return
+    calibrator = TemperatureCalibrator()
+    events = [
+        {"kind": "READING", "t_offset_sec": 30, "temp_f": 250.04},
+        {"kind": "FIRST_CRACK", "t_offset_sec": 480},
+        {"kind": "READING", "t_offset_sec": None, "temp_f": 300.0},
+        {"kind": "READING", "t_offset_sec": 650, "temp_f": 420.0}
+    ]
+    calibrated = calibrator.calibrate_events(events, "builtin")
+    assert [e.get("temp_f") for e in calibrated] == [215.0, None, 300.0, 412.0]
+    assert events[0]["temp_f"] == 250.04                                       # inputs are not modified
+
+
+def main():
+    """Run all temperature calibration tests"""
+    print("🚀 Starting Temperature Calibration Tests\n")
+    if not HAVE_NUMPY:
+        return
+
+    tests = [
+        test_series_offsets_equal_the_scan_at_bucket_edges,
+        test_recompiled_schedule,
+        test_series_matches_single_readings,
+        test_mixed_sensors_and_missing_readings,
+        test_interpolation_passes_through_anchors,
+        test_calibrate_events
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,34 @@ This module provides a comprehensive feature flagging system that allows:
 - Beta user access control
 - Premium user gating
 - Admin control over feature rollout
+
+Flag state is persisted as versioned snapshots (Supabase, with a local JSON
+fallback). Every worker polls for newer snapshot versions, and per-user
+evaluations are cached by (user, snapshot version, relevant metadata).
 """
 
 from enum import Enum
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Iterable, Callable
 from datetime import datetime
+import os
+import copy
+import json
+import time
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
+# How often workers check for a newer flag snapshot (seconds)
+SNAPSHOT_POLL_SECONDS = 10
+
+# Maximum number of cached per-user evaluations
+EVALUATION_CACHE_SIZE = 10000
+
+# Attempts to publish a snapshot when another worker publishes concurrently
+PUBLISH_ATTEMPTS = 3
+
 class FeatureFlagType(Enum):
     """Types of feature flags"""
     DEVELOPMENT = "development"
@@ -25,23 +44,245 @@ class FeatureFlagType(Enum):
 class FeatureFlag:
     """Individual feature flag definition"""
     def __init__(self, name: str, flag_type: FeatureFlagType, description: str, 
-                 enabled: bool = False, beta_users: List[str] = None, 
-                 admin_users: List[str] = None):
+                 enabled: bool = False, beta_users: Optional[Iterable[str]] = None, 
+                 admin_users: Optional[Iterable[str]] = None):
         self.name = name
         self.flag_type = flag_type
         self.description = description
         self.enabled = enabled
-        self.beta_users = beta_users or []
-        self.admin_users = admin_users or []
+        # Sets for constant-time membership checks
+        self.beta_users = set(beta_users or [])
+        self.admin_users = set(admin_users or [])
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "type": self.flag_type.value,
+            "description": self.description,
+            "enabled": self.enabled,
+            "beta_users": sorted(self.beta_users),
+            "admin_users": sorted(self.admin_users),
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat()
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FeatureFlag":
+        flag = cls(
+            name=data["name"],
+            flag_type=FeatureFlagType(data["type"]),
+            description=data.get("description", ""),
+            enabled=data.get("enabled", False),
+            beta_users=data.get("beta_users", []),
+            admin_users=data.get("admin_users", [])
+        )
+        if data.get("created_at"):
+            flag.created_at = datetime.fromisoformat(data["created_at"])
+        if data.get("updated_at"):
+            flag.updated_at = datetime.fromisoformat(data["updated_at"])
+        return flag
 
 class FeatureFlagManager:
     """Manages feature flags and access control"""
     
     def __init__(self):
         self.flags: Dict[str, FeatureFlag] = {}
+        self.version = 0
+        self.storage_file = "feature_flags.json"
+        self.supabase_client = None
+        self._lock = threading.RLock()
+        self._evaluation_cache: "OrderedDict[tuple, Dict[str, bool]]" = OrderedDict()
+        self._last_sync = 0.0
+        self._sync_running = False
         self._initialize_default_flags()
+        self._initialize_supabase()
+        self._load_latest_snapshot()
+    
+    def _initialize_supabase(self):
+        """Initialize Supabase connection for the shared flag store"""
+        try:
+            from utils.database import get_supabase
+            self.supabase_client = get_supabase()
+        except Exception as e:
+            logger.info(f"ℹ️ Feature flags: Supabase unavailable, using local snapshot file: {e}")
+            self.supabase_client = None
+    
+    # ------------------------------------------------------------------
+    # Versioned snapshots
+    # ------------------------------------------------------------------
+    
+    def _snapshot(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "flags": [flag.to_dict() for flag in self.flags.values()]
+        }
+    
+    def _apply_snapshot(self, snapshot: Dict[str, Any]):
+        """Replace in-memory flags with a snapshot (callers hold the lock)"""
+        flags = {}
+        for data in snapshot.get("flags", []):
+            try:
+                flag = FeatureFlag.from_dict(data)
+                flags[flag.name] = flag
+            except Exception as e:
+                logger.warning(f"⚠️ Skipping invalid feature flag in snapshot: {e}")
+        
+        # Keep defaults for flags the snapshot doesn't know about yet
+        for name, flag in self.flags.items():
+            flags.setdefault(name, flag)
+        
+        self.flags = flags
+        self.version = snapshot.get("version", 0)
+        self._evaluation_cache.clear()
+    
+    def _fetch_remote_version(self) -> Optional[int]:
+        if not self.supabase_client:
+            return None
+        try:
+            result = self.supabase_client.table("feature_flag_snapshots") \
+                .select("version") \
+                .order("version", desc=True) \
+                .limit(1) \
+                .execute()
+            return result.data[0]["version"] if result.data else 0
+        except Exception as e:
+            logger.warning(f"⚠️ Could not check feature flag version: {e}")
+            return None
+    
+    def _fetch_remote_snapshot(self) -> Optional[Dict[str, Any]]:
+        if not self.supabase_client:
+            return None
+        try:
+            result = self.supabase_client.table("feature_flag_snapshots") \
+                .select("version, flags") \
+                .order("version", desc=True) \
+                .limit(1) \
+                .execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load feature flag snapshot: {e}")
+            return None
+    
+    def _load_local_snapshot(self) -> Optional[Dict[str, Any]]:
+        try:
+            if os.path.exists(self.storage_file):
+                with open(self.storage_file, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading feature flag snapshot: {e}")
+        return None
+    
+    def _save_local_snapshot(self, snapshot: Dict[str, Any]):
+        try:
+            tmp_file = f"{self.storage_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+            os.replace(tmp_file, self.storage_file)
+        except Exception as e:
+            logger.error(f"Error saving feature flag snapshot: {e}")
+    
+    def _load_latest_snapshot(self):
+        """Load the newest snapshot from Supabase or the local file"""
+        with self._lock:
+            candidates = [s for s in (self._fetch_remote_snapshot(), self._load_local_snapshot()) if s]
+            if candidates:
+                latest = max(candidates, key=lambda s: s.get("version", 0))
+                if latest.get("version", 0) > self.version:
+                    self._apply_snapshot(latest)
+                    logger.info(f"✅ Loaded feature flag snapshot v{self.version}")
+            self._last_sync = time.time()
+    
+    def _sync_snapshot(self, force: bool = False):
+        """
+        Pick up snapshots published by other workers (at most every SNAPSHOT_POLL_SECONDS).
+        Reads start a background refresh and keep serving the current flags;
+        forced syncs (before a mutation) refresh inline.
+        """
+        if force:
+            self._refresh_snapshot()
+            return
+        if time.time() - self._last_sync < SNAPSHOT_POLL_SECONDS:
+            return
+        
+        with self._lock:
+            if self._sync_running or time.time() - self._last_sync < SNAPSHOT_POLL_SECONDS:
+                return
+            self._sync_running = True
+            self._last_sync = time.time()
+        threading.Thread(target=self._background_refresh, name="feature-flag-sync", daemon=True).start()
+    
+    def _background_refresh(self):
+        try:
+            self._refresh_snapshot()
+        finally:
+            self._sync_running = False
+    
+    def _refresh_snapshot(self):
+        """Fetch a newer remote snapshot (outside the lock) and apply it under the lock"""
+        self._last_sync = time.time()
+        remote_version = self._fetch_remote_version()
+        if remote_version is None or remote_version <= self.version:
+            return
+        snapshot = self._fetch_remote_snapshot()
+        if not snapshot:
+            return
+        
+        with self._lock:
+            if snapshot.get("version", 0) > self.version:
+                self._apply_snapshot(snapshot)
+                self._save_local_snapshot(snapshot)
+                logger.info(f"🔄 Feature flags updated to snapshot v{self.version}")
+    
+    def _publish_snapshot(self) -> bool:
+        """Persist the current flags as a new snapshot version (callers hold the lock)"""
+        self.version += 1
+        self._evaluation_cache.clear()
+        snapshot = self._snapshot()
+        
+        if self.supabase_client:
+            try:
+                self.supabase_client.table("feature_flag_snapshots").insert({
+                    "version": snapshot["version"],
+                    "flags": snapshot["flags"]
+                }).execute()
+            except Exception as e:
+                # Most likely another worker published this version first -
+                # roll back so the next sync picks up their snapshot
+                logger.warning(f"⚠️ Could not publish feature flag snapshot v{self.version}: {e}")
+                self.version -= 1
+                return False
+        
+        self._save_local_snapshot(snapshot)
+        return True
+    
+    def _mutate(self, feature_name: str, change: Callable[[FeatureFlag], None]) -> bool:
+        """
+        Apply a change on top of the latest snapshot and publish it.
+        Returns False if the flag doesn't exist or the change could not be published.
+        """
+        with self._lock:
+            for _ in range(PUBLISH_ATTEMPTS):
+                self._sync_snapshot(force=True)
+                if feature_name not in self.flags:
+                    return False
+                
+                previous = copy.deepcopy(self.flags[feature_name])
+                change(self.flags[feature_name])
+                self.flags[feature_name].updated_at = datetime.now()
+                if self._publish_snapshot():
+                    return True
+                # Don't serve a change no other worker will see
+                self.flags[feature_name] = previous
+            
+            logger.error(f"❌ Feature flag change to {feature_name} not applied (publish conflicts)")
+            return False
+    
+    def save(self) -> bool:
+        """Publish flags that were modified directly (e.g. by setup_feature_flags.py)"""
+        with self._lock:
+            return self._publish_snapshot()
     
     def _initialize_default_flags(self):
         """Initialize default feature flags"""
@@ -70,8 +311,8 @@ class FeatureFlagManager:
             beta_users=[]
         )
     
-    def is_feature_enabled(self, feature_name: str, user_id: str = None, 
-                          user_metadata: Dict[str, Any] = None) -> bool:
+    def is_feature_enabled(self, feature_name: str, user_id: Optional[str] = None, 
+                          user_metadata: Optional[Dict[str, Any]] = None) -> bool:
         """
         Check if a feature is enabled for a specific user
         
@@ -87,8 +328,21 @@ class FeatureFlagManager:
             logger.warning(f"Feature flag '{feature_name}' not found")
             return False
         
-        flag = self.flags[feature_name]
-        
+        return self.get_user_feature_access(user_id, user_metadata).get(feature_name, False)
+    
+    def _metadata_key(self, user_metadata: Optional[Dict[str, Any]]) -> tuple:
+        """Hashable key of the metadata fields that affect flag evaluation"""
+        if not user_metadata:
+            return (None, False, None)
+        return (
+            user_metadata.get("role"),
+            bool(user_metadata.get("beta_access")),
+            user_metadata.get("subscription_status", "free")
+        )
+    
+    def _evaluate_flag(self, flag: FeatureFlag, user_id: Optional[str] = None,
+                       user_metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """Evaluate a single flag for a user (uncached)"""
         # Check if flag is globally enabled
         if not flag.enabled:
             return False
@@ -120,7 +374,7 @@ class FeatureFlagManager:
         
         return False
     
-    def get_user_feature_access(self, user_id: str, user_metadata: Dict[str, Any] = None) -> Dict[str, bool]:
+    def get_user_feature_access(self, user_id: Optional[str], user_metadata: Optional[Dict[str, Any]] = None) -> Dict[str, bool]:
         """
         Get all feature access for a user
         
@@ -131,88 +385,83 @@ class FeatureFlagManager:
         Returns:
             Dict of feature names to access status
         """
-        access = {}
-        for feature_name in self.flags:
-            access[feature_name] = self.is_feature_enabled(feature_name, user_id, user_metadata)
-        return access
+        self._sync_snapshot()
+        
+        key = (user_id, self.version, self._metadata_key(user_metadata))
+        with self._lock:
+            cached = self._evaluation_cache.get(key)
+            if cached is not None:
+                self._evaluation_cache.move_to_end(key)
+                # Callers get their own copy; the cached dict is shared
+                return dict(cached)
+            
+            access = {}
+            for feature_name, flag in self.flags.items():
+                access[feature_name] = self._evaluate_flag(flag, user_id, user_metadata)
+            
+            self._evaluation_cache[key] = access
+            if len(self._evaluation_cache) > EVALUATION_CACHE_SIZE:
+                self._evaluation_cache.popitem(last=False)
+            return dict(access)
     
     def add_beta_user(self, feature_name: str, user_id: str) -> bool:
         """Add a user to beta access for a feature"""
-        if feature_name not in self.flags:
-            return False
-        
-        if user_id not in self.flags[feature_name].beta_users:
-            self.flags[feature_name].beta_users.append(user_id)
-            self.flags[feature_name].updated_at = datetime.now()
+        success = self._mutate(feature_name, lambda flag: flag.beta_users.add(user_id))
+        if success:
             logger.info(f"Added user {user_id} to beta access for {feature_name}")
-        return True
+        return success
     
     def remove_beta_user(self, feature_name: str, user_id: str) -> bool:
         """Remove a user from beta access for a feature"""
-        if feature_name not in self.flags:
-            return False
-        
-        if user_id in self.flags[feature_name].beta_users:
-            self.flags[feature_name].beta_users.remove(user_id)
-            self.flags[feature_name].updated_at = datetime.now()
+        success = self._mutate(feature_name, lambda flag: flag.beta_users.discard(user_id))
+        if success:
             logger.info(f"Removed user {user_id} from beta access for {feature_name}")
-        return True
+        return success
     
     def enable_feature(self, feature_name: str) -> bool:
         """Enable a feature flag globally"""
-        if feature_name not in self.flags:
-            return False
-        
-        self.flags[feature_name].enabled = True
-        self.flags[feature_name].updated_at = datetime.now()
-        logger.info(f"Enabled feature flag: {feature_name}")
-        return True
+        success = self._mutate(feature_name, lambda flag: setattr(flag, "enabled", True))
+        if success:
+            logger.info(f"Enabled feature flag: {feature_name}")
+        return success
     
     def disable_feature(self, feature_name: str) -> bool:
         """Disable a feature flag globally"""
-        if feature_name not in self.flags:
-            return False
-        
-        self.flags[feature_name].enabled = False
-        self.flags[feature_name].updated_at = datetime.now()
-        logger.info(f"Disabled feature flag: {feature_name}")
-        return True
+        success = self._mutate(feature_name, lambda flag: setattr(flag, "enabled", False))
+        if success:
+            logger.info(f"Disabled feature flag: {feature_name}")
+        return success
     
     def get_feature_status(self, feature_name: str) -> Optional[Dict[str, Any]]:
         """Get detailed status of a feature flag"""
+        self._sync_snapshot()
         if feature_name not in self.flags:
             return None
         
-        flag = self.flags[feature_name]
-        return {
-            "name": flag.name,
-            "type": flag.flag_type.value,
-            "description": flag.description,
-            "enabled": flag.enabled,
-            "beta_users": flag.beta_users,
-            "admin_users": flag.admin_users,
-            "created_at": flag.created_at.isoformat(),
-            "updated_at": flag.updated_at.isoformat()
-        }
+        status = self.flags[feature_name].to_dict()
+        status["version"] = self.version
+        return status
     
     def list_all_features(self) -> List[Dict[str, Any]]:
         """Get status of all feature flags"""
-        return [self.get_feature_status(name) for name in self.flags]
+        statuses = (self.get_feature_status(name) for name in list(self.flags))
+        return [status for status in statuses if status is not None]
 
 # Global feature flag manager instance
 feature_manager = FeatureFlagManager()
 
-def check_ai_copilot_access(user_id: str, user_metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+def check_ai_copilot_access(user_id: Optional[str], user_metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Check AI Copilot access for a user
     
     Returns:
         Dict with access information and reasoning
     """
-    # Check all AI Copilot related flags
-    development_access = feature_manager.is_feature_enabled("ai_copilot_development", user_id, user_metadata)
-    beta_access = feature_manager.is_feature_enabled("ai_copilot_beta", user_id, user_metadata)
-    premium_access = feature_manager.is_feature_enabled("ai_copilot_premium", user_id, user_metadata)
+    # Check all AI Copilot related flags (one cached evaluation)
+    access = feature_manager.get_user_feature_access(user_id, user_metadata)
+    development_access = access.get("ai_copilot_development", False)
+    beta_access = access.get("ai_copilot_beta", False)
+    premium_access = access.get("ai_copilot_premium", False)
     
     # Determine overall access
     has_access = development_access or beta_access or premium_access
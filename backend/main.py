@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, Header, Response, Request
+from fastapi import FastAPI, HTTPException, Depends, Header, Response, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional, List, Dict, Any
@@ -15,6 +15,7 @@ from schemas import (
 from utils.environmental import get_environmental_conditions
 from utils.database import get_supabase, get_or_create_machine_id
 from utils.auth import verify_jwt_token
+from utils.user_cache import user_cache
 # RAG system integration for AI-powered roast coaching
 from RAG_system.weaviate.weaviate_integration import (
     get_weaviate_integration, 
@@ -48,6 +49,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization", "X-Requested-With", "Accept", "Origin"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Custom middleware to ensure CORS headers on ALL responses (Railway compatibility)
@@ -98,6 +100,7 @@ async def add_cors_headers(request: Request, call_next):
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, PATCH, DELETE, OPTIONS"
     response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Requested-With, Accept, Origin"
     response.headers["Access-Control-Max-Age"] = "600"
+    response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor, ETag"
     
     return response
 
@@ -126,14 +129,8 @@ async def get_admin_analytics_overview(user_id: str = Depends(verify_jwt_token))
     """Get comprehensive analytics overview for admin dashboard"""
     try:
         # Verify admin access
+        user_cache.require_admin(user_id)
         sb = get_supabase()
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_metadata = user_response.user.user_metadata or {}
-        if user_metadata.get("role") != "admin":
-            raise HTTPException(status_code=403, detail="Admin access required")
         
         # Get total user count from auth.users (all registered users)
         try:
@@ -295,14 +292,8 @@ async def get_user_activity_analytics(user_id: str = Depends(verify_jwt_token)):
     """Get detailed user activity analytics"""
     try:
         # Verify admin access
+        user_cache.require_admin(user_id)
         sb = get_supabase()
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_metadata = user_response.user.user_metadata or {}
-        if user_metadata.get("role") != "admin":
-            raise HTTPException(status_code=403, detail="Admin access required")
         
         # Get users from roast_entries (users who have created roasts)
         users_result = sb.table("roast_entries").select("user_id, created_at").execute()
@@ -334,13 +325,13 @@ async def get_user_activity_analytics(user_id: str = Depends(verify_jwt_token)):
             first_roast_date = min(datetime.datetime.fromisoformat(r["created_at"].replace("Z", "+00:00")) for r in user_roasts) if user_roasts else None
             last_roast_date = max(datetime.datetime.fromisoformat(r["created_at"].replace("Z", "+00:00")) for r in user_roasts) if user_roasts else None
             
-            # Get real user data from auth
+            # Get real user data from auth (cached)
             try:
-                user_response = sb.auth.admin.get_user_by_id(user_id)
-                if user_response.user:
-                    user_meta = user_response.user.user_metadata or {}
-                    display_name = user_meta.get("display_name") or user_meta.get("full_name") or user_meta.get("name") or user_response.user.email.split("@")[0]
-                    email = user_response.user.email
+                cached_user = user_cache.get_user(user_id)
+                if cached_user:
+                    user_meta = cached_user.user_metadata
+                    display_name = user_meta.get("display_name") or user_meta.get("full_name") or user_meta.get("name") or (cached_user.email or "").split("@")[0]
+                    email = cached_user.email
                     subscription_status = user_meta.get("subscription_status", "free")
                 else:
                     display_name = f"User {user_id[:8]}"
@@ -379,14 +370,8 @@ async def get_roast_insights(user_id: str = Depends(verify_jwt_token)):
     """Get roast-related insights and analytics"""
     try:
         # Verify admin access
+        user_cache.require_admin(user_id)
         sb = get_supabase()
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_metadata = user_response.user.user_metadata or {}
-        if user_metadata.get("role") != "admin":
-            raise HTTPException(status_code=403, detail="Admin access required")
         
         # Get roast data (simplified query - only essential fields)
         roasts_result = sb.table("roast_entries").select(
@@ -436,19 +421,17 @@ async def get_roast_insights(user_id: str = Depends(verify_jwt_token)):
 @app.get("/user/profile")
 async def get_user_profile(user_id: str = Depends(verify_jwt_token)):
     try:
-        sb = get_supabase()
-        # Use Supabase Admin API to get user data
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
+        # Cached Supabase Admin API user data
+        user_data = user_cache.get_user(user_id)
+        if not user_data:
             raise HTTPException(status_code=404, detail="User not found")
 
-        user_data = user_response.user
-        user_meta = user_data.user_metadata or {}
+        user_meta = user_data.user_metadata
         
         return {
             "id": user_data.id,
             "email": user_data.email,
-            "display_name": user_meta.get("display_name") or user_meta.get("full_name") or user_meta.get("name") or user_data.email.split("@")[0],
+            "display_name": user_meta.get("display_name") or user_meta.get("full_name") or user_meta.get("name") or (user_data.email or "").split("@")[0],
             "address": user_meta.get("address", ""),
             "avatar_url": user_meta.get("avatar_url") or user_meta.get("picture"),
             "units": user_meta.get("units", {"temperature": "fahrenheit", "elevation": "feet"}),
@@ -464,12 +447,13 @@ async def update_user_profile(request: UserProfileRequest, user_id: str = Depend
     try:
         sb = get_supabase()
         
-        # Get current user data using Admin API
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
+        # Get current user data using Admin API (fresh - never merge into stale metadata)
+        user_cache.invalidate(user_id)
+        current_user = user_cache.get_user(user_id)
+        if not current_user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        current_meta = user_response.user.user_metadata or {}
+        current_meta = current_user.user_metadata
         
         # Update the metadata with new display name, address, and units
         updated_meta = current_meta.copy()
@@ -484,6 +468,7 @@ async def update_user_profile(request: UserProfileRequest, user_id: str = Depend
         sb.auth.admin.update_user_by_id(user_id, {
             "user_metadata": updated_meta
         })
+        user_cache.set_metadata(user_id, updated_meta)
         
         return {"success": True, "message": "Profile updated"}
         
@@ -517,14 +502,12 @@ async def get_subscription_status(user_id: str = Depends(verify_jwt_token)):
     Get user's subscription status for AI features with feature flag support
     """
     try:
-        sb = get_supabase()
-        
-        # Get user data to check for premium status
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
+        # Get user data to check for premium status (cached)
+        cached_user = user_cache.get_user(user_id)
+        if not cached_user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        user_meta = user_response.user.user_metadata or {}
+        user_meta = cached_user.user_metadata
         
         # Check AI Copilot access using feature flags
         ai_access = check_ai_copilot_access(user_id, user_meta)
@@ -574,6 +557,12 @@ async def get_subscription_status(user_id: str = Depends(verify_jwt_token)):
         }
 
 # Feature Flag Management Endpoints
+def _feature_flag_update_failed(feature_name: str) -> HTTPException:
+    """404 for unknown flags, 409 when the change lost to concurrent publishes"""
+    if feature_name not in feature_manager.flags:
+        return HTTPException(status_code=404, detail="Feature flag not found")
+    return HTTPException(status_code=409, detail="Feature flag was changed concurrently, please retry")
+
 @app.get("/admin/feature-flags")
 async def get_all_feature_flags(user_id: str = Depends(verify_jwt_token)):
     """Get all feature flags (admin only)"""
@@ -599,10 +588,12 @@ async def enable_feature_flag(feature_name: str, user_id: str = Depends(verify_j
         
         success = feature_manager.enable_feature(feature_name)
         if not success:
-            raise HTTPException(status_code=404, detail="Feature flag not found")
+            raise _feature_flag_update_failed(feature_name)
         
         return {"success": True, "message": f"Feature flag '{feature_name}' enabled"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"DEBUG: Error enabling feature flag: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -615,10 +606,12 @@ async def disable_feature_flag(feature_name: str, user_id: str = Depends(verify_
         
         success = feature_manager.disable_feature(feature_name)
         if not success:
-            raise HTTPException(status_code=404, detail="Feature flag not found")
+            raise _feature_flag_update_failed(feature_name)
         
         return {"success": True, "message": f"Feature flag '{feature_name}' disabled"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"DEBUG: Error disabling feature flag: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -628,14 +621,7 @@ async def manage_beta_users(feature_name: str, request: dict, user_id: str = Dep
     """Add or remove beta users (admin only)"""
     try:
         # Check if user is admin
-        sb = get_supabase()
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_meta = user_response.user.user_metadata or {}
-        if user_meta.get("role") != "admin":
-            raise HTTPException(status_code=403, detail="Admin access required")
+        user_cache.require_admin(user_id)
         
         action = request.get("action")  # "add" or "remove"
         target_user_id = request.get("user_id")
@@ -648,10 +634,12 @@ async def manage_beta_users(feature_name: str, request: dict, user_id: str = Dep
             raise HTTPException(status_code=400, detail="Invalid action. Use 'add' or 'remove'")
         
         if not success:
-            raise HTTPException(status_code=404, detail="Feature flag not found")
+            raise _feature_flag_update_failed(feature_name)
         
         return {"success": True, "message": f"Beta user {action}ed for {feature_name}"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -665,14 +653,12 @@ async def submit_development_feedback(
     try:
         from feedback_storage import feedback_storage
         
-        sb = get_supabase()
-        
-        # Get user info
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
+        # Get user info (cached)
+        cached_user = user_cache.get_user(user_id)
+        if not cached_user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        user_email = user_response.user.email
+        user_email = cached_user.email or ""
         feedback_text = feedback_data.get("feedback", "")
         
         if not feedback_text.strip():
@@ -707,14 +693,12 @@ async def submit_general_feedback(
     try:
         from feedback_storage import feedback_storage
         
-        sb = get_supabase()
-        
-        # Get user info
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
+        # Get user info (cached)
+        cached_user = user_cache.get_user(user_id)
+        if not cached_user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        user_email = user_response.user.email
+        user_email = cached_user.email or ""
         feedback_text = feedback_data.get("feedback", "")
         feedback_type = feedback_data.get("type", "general")  # general, bug, feature_request, etc.
         
@@ -747,14 +731,7 @@ async def get_all_feedback(user_id: str = Depends(verify_jwt_token)):
     """Get all development feedback (admin only)"""
     try:
         # Check if user is admin
-        sb = get_supabase()
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_meta = user_response.user.user_metadata or {}
-        if user_meta.get("role") != "admin":
-            raise HTTPException(status_code=403, detail="Admin access required")
+        user_cache.require_admin(user_id)
         
         from feedback_storage import feedback_storage
         
@@ -774,14 +751,7 @@ async def search_feedback(query: str, user_id: str = Depends(verify_jwt_token)):
     """Search feedback using semantic search (admin only)"""
     try:
         # Check if user is admin
-        sb = get_supabase()
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_meta = user_response.user.user_metadata or {}
-        if user_meta.get("role") != "admin":
-            raise HTTPException(status_code=403, detail="Admin access required")
+        user_cache.require_admin(user_id)
         
         from feedback_storage import feedback_storage
         
@@ -802,14 +772,7 @@ async def get_feedback_summary(user_id: str = Depends(verify_jwt_token)):
     """Get feedback summary and analytics (admin only)"""
     try:
         # Check if user is admin
-        sb = get_supabase()
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_meta = user_response.user.user_metadata or {}
-        if user_meta.get("role") != "admin":
-            raise HTTPException(status_code=403, detail="Admin access required")
+        user_cache.require_admin(user_id)
         
         from feedback_storage import feedback_storage
         
@@ -824,64 +787,93 @@ async def get_feedback_summary(user_id: str = Depends(verify_jwt_token)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/admin/feedback/migrate-to-supabase")
-async def migrate_feedback_to_supabase(user_id: str = Depends(verify_jwt_token)):
-    """Migrate all feedback from JSON to Supabase (admin only)"""
+async def migrate_feedback_to_supabase(
+    background_tasks: BackgroundTasks,
+    chunk_size: int = 200,
+    user_id: str = Depends(verify_jwt_token)
+):
+    """Start a background migration of all feedback from JSON to Supabase (admin only)"""
     try:
         # Check if user is admin
-        sb = get_supabase()
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_meta = user_response.user.user_metadata or {}
-        if user_meta.get("role") != "admin":
-            raise HTTPException(status_code=403, detail="Admin access required")
+        user_cache.require_admin(user_id)
         
         from feedback_storage import feedback_storage
         
-        result = feedback_storage.migrate_to_supabase()
+        job = feedback_storage.create_migration_job("supabase", chunk_size)
+        if not job:
+            raise HTTPException(status_code=409, detail="A Supabase migration is already running")
+        
+        background_tasks.add_task(feedback_storage.run_migration_job, job["job_id"])
         
         return {
-            "success": result.get("success", False),
-            "message": result.get("message", ""),
-            "details": {
-                "migrated": result.get("migrated", 0),
-                "failed": result.get("failed", 0),
-                "total": result.get("total", 0)
-            }
+            "success": True,
+            "message": "Supabase migration started",
+            "job_id": job["job_id"],
+            "status_url": f"/admin/feedback/migrations/{job['job_id']}"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/admin/feedback/migrate-to-weaviate")
-async def migrate_feedback_to_weaviate(user_id: str = Depends(verify_jwt_token)):
-    """Migrate all feedback from JSON to Weaviate (admin only)"""
+async def migrate_feedback_to_weaviate(
+    background_tasks: BackgroundTasks,
+    chunk_size: int = 200,
+    user_id: str = Depends(verify_jwt_token)
+):
+    """Start a background migration of all feedback from JSON to Weaviate (admin only)"""
     try:
         # Check if user is admin
-        sb = get_supabase()
-        user_response = sb.auth.admin.get_user_by_id(user_id)
-        if not user_response.user:
-            raise HTTPException(status_code=404, detail="User not found")
+        user_cache.require_admin(user_id)
         
-        user_meta = user_response.user.user_metadata or {}
-        if user_meta.get("role") != "admin":
-            raise HTTPException(status_code=403, detail="Admin access required")
+        from feedback_storage import feedback_storage
+        
+        job = feedback_storage.create_migration_job("weaviate", chunk_size)
+        if not job:
+            raise HTTPException(status_code=409, detail="A Weaviate migration is already running")
+        
+        background_tasks.add_task(feedback_storage.run_migration_job, job["job_id"])
+        
+        return {
+            "success": True,
+            "message": "Weaviate migration started",
+            "job_id": job["job_id"],
+            "status_url": f"/admin/feedback/migrations/{job['job_id']}"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/admin/feedback/migrations/{job_id}")
+async def get_feedback_migration_status(job_id: str, user_id: str = Depends(verify_jwt_token)):
+    """Get progress of a background feedback migration (admin only)"""
+    try:
+        # Check if user is admin
+        user_cache.require_admin(user_id)
         
         from feedback_storage import feedback_storage
         
-        result = feedback_storage.migrate_to_weaviate()
+        job = feedback_storage.get_migration_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Migration job not found")
         
         return {
-            "success": result.get("success", False),
-            "message": result.get("message", ""),
+            "success": True,
+            "job": job,
             "details": {
-                "migrated": result.get("migrated", 0),
-                "failed": result.get("failed", 0),
-                "total": result.get("total", 0)
+                "migrated": job.get("migrated", 0),
+                "failed": job.get("failed", 0),
+                "total": job.get("total") or 0,
+                "records_per_second": job.get("records_per_second")
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -957,6 +949,48 @@ async def delete_user_machine(machine_id: str, user_id: str = Depends(verify_jwt
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/user/machines/{machine_id}/calibration")
+async def get_machine_calibration(machine_id: str, user_id: str = Depends(verify_jwt_token)):
+    """Learned built-in sensor offsets for a machine next to the default schedule"""
+    try:
+        from RAG_system.sensor_calibration import sensor_calibration, SensorCalibrationModel
+        sb = get_supabase()
+
+        machine_result = sb.table("machines").select("id").eq("id", machine_id).eq("user_id", user_id).execute()
+        if not machine_result.data:
+            raise HTTPException(status_code=404, detail="Machine not found")
+
+        model = sensor_calibration.get(sb, machine_id) or SensorCalibrationModel(machine_id, user_id)
+        return model.summary()
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/user/machines/{machine_id}/calibration/refit")
+async def refit_machine_calibration(machine_id: str, user_id: str = Depends(verify_jwt_token)):
+    """Rebuild a machine's learned sensor calibration from all of its roasts"""
+    try:
+        from RAG_system.sensor_calibration import sensor_calibration
+        sb = get_supabase()
+
+        machine_result = sb.table("machines").select("id, temp_sensor_type").eq("id", machine_id).eq("user_id", user_id).execute()
+        if not machine_result.data:
+            raise HTTPException(status_code=404, detail="Machine not found")
+        if (machine_result.data[0].get("temp_sensor_type") or "builtin") != "builtin":
+            raise HTTPException(status_code=400, detail="Only built-in sensor machines are calibrated")
+
+        model = sensor_calibration.refit(sb, machine_id, user_id)
+        if model is None:
+            raise HTTPException(status_code=409, detail="Calibration changed during refit, try again")
+        return model.summary()
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Bean Profile endpoints moved to routers/beans.py
 
 # Include routers
@@ -986,13 +1020,17 @@ except ImportError as e:
 
 # LLM Roast Coaching functionality is now integrated into the main RAG system
 
-# Include Notifications router
-try:
-    from routers.notifications import router as notifications_router
-    app.include_router(notifications_router, tags=["Push Notifications"])
-    print("✅ Notifications router included successfully")
-except ImportError as e:
-    print(f"⚠️ Could not import Notifications router: {e}")
+# Include Notifications router - only when enabled: the APNs/FCM/Web Push senders
+# are still stand-ins that report every device as delivered
+if os.getenv("PUSH_NOTIFICATIONS_ENABLED", "").lower() in ("1", "true", "yes"):
+    try:
+        from routers.notifications import router as notifications_router
+        app.include_router(notifications_router, tags=["Push Notifications"])
+        print("✅ Notifications router included successfully")
+    except ImportError as e:
+        print(f"⚠️ Could not import Notifications router: {e}")
+else:
+    print("ℹ️ Notifications router disabled (set PUSH_NOTIFICATIONS_ENABLED=true once real push senders exist)")
 
 # Include Roast Chat Feedback router
 try:
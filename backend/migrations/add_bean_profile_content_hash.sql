@@ -0,0 +1,12 @@
+-- Add source_content_hash column to bean_profiles table
+-- Bulk catalog imports record the SHA-256 of each source page so re-importing
+-- the same catalog skips pages the user already imported.
+
+ALTER TABLE bean_profiles
+    ADD COLUMN IF NOT EXISTS source_content_hash TEXT;
+
+COMMENT ON COLUMN bean_profiles.source_content_hash IS 'SHA-256 of the supplier page a bulk import created this profile from';
+
+-- One profile per user per source page (NULLs - manually created profiles - never conflict)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_bean_profiles_user_content_hash
+    ON bean_profiles (user_id, source_content_hash);
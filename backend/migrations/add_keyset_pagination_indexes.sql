@@ -0,0 +1,9 @@
+-- Indexes for keyset pagination of GET /roasts and GET /bean-profiles
+-- Both list newest first on (created_at, id) within one user, so each page is
+-- a single index range scan no matter how deep into the history it is.
+
+CREATE INDEX IF NOT EXISTS idx_roast_entries_user_created_id
+    ON roast_entries (user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_bean_profiles_user_created_id
+    ON bean_profiles (user_id, created_at DESC, id DESC);
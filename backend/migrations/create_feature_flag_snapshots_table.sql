@@ -0,0 +1,16 @@
+-- Feature flag snapshots
+-- Each admin change to a feature flag publishes a new, immutable snapshot.
+-- Backend workers poll the latest version and reload when it changes.
+
+CREATE TABLE IF NOT EXISTS feature_flag_snapshots (
+    version BIGINT PRIMARY KEY,
+    flags JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Latest-version lookups
+CREATE INDEX IF NOT EXISTS idx_feature_flag_snapshots_version_desc
+    ON feature_flag_snapshots (version DESC);
+
+-- Only the backend (service role) reads or writes flag snapshots
+ALTER TABLE feature_flag_snapshots ENABLE ROW LEVEL SECURITY;
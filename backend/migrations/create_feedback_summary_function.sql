@@ -0,0 +1,39 @@
+-- Feedback summary aggregation
+-- Returns GROUP BY counts for the admin feedback summary so the backend
+-- never has to pull feedback rows just to count them.
+--
+-- Called from FeedbackStorage via: supabase.rpc("feedback_summary_counts", {"exclude_ids": [...]})
+-- exclude_ids are entries the backend is still storing; it counts those itself.
+
+-- Replaces the earlier zero-argument version
+DROP FUNCTION IF EXISTS feedback_summary_counts();
+
+CREATE OR REPLACE FUNCTION feedback_summary_counts(exclude_ids TEXT[] DEFAULT '{}')
+RETURNS TABLE (dimension TEXT, feature TEXT, value TEXT, total BIGINT)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+AS $$
+    WITH f AS (
+        SELECT * FROM feedback WHERE NOT (id = ANY(exclude_ids))
+    )
+    SELECT 'feature_type', f.feature, f.feedback_type, COUNT(*)
+    FROM f
+    GROUP BY f.feature, f.feedback_type
+    UNION ALL
+    SELECT 'sentiment', NULL, f.sentiment, COUNT(*)
+    FROM f
+    GROUP BY f.sentiment
+    UNION ALL
+    SELECT 'priority', NULL, f.priority, COUNT(*)
+    FROM f
+    GROUP BY f.priority
+    UNION ALL
+    SELECT 'status', NULL, f.status, COUNT(*)
+    FROM f
+    GROUP BY f.status;
+$$;
+
+-- Only the service role (backend) may call it
+REVOKE ALL ON FUNCTION feedback_summary_counts(TEXT[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION feedback_summary_counts(TEXT[]) TO service_role;
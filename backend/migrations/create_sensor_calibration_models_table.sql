@@ -0,0 +1,28 @@
+-- Learned built-in sensor calibration
+-- roast_events.probe_temp_f holds a reference probe reading logged next to the
+-- built-in temp_f; sensor_calibration_models keeps one fitted offset curve per
+-- machine plus the normal-equation sums it is refit from incrementally.
+
+ALTER TABLE roast_events ADD COLUMN IF NOT EXISTS probe_temp_f NUMERIC;
+
+CREATE TABLE IF NOT EXISTS sensor_calibration_models (
+    machine_id BIGINT PRIMARY KEY REFERENCES machines(id) ON DELETE CASCADE,
+    user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+    anchors JSONB NOT NULL,
+    coefficients JSONB NOT NULL,
+    xtx JSONB NOT NULL,
+    xty JSONB NOT NULL,
+    sample_count DOUBLE PRECISION NOT NULL DEFAULT 0,
+    roast_ids BIGINT[] NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    -- Bumped on every save; writers update only the version they loaded
+    version BIGINT NOT NULL DEFAULT 1
+);
+
+ALTER TABLE sensor_calibration_models ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+
+CREATE INDEX IF NOT EXISTS idx_sensor_calibration_models_user
+    ON sensor_calibration_models (user_id);
+
+-- Only the backend (service role) reads or writes calibration models
+ALTER TABLE sensor_calibration_models ENABLE ROW LEVEL SECURITY;
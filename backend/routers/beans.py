@@ -1,12 +1,17 @@
 """
 Bean profile router - handles all bean profile related endpoints
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import JSONResponse
+from typing import Dict, List, Optional
 
 from schemas import CreateBeanProfileRequest, ParseHTMLRequest, SemanticSearchRequest
 from utils.database import get_supabase
 from utils.auth import verify_jwt_token
+from utils.pagination import (
+    MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, apply_keyset, clamp_page_size, decode_cursor, fetch_all_pages,
+    is_invalid_column_error, page_results, select_columns
+)
 from RAG_system.weaviate.weaviate_integration import (
     get_weaviate_integration, 
     sync_bean_to_weaviate,
@@ -18,32 +23,162 @@ router = APIRouter(prefix="", tags=["Bean Profiles"])
 # Coffee regions validation - using shared data file
 import json
 import os
+import bisect
+import difflib
+import hashlib
+import threading
+import time
+import unicodedata
+
+COFFEE_REGIONS_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'shared', 'data', 'coffee_regions.json'
+)
+REGION_SEARCH_LIMIT = 10
+REGION_FUZZY_CUTOFF = 0.6
+REGION_FUZZY_MIN_CHARS = 3
+REGION_RELOAD_CHECK_SECONDS = 2.0
+
+
+def normalize_region_name(name: str) -> str:
+    """Case-, accent- and punctuation-insensitive form used for lookups ("cote d ivoire")"""
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    stripped = ''.join(c if c.isalnum() else ' ' for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.split())
+
+
+class CoffeeRegionCatalog:
+    """
+    The shared coffee region list, loaded once and reloaded only when the
+    file's mtime changes (so edits show up in development without a restart).
+
+    Keeps a frozenset for exact validation, a normalized-name index for
+    forgiving lookups and a sorted key list for prefix search.
+    """
+
+    def __init__(self, path: str = COFFEE_REGIONS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self.regions = ['Other']
+        self.regions_by_continent: Dict[str, List[str]] = {}
+        self.etag = '"fallback"'
+        self._region_set = frozenset(self.regions)
+        self._by_normalized: Dict[str, str] = {}
+        self._sorted_keys: List[str] = []
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._mtime is not None and now - self._checked_at < REGION_RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            if self._mtime is None:
+                print(f"Warning: Could not load coffee regions from shared file: {e}")
+                self._mtime = 0
+                self._index()
+            return
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.path, 'rb') as f:
+                    raw = f.read()
+                data = json.loads(raw)
+                self.regions = data['regions']
+                self.regions_by_continent = data.get('regions_by_continent', {})
+                self.etag = f'"{hashlib.sha256(raw).hexdigest()[:32]}"'
+            except Exception as e:
+                # Fallback to a minimal list (or keep the last good one) if the file can't be loaded
+                print(f"Warning: Could not load coffee regions from shared file: {e}")
+            self._index()
+            self._mtime = mtime
+
+    def _index(self):
+        self._region_set = frozenset(self.regions)
+        by_normalized = {}
+        for region in self.regions:
+            by_normalized.setdefault(normalize_region_name(region), region)
+            # Let "guinea" or "rica" find multi-word names by any word
+            words = normalize_region_name(region).split()
+            for i in range(1, len(words)):
+                by_normalized.setdefault(' '.join(words[i:]), region)
+        self._by_normalized = by_normalized
+        self._sorted_keys = sorted(by_normalized)
+
+    def get_regions(self) -> List[str]:
+        self._refresh()
+        return self.regions
+
+    def contains(self, region: str) -> bool:
+        """Exact match against the canonical names"""
+        self._refresh()
+        return region in self._region_set
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Canonical region for a loosely typed name ("cote d'ivoire" -> "Côte d'Ivoire")"""
+        self._refresh()
+        return self._by_normalized.get(normalize_region_name(name))
+
+    def search(self, query: str, limit: int = REGION_SEARCH_LIMIT) -> List[str]:
+        """
+        Autocomplete: prefix matches (on the whole name or any later word) in
+        list order, topped up with fuzzy matches for typos.
+        """
+        self._refresh()
+        key = normalize_region_name(query)
+        if not key:
+            return self.regions[:limit]
+
+        keys, matches = self._sorted_keys, []
+        start = bisect.bisect_left(keys, key)
+        for candidate in keys[start:]:
+            if not candidate.startswith(key):
+                break
+            region = self._by_normalized[candidate]
+            if region not in matches:
+                matches.append(region)
+        order = {region: i for i, region in enumerate(self.regions)}
+        matches.sort(key=order.__getitem__)
+
+        if len(matches) < limit and len(key) >= REGION_FUZZY_MIN_CHARS:
+            for candidate in difflib.get_close_matches(key, keys, n=limit, cutoff=REGION_FUZZY_CUTOFF):
+                region = self._by_normalized[candidate]
+                if region not in matches:
+                    matches.append(region)
+        return matches[:limit]
+
+# Global instance
+coffee_region_catalog = CoffeeRegionCatalog()
 
 def load_coffee_regions():
-    """Load coffee regions from shared data file"""
-    try:
-        # Get the path to the shared data file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        shared_data_path = os.path.join(current_dir, '..', '..', 'shared', 'data', 'coffee_regions.json')
-        
-        with open(shared_data_path, 'r') as f:
-            data = json.load(f)
-            return data['regions']
-    except Exception as e:
-        # Fallback to a minimal list if file can't be loaded
-        print(f"Warning: Could not load coffee regions from shared file: {e}")
-        return ['Other']
+    """Load coffee regions from shared data file (cached, reloaded when the file changes)"""
+    return coffee_region_catalog.get_regions()
 
 def validate_coffee_region(region: str) -> bool:
     """Validate that the coffee region is in our predefined list"""
-    regions = load_coffee_regions()
-    return region in regions
+    return coffee_region_catalog.contains(region)
 
 @router.get("/coffee-regions")
-async def get_coffee_regions():
-    """Get the list of valid coffee regions from shared data file"""
+async def get_coffee_regions(request: Request):
+    """Get the list of valid coffee regions from shared data file (304 if the client's copy is current)"""
     regions = load_coffee_regions()
-    return {"regions": regions}
+    headers = {"ETag": coffee_region_catalog.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if coffee_region_catalog.etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({"regions": regions}, headers=headers)
+
+@router.get("/coffee-regions/search")
+async def search_coffee_regions(q: str = "", limit: int = REGION_SEARCH_LIMIT):
+    """Prefix/fuzzy region lookup for origin autocomplete"""
+    limit = max(1, min(limit, len(load_coffee_regions())))
+    return {"query": q, "regions": coffee_region_catalog.search(q, limit)}
 
 @router.post("/bean-profiles")
 async def create_bean_profile(request: CreateBeanProfileRequest, user_id: str = Depends(verify_jwt_token)):
@@ -106,13 +241,56 @@ async def create_bean_profile(request: CreateBeanProfileRequest, user_id: str =
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+BEAN_PROFILE_FIELD_PRESETS = {
+    # Columns the bean list and start-roast picker read
+    "summary": (
+        "id", "created_at", "name", "origin", "process_method", "variety", "bean_type",
+        "espresso_suitable", "supplier_name", "recommended_roast_levels"
+    )
+}
+
 @router.get("/bean-profiles")
-async def get_bean_profiles(user_id: str = Depends(verify_jwt_token)):
+async def get_bean_profiles(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    user_id: str = Depends(verify_jwt_token)
+):
+    """
+    The user's bean profiles, newest first.
+
+    Without `limit` or `cursor` every profile is returned (what the bean list
+    and start-roast picker expect). With either, the result is keyset-paginated
+    like GET /roasts (X-Next-Cursor header). `fields` is "summary" or a
+    comma-separated column list (default: every column).
+    """
+    try:
+        paged = limit is not None or cursor is not None
+        page_size = clamp_page_size(limit) if limit is not None else MAX_PAGE_SIZE
+        columns = select_columns(fields, BEAN_PROFILE_FIELD_PRESETS)
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
         sb = get_supabase()
-        result = sb.table("bean_profiles").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-        return result.data
+
+        def build_query():
+            return sb.table("bean_profiles").select(columns).eq("user_id", user_id)
+
+        if not paged:
+            return fetch_all_pages(build_query)
+
+        result = apply_keyset(build_query(), cursor, page_size).execute()
+        rows, next_cursor = page_results(result.data, page_size)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return rows
     except Exception as e:
+        if is_invalid_column_error(e):
+            raise HTTPException(status_code=400, detail=f"Invalid fields: {getattr(e, 'message', None) or e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/bean-profiles/{bean_profile_id}")
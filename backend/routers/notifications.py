@@ -1,14 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Awaitable
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 import json
+import time
+import uuid
+import sqlite3
 import asyncio
-from ..utils.auth import get_current_user
-from ..utils.database import get_db_connection
+import logging
+import threading
+from utils.auth import get_current_user
+from utils.user_cache import user_cache, CachedUser
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
+# Longest analytics window (larger values would overflow the date arithmetic)
+MAX_ANALYTICS_DAYS = 365
+
 # Pydantic models for request/response
 class NotificationRequest(BaseModel):
     title: str
@@ -35,6 +46,9 @@ class NotificationResponse(BaseModel):
     status: str
     delivery_rate: float
     open_rate: float
+    targeted: int = 0
+    delivered: int = 0
+    opened: int = 0
 
 class DeviceToken(BaseModel):
     user_id: str
@@ -79,8 +93,6 @@ notification_templates = [
     }
 ]
 
-# Mock notification history (replace with database queries)
-notification_history = []
 
 @router.get("/templates", response_model=List[NotificationTemplate])
 async def get_notification_templates():
@@ -90,20 +102,23 @@ async def get_notification_templates():
 @router.get("/history", response_model=List[NotificationResponse])
 async def get_notification_history(
     limit: int = 50,
-    offset: int = 0,
+    cursor: Optional[int] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get notification history with pagination"""
+    """
+    Get notification history, newest first.
+    
+    Pass the id of the last notification on a page as `cursor` to get the next page.
+    """
     # Check if user is admin
     if not current_user.get("is_admin", False):
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    return notification_history[offset:offset + limit]
+    return await notification_history.get_page(cursor, max(1, min(limit, HISTORY_PAGE_LIMIT)))
 
 @router.post("/send")
 async def send_notification(
     notification: NotificationRequest,
-    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user)
 ):
     """Send a push notification to specified audience"""
@@ -112,16 +127,14 @@ async def send_notification(
         raise HTTPException(status_code=403, detail="Admin access required")
     
     try:
-        # If scheduled for later, add to background tasks
+        # If scheduled for later, hand it to the durable scheduler
         if notification.scheduled_time and notification.scheduled_time > datetime.now():
-            # Schedule notification for later
-            delay_seconds = (notification.scheduled_time - datetime.now()).total_seconds()
-            background_tasks.add_task(
-                send_scheduled_notification,
-                notification,
-                delay_seconds
-            )
-            return {"message": "Notification scheduled successfully", "scheduled_for": notification.scheduled_time}
+            schedule_id = await notification_scheduler.schedule(notification, notification.scheduled_time)
+            return {
+                "message": "Notification scheduled successfully",
+                "scheduled_for": notification.scheduled_time,
+                "schedule_id": schedule_id
+            }
         else:
             # Send immediately
             result = await send_push_notification(notification)
@@ -190,15 +203,72 @@ async def register_device_token(
 ):
     """Register a device token for push notifications"""
     try:
-        # In production, store in database
-        # For now, just return success
+        if token_data.platform not in PLATFORM_SEGMENTS:
+            raise HTTPException(status_code=400, detail="Platform must be 'ios', 'android' or 'web'")
+        
+        # Tokens belong to the caller; only admins may register on behalf of another user
+        owner_id: str = current_user["id"]
+        owner_meta = current_user
+        if token_data.user_id != owner_id:
+            if not current_user.get("is_admin", False):
+                raise HTTPException(status_code=403, detail="Cannot register a device token for another user")
+            owner_id = token_data.user_id
+            owner_meta = await asyncio.to_thread(user_cache.get_metadata, owner_id)
+        
+        premium, beta = segment_flags(owner_meta)
+        await device_token_registry.register(
+            token=token_data.token,
+            user_id=owner_id,
+            platform=token_data.platform,
+            premium=premium,
+            beta=beta
+        )
         return {"message": "Device token registered successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to register device token: {str(e)}")
 
+@router.delete("/device-tokens/{token}")
+async def unregister_device_token(
+    token: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Unregister a device token (users can only remove their own)"""
+    try:
+        owner = None if current_user.get("is_admin", False) else current_user.get("id")
+        removed = await device_token_registry.unregister(token, owner)
+        if not removed:
+            raise HTTPException(status_code=404, detail="Device token not found")
+        return {"message": "Device token unregistered successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to unregister device token: {str(e)}")
+
+@router.get("/audiences/{audience}/tokens")
+async def get_audience_tokens(
+    audience: str,
+    cursor: Optional[str] = None,
+    limit: int = 500,
+    current_user: dict = Depends(get_current_user)
+):
+    """Cursor-paginated device tokens for an audience segment (admin only)"""
+    # Check if user is admin
+    if not current_user.get("is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if audience not in AUDIENCE_SEGMENTS:
+        raise HTTPException(status_code=404, detail="Unknown audience")
+    
+    page = await device_token_registry.get_page(audience, cursor, max(1, min(limit, TOKEN_PAGE_SIZE)))
+    page["audience"] = audience
+    page["total"] = await device_token_registry.segment_size(audience)
+    return page
+
 @router.get("/analytics")
 async def get_notification_analytics(
-    days: int = 30,
+    days: int = Query(30, ge=1, le=MAX_ANALYTICS_DAYS),
     current_user: dict = Depends(get_current_user)
 ):
     """Get notification analytics and metrics"""
@@ -206,120 +276,844 @@ async def get_notification_analytics(
     if not current_user.get("is_admin", False):
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    # Mock analytics data (replace with real database queries)
-    analytics = {
-        "total_sent": len(notification_history),
-        "delivery_rate": 94.2,
-        "open_rate": 67.8,
-        "platform_breakdown": {
-            "ios": {"sent": 450, "delivered": 425, "opened": 289},
-            "android": {"sent": 380, "delivered": 358, "opened": 243},
-            "web": {"sent": 120, "delivered": 115, "opened": 78}
-        },
-        "top_templates": [
-            {"template": "roast-milestone", "sent": 150, "open_rate": 72.3},
-            {"template": "roast-complete", "sent": 120, "open_rate": 68.5},
-            {"template": "bean-profile-tip", "sent": 80, "open_rate": 45.2}
-        ]
-    }
+    return await notification_history.get_analytics(days)
+
+@router.post("/{notification_id}/opened")
+async def record_notification_opened(
+    notification_id: int,
+    platform: str,
+    device_token: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Record that a delivered notification was opened on a device (repeat opens are ignored)"""
+    if platform not in PLATFORM_SEGMENTS:
+        raise HTTPException(status_code=400, detail="Platform must be 'ios', 'android' or 'web'")
     
-    return analytics
+    device = f"{current_user.get('id')}:{device_token or platform}"
+    if not await notification_history.record_open(notification_id, platform, device):
+        raise HTTPException(status_code=404, detail="Notification not found")
+    return {"message": "Open recorded"}
 
 async def send_push_notification(notification: NotificationRequest) -> dict:
     """Send push notification to devices"""
     try:
-        # Get target audience tokens
-        device_tokens = await get_device_tokens_for_audience(notification.audience)
-        
-        if not device_tokens:
-            return {"message": "No devices found for target audience", "sent_count": 0}
-        
-        # Send to each platform
-        ios_tokens = [token for token in device_tokens if token["platform"] == "ios"]
-        android_tokens = [token for token in device_tokens if token["platform"] == "android"]
-        web_tokens = [token for token in device_tokens if token["platform"] == "web"]
-        
+        # Stream the audience page by page - never the whole token list at once
         sent_count = 0
+        results: Dict[str, Dict] = {}
+        async for page in iter_device_tokens_for_audience(notification.audience):
+            # Group by platform in one pass
+            tokens_by_platform: Dict[str, List[Dict]] = {}
+            for token in page:
+                tokens_by_platform.setdefault(token["platform"], []).append(token)
+            
+            # Send to every platform concurrently
+            page_results = await push_engine.fan_out(tokens_by_platform, notification)
+            for platform, result in page_results.items():
+                totals = results.setdefault(platform, {"provider": result["provider"], "sent": 0, "failed": 0, "batches": 0})
+                for key in ("sent", "failed", "batches"):
+                    totals[key] += result.get(key, 0)
+                sent_count += result.get("sent", 0)
         
-        # Send to iOS (APNs)
-        if ios_tokens:
-            ios_result = await send_to_ios(ios_tokens, notification)
-            sent_count += ios_result.get("sent", 0)
-        
-        # Send to Android (FCM)
-        if android_tokens:
-            android_result = await send_to_android(android_tokens, notification)
-            sent_count += android_result.get("sent", 0)
-        
-        # Send to Web (Web Push)
-        if web_tokens:
-            web_result = await send_to_web(web_tokens, notification)
-            sent_count += web_result.get("sent", 0)
+        if not results:
+            return {"message": "No devices found for target audience", "sent_count": 0}
         
         # Store notification in history
-        notification_record = {
-            "id": len(notification_history) + 1,
-            "title": notification.title,
-            "body": notification.body,
-            "audience": notification.audience,
-            "sent_at": datetime.now(),
-            "status": "delivered",
-            "delivery_rate": 94.2,
-            "open_rate": 67.8
-        }
-        notification_history.insert(0, notification_record)
+        await notification_history.record_sent(notification, results)
         
         return {
             "message": "Notification sent successfully",
             "sent_count": sent_count,
-            "target_audience": notification.audience
+            "target_audience": notification.audience,
+            "platforms": results
         }
         
     except Exception as e:
         raise Exception(f"Failed to send push notification: {str(e)}")
 
-async def get_device_tokens_for_audience(audience: str) -> List[Dict]:
-    """Get device tokens for target audience"""
-    # Mock implementation - replace with database query
-    mock_tokens = [
-        {"user_id": "user1", "token": "ios_token_1", "platform": "ios"},
-        {"user_id": "user2", "token": "android_token_1", "platform": "android"},
-        {"user_id": "user3", "token": "web_token_1", "platform": "web"},
-        {"user_id": "user4", "token": "ios_token_2", "platform": "ios"},
-        {"user_id": "user5", "token": "android_token_2", "platform": "android"},
-    ]
-    
-    # Filter by audience (simplified logic)
-    if audience == "all":
-        return mock_tokens
-    elif audience == "ios-users":
-        return [token for token in mock_tokens if token["platform"] == "ios"]
-    elif audience == "android-users":
-        return [token for token in mock_tokens if token["platform"] == "android"]
-    elif audience == "web-users":
-        return [token for token in mock_tokens if token["platform"] == "web"]
-    else:
-        return mock_tokens
-
-async def send_to_ios(tokens: List[Dict], notification: NotificationRequest) -> Dict:
-    """Send notification to iOS devices via APNs"""
+async def send_to_ios(client, tokens: List[Dict], notification: NotificationRequest) -> Dict:
+    """Send one batch of notifications to iOS devices via APNs (client: pooled HTTP/2 connection)"""
     # TODO: Implement actual APNs integration
     # For now, return mock success
     return {"sent": len(tokens), "failed": 0}
 
-async def send_to_android(tokens: List[Dict], notification: NotificationRequest) -> Dict:
-    """Send notification to Android devices via FCM"""
+async def send_to_android(client, tokens: List[Dict], notification: NotificationRequest) -> Dict:
+    """Send one batch (FCM multicast, up to 500 tokens) to Android devices via FCM (client: pooled connection)"""
     # TODO: Implement actual FCM integration
     # For now, return mock success
     return {"sent": len(tokens), "failed": 0}
 
-async def send_to_web(tokens: List[Dict], notification: NotificationRequest) -> Dict:
-    """Send notification to Web browsers via Web Push API"""
+async def send_to_web(client, tokens: List[Dict], notification: NotificationRequest) -> Dict:
+    """Send one batch of notifications to Web browsers via Web Push API (client is None - per-subscription endpoints)"""
     # TODO: Implement actual Web Push integration
     # For now, return mock success
     return {"sent": len(tokens), "failed": 0}
 
-async def send_scheduled_notification(notification: NotificationRequest, delay_seconds: float):
-    """Send a scheduled notification after delay"""
-    await asyncio.sleep(delay_seconds)
-    await send_push_notification(notification)
+# ---------------------------------------------------------------------------
+# Push fan-out engine
+# ---------------------------------------------------------------------------
+
+@dataclass
+class PushProviderConfig:
+    """Delivery limits for one push provider"""
+    platform: str
+    name: str
+    endpoint: str
+    batch_size: int              # device tokens per send_batch call
+    devices_per_request: int     # device tokens one provider request carries (rate-limit cost)
+    requests_per_second: float   # provider rate limit
+    max_concurrent_batches: int  # in-flight batches on the pooled connection
+
+    def requests_for(self, device_count: int) -> int:
+        return -(-device_count // self.devices_per_request)
+
+# Provider limits (FCM multicast caps at 500 tokens; APNs and Web Push are
+# one device per request, multiplexed over a single HTTP/2 connection)
+PUSH_PROVIDERS = {
+    "ios": PushProviderConfig("ios", "APNs", "https://api.push.apple.com", 100, 1, 50.0, 20),
+    "android": PushProviderConfig("android", "FCM", "https://fcm.googleapis.com", 500, 500, 20.0, 10),
+    "web": PushProviderConfig("web", "Web Push", "", 100, 1, 50.0, 20)
+}
+
+class TokenBucket:
+    """
+    Async token-bucket rate limiter.
+    
+    acquire() reserves its tokens straight away (the balance may go negative)
+    and then sleeps off the debt outside the lock, so callers are served in
+    arrival order and one waiter never blocks the others while it sleeps.
+    """
+    
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None):
+        self.rate = rate_per_second
+        self.capacity = capacity or rate_per_second
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, cost: float = 1.0):
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= cost
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class PushProvider:
+    """Chunks tokens to the provider's batch size and sends them over one pooled connection"""
+    
+    def __init__(self, config: PushProviderConfig,
+                 send_batch: Callable[[Any, List[Dict], NotificationRequest], Awaitable[Dict]]):
+        self.config = config
+        self.send_batch = send_batch
+        self.rate_limiter = TokenBucket(config.requests_per_second)
+        self._client = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+    
+    def get_client(self):
+        """Pooled HTTP/2 client, created on first use (None if httpx isn't installed)"""
+        if self._client is None and self.config.endpoint:
+            try:
+                import httpx
+                limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+                try:
+                    self._client = httpx.AsyncClient(base_url=self.config.endpoint, http2=True, limits=limits)
+                except ImportError:
+                    # h2 not installed - fall back to a pooled HTTP/1.1 connection
+                    self._client = httpx.AsyncClient(base_url=self.config.endpoint, limits=limits)
+            except ImportError:
+                logger.warning(f"⚠️ httpx not installed - {self.config.name} connection pooling disabled")
+        return self._client
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Created on first use, inside the event loop"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.config.max_concurrent_batches)
+        return self._semaphore
+    
+    async def _send_chunk(self, chunk: List[Dict], notification: NotificationRequest) -> Dict:
+        async with self._get_semaphore():
+            await self.rate_limiter.acquire(self.config.requests_for(len(chunk)))
+            try:
+                return await self.send_batch(self.get_client(), chunk, notification)
+            except Exception as e:
+                logger.error(f"❌ {self.config.name} batch of {len(chunk)} failed: {e}")
+                return {"sent": 0, "failed": len(chunk)}
+    
+    async def send(self, tokens: List[Dict], notification: NotificationRequest) -> Dict:
+        size = self.config.batch_size
+        chunks = [tokens[i:i + size] for i in range(0, len(tokens), size)]
+        results = await asyncio.gather(*(self._send_chunk(chunk, notification) for chunk in chunks))
+        
+        return {
+            "provider": self.config.name,
+            "sent": sum(r.get("sent", 0) for r in results),
+            "failed": sum(r.get("failed", 0) for r in results),
+            "batches": len(chunks)
+        }
+    
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class PushFanoutEngine:
+    """Sends one notification to all platforms concurrently"""
+    
+    def __init__(self, providers: Dict[str, PushProvider]):
+        self.providers = providers
+    
+    async def fan_out(self, tokens_by_platform: Dict[str, List[Dict]],
+                      notification: NotificationRequest) -> Dict[str, Dict]:
+        platforms = [p for p, tokens in tokens_by_platform.items() if tokens and p in self.providers]
+        for platform in tokens_by_platform:
+            if platform not in self.providers:
+                logger.warning(f"⚠️ No push provider for platform '{platform}' - skipping")
+        
+        results = await asyncio.gather(*(
+            self.providers[platform].send(tokens_by_platform[platform], notification)
+            for platform in platforms
+        ))
+        return dict(zip(platforms, results))
+    
+    async def close(self):
+        await asyncio.gather(*(provider.close() for provider in self.providers.values()))
+
+# Global instance (send_to_* are the provider stand-ins)
+push_engine = PushFanoutEngine({
+    "ios": PushProvider(PUSH_PROVIDERS["ios"], send_to_ios),
+    "android": PushProvider(PUSH_PROVIDERS["android"], send_to_android),
+    "web": PushProvider(PUSH_PROVIDERS["web"], send_to_web)
+})
+
+# ---------------------------------------------------------------------------
+# Local SQLite persistence
+# ---------------------------------------------------------------------------
+
+# Scheduler, device tokens and history share one local SQLite file
+NOTIFICATIONS_DB_FILE = "notifications.db"
+
+class SQLiteStore:
+    """Small thread-safe SQLite wrapper; subclasses list their DDL in SCHEMA"""
+    
+    SCHEMA: List[str] = []
+    
+    def __init__(self, db_file: str = NOTIFICATIONS_DB_FILE):
+        self.db_file = db_file
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+        return self._conn
+    
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._db_lock:
+            conn = self._db()
+            rows = conn.execute(sql, params).fetchall()
+            conn.commit()
+            return rows
+
+# ---------------------------------------------------------------------------
+# Device-token registry
+# ---------------------------------------------------------------------------
+
+PLATFORM_SEGMENTS = {"ios": "ios-users", "android": "android-users", "web": "web-users"}
+AUDIENCE_SEGMENTS = {"all", "ios-users", "android-users", "web-users", "premium", "beta"}
+PREMIUM_SUBSCRIPTIONS = {"premium", "pro", "enterprise"}
+TOKEN_PAGE_SIZE = 1000
+
+class DeviceTokenRegistry(SQLiteStore):
+    """
+    Device tokens keyed by token, indexed by user and platform, with
+    precomputed audience segments.
+    
+    Segment membership rows are added/removed as tokens are registered and
+    unregistered, so resolving an audience is an index range scan. Reads are
+    cursor-paginated on the token so a broadcast streams page by page.
+    """
+    
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS device_tokens (
+            token TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            platform TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            last_used TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_device_tokens_user ON device_tokens (user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_device_tokens_platform ON device_tokens (platform, token)",
+        """
+        CREATE TABLE IF NOT EXISTS device_token_segments (
+            segment TEXT NOT NULL,
+            token TEXT NOT NULL,
+            PRIMARY KEY (segment, token)
+        ) WITHOUT ROWID
+        """
+    ]
+    
+    def _segments_for(self, platform: str, premium: bool, beta: bool) -> List[str]:
+        segments = ["all"]
+        if platform in PLATFORM_SEGMENTS:
+            segments.append(PLATFORM_SEGMENTS[platform])
+        if premium:
+            segments.append("premium")
+        if beta:
+            segments.append("beta")
+        return segments
+    
+    def _register(self, token: str, user_id: str, platform: str, premium: bool, beta: bool):
+        now = datetime.now().isoformat()
+        with self._db_lock:
+            conn = self._db()
+            conn.execute("""
+                INSERT INTO device_tokens (token, user_id, platform, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(token) DO UPDATE SET
+                    user_id = excluded.user_id, platform = excluded.platform, last_used = excluded.last_used
+            """, (token, user_id, platform, now, now))
+            # Token may have moved user/platform - rebuild its memberships
+            conn.execute("DELETE FROM device_token_segments WHERE token = ?", (token,))
+            conn.executemany(
+                "INSERT INTO device_token_segments (segment, token) VALUES (?, ?)",
+                [(segment, token) for segment in self._segments_for(platform, premium, beta)]
+            )
+            conn.commit()
+    
+    def _unregister(self, token: str, user_id: Optional[str] = None) -> bool:
+        with self._db_lock:
+            conn = self._db()
+            if user_id is not None:
+                cursor = conn.execute("DELETE FROM device_tokens WHERE token = ? AND user_id = ?", (token, user_id))
+            else:
+                cursor = conn.execute("DELETE FROM device_tokens WHERE token = ?", (token,))
+            if cursor.rowcount:
+                conn.execute("DELETE FROM device_token_segments WHERE token = ?", (token,))
+            conn.commit()
+            return cursor.rowcount > 0
+    
+    def _set_user_segments(self, user_id: str, premium: bool, beta: bool):
+        """Re-derive premium/beta memberships for all of a user's tokens"""
+        with self._db_lock:
+            conn = self._db()
+            tokens = [row[0] for row in conn.execute(
+                "SELECT token FROM device_tokens WHERE user_id = ?", (user_id,)
+            ).fetchall()]
+            for segment, member in (("premium", premium), ("beta", beta)):
+                if member:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO device_token_segments (segment, token) VALUES (?, ?)",
+                        [(segment, token) for token in tokens]
+                    )
+                else:
+                    conn.executemany(
+                        "DELETE FROM device_token_segments WHERE segment = ? AND token = ?",
+                        [(segment, token) for token in tokens]
+                    )
+            conn.commit()
+    
+    def _page(self, segment: str, after: Optional[str], limit: int) -> List[Dict]:
+        rows = self._execute("""
+            SELECT t.user_id, t.token, t.platform
+            FROM device_token_segments s
+            JOIN device_tokens t ON t.token = s.token
+            WHERE s.segment = ? AND s.token > ?
+            ORDER BY s.token
+            LIMIT ?
+        """, (segment, after or "", limit))
+        return [{"user_id": user_id, "token": token, "platform": platform} for user_id, token, platform in rows]
+    
+    async def register(self, token: str, user_id: str, platform: str,
+                       premium: bool = False, beta: bool = False):
+        await asyncio.to_thread(self._register, token, user_id, platform, premium, beta)
+    
+    async def unregister(self, token: str, user_id: Optional[str] = None) -> bool:
+        return await asyncio.to_thread(self._unregister, token, user_id)
+    
+    async def set_user_segments(self, user_id: str, premium: bool, beta: bool):
+        await asyncio.to_thread(self._set_user_segments, user_id, premium, beta)
+    
+    async def get_page(self, audience: str, cursor: Optional[str] = None,
+                       limit: int = TOKEN_PAGE_SIZE) -> Dict[str, Any]:
+        """One page of an audience; pass next_cursor back to continue"""
+        tokens = await asyncio.to_thread(self._page, audience, cursor, limit)
+        next_cursor = tokens[-1]["token"] if len(tokens) == limit else None
+        return {"tokens": tokens, "next_cursor": next_cursor}
+    
+    async def iter_pages(self, audience: str, page_size: int = TOKEN_PAGE_SIZE):
+        """Stream an audience page by page"""
+        cursor = None
+        while True:
+            page = await self.get_page(audience, cursor, page_size)
+            if page["tokens"]:
+                yield page["tokens"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
+    
+    async def segment_size(self, audience: str) -> int:
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT COUNT(*) FROM device_token_segments WHERE segment = ?", (audience,)
+        )
+        return rows[0][0]
+
+# Global instance
+device_token_registry = DeviceTokenRegistry()
+
+def segment_flags(user_metadata: Dict[str, Any]) -> tuple:
+    """(premium, beta) segment membership for a user's metadata"""
+    return (
+        user_metadata.get("subscription_status") in PREMIUM_SUBSCRIPTIONS,
+        bool(user_metadata.get("beta_access"))
+    )
+
+def _sync_user_segments(user: CachedUser, previous: Optional[CachedUser]):
+    """Keep premium/beta segments in step with the user's metadata as it's refreshed"""
+    premium, beta = segment_flags(user.user_metadata)
+    if previous is not None and segment_flags(previous.user_metadata) == (premium, beta):
+        return
+    device_token_registry._set_user_segments(user.id, premium, beta)
+
+user_cache.add_listener(_sync_user_segments)
+
+def resolve_audience_segment(audience: str) -> str:
+    """Map a requested audience to a precomputed segment"""
+    if audience in AUDIENCE_SEGMENTS:
+        return audience
+    logger.warning(f"⚠️ Unknown audience '{audience}' - sending to all")
+    return "all"
+
+async def iter_device_tokens_for_audience(audience: str, page_size: int = TOKEN_PAGE_SIZE):
+    """Stream device tokens for target audience page by page"""
+    async for page in device_token_registry.iter_pages(resolve_audience_segment(audience), page_size):
+        yield page
+
+# ---------------------------------------------------------------------------
+# Notification history + delivery analytics
+# ---------------------------------------------------------------------------
+
+HISTORY_PAGE_LIMIT = 200
+
+def _rate(numerator: int, denominator: int) -> float:
+    return round(numerator / denominator * 100, 1) if denominator else 0.0
+
+class NotificationHistoryStore(SQLiteStore):
+    """
+    Persisted notification history with incremental delivery/open counters.
+    
+    Every send appends a row (ids grow with sent_at, so the id doubles as the
+    pagination cursor) and bumps per-day, per-platform, per-template counters.
+    Analytics read the counter rows for the requested window instead of
+    scanning history. Pages are always read from SQLite (an id-range scan on
+    the primary key), so every worker sees sends and opens from the others.
+    Opens are de-duplicated per notification and device.
+    """
+    
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS notification_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            body TEXT NOT NULL,
+            audience TEXT NOT NULL,
+            template TEXT NOT NULL DEFAULT '',
+            sent_at TEXT NOT NULL,
+            status TEXT NOT NULL,
+            targeted INTEGER NOT NULL DEFAULT 0,
+            delivered INTEGER NOT NULL DEFAULT 0,
+            opened INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_notification_history_sent_at ON notification_history (sent_at)",
+        """
+        CREATE TABLE IF NOT EXISTS notification_daily_stats (
+            day TEXT NOT NULL,
+            platform TEXT NOT NULL,
+            template TEXT NOT NULL,
+            sent INTEGER NOT NULL DEFAULT 0,
+            delivered INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            opened INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, platform, template)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS notification_opens (
+            notification_id INTEGER NOT NULL,
+            device TEXT NOT NULL,
+            PRIMARY KEY (notification_id, device)
+        ) WITHOUT ROWID
+        """
+    ]
+    
+    COLUMNS = "id, title, body, audience, sent_at, status, targeted, delivered, opened"
+    
+    @staticmethod
+    def _to_record(row: tuple) -> Dict[str, Any]:
+        notification_id, title, body, audience, sent_at, status, targeted, delivered, opened = row
+        return {
+            "id": notification_id,
+            "title": title,
+            "body": body,
+            "audience": audience,
+            "sent_at": datetime.fromisoformat(sent_at),
+            "status": status,
+            "targeted": targeted,
+            "delivered": delivered,
+            "opened": opened,
+            "delivery_rate": _rate(delivered, targeted),
+            "open_rate": _rate(opened, delivered)
+        }
+    
+    def _insert(self, notification: NotificationRequest, results: Dict[str, Dict],
+                sent_at: datetime) -> tuple:
+        template = notification.template or ""
+        day = sent_at.date().isoformat()
+        delivered = sum(result.get("sent", 0) for result in results.values())
+        failed = sum(result.get("failed", 0) for result in results.values())
+        status = "delivered" if not failed else ("failed" if not delivered else "partial")
+        
+        with self._db_lock:
+            conn = self._db()
+            cursor = conn.execute(
+                "INSERT INTO notification_history "
+                "(title, body, audience, template, sent_at, status, targeted, delivered) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (notification.title, notification.body, notification.audience, template,
+                 sent_at.isoformat(), status, delivered + failed, delivered)
+            )
+            conn.executemany("""
+                INSERT INTO notification_daily_stats (day, platform, template, sent, delivered, failed)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(day, platform, template) DO UPDATE SET
+                    sent = sent + excluded.sent,
+                    delivered = delivered + excluded.delivered,
+                    failed = failed + excluded.failed
+            """, [
+                (day, platform, template,
+                 result.get("sent", 0) + result.get("failed", 0), result.get("sent", 0), result.get("failed", 0))
+                for platform, result in results.items()
+            ])
+            conn.commit()
+        return (cursor.lastrowid, notification.title, notification.body, notification.audience,
+                sent_at.isoformat(), status, delivered + failed, delivered, 0)
+    
+    def _increment_open(self, notification_id: int, platform: str, device: str) -> bool:
+        with self._db_lock:
+            conn = self._db()
+            row = conn.execute(
+                "SELECT sent_at, template FROM notification_history WHERE id = ?", (notification_id,)
+            ).fetchone()
+            if not row:
+                return False
+            sent_at, template = row
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO notification_opens (notification_id, device) VALUES (?, ?)",
+                (notification_id, device)
+            )
+            if not cursor.rowcount:
+                # This device's open was already counted
+                conn.commit()
+                return True
+            conn.execute("UPDATE notification_history SET opened = opened + 1 WHERE id = ?", (notification_id,))
+            # Opens count against the day the notification went out so rates stay consistent
+            conn.execute("""
+                INSERT INTO notification_daily_stats (day, platform, template, opened)
+                VALUES (?, ?, ?, 1)
+                ON CONFLICT(day, platform, template) DO UPDATE SET opened = opened + 1
+            """, (sent_at[:10], platform, template))
+            conn.commit()
+            return True
+    
+    def _select_page(self, before: Optional[int], limit: int) -> List[tuple]:
+        if before is None:
+            return self._execute(
+                f"SELECT {self.COLUMNS} FROM notification_history ORDER BY id DESC LIMIT ?", (limit,)
+            )
+        return self._execute(
+            f"SELECT {self.COLUMNS} FROM notification_history WHERE id < ? ORDER BY id DESC LIMIT ?",
+            (before, limit)
+        )
+    
+    async def record_sent(self, notification: NotificationRequest,
+                          results: Dict[str, Dict]) -> Dict[str, Any]:
+        """Persist a sent notification and bump the delivery counters"""
+        row = await asyncio.to_thread(self._insert, notification, results, datetime.now())
+        return self._to_record(row)
+    
+    async def record_open(self, notification_id: int, platform: str, device: str) -> bool:
+        """Count an open once per device; False if the notification doesn't exist"""
+        return await asyncio.to_thread(self._increment_open, notification_id, platform, device)
+    
+    async def get_page(self, cursor: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest-first history page; cursor is the last id of the previous page"""
+        rows = await asyncio.to_thread(self._select_page, cursor, limit)
+        return [self._to_record(row) for row in rows]
+    
+    def _load_stats(self, since_day: str) -> List[tuple]:
+        return self._execute("""
+            SELECT platform, template, SUM(sent), SUM(delivered), SUM(failed), SUM(opened)
+            FROM notification_daily_stats
+            WHERE day >= ?
+            GROUP BY platform, template
+        """, (since_day,))
+    
+    async def get_analytics(self, days: int = 30) -> Dict[str, Any]:
+        """Delivery/open analytics for the last `days` days from the counters"""
+        days = min(max(days, 1), MAX_ANALYTICS_DAYS)
+        since_day = (datetime.now() - timedelta(days=days - 1)).date().isoformat()
+        rows = await asyncio.to_thread(self._load_stats, since_day)
+        
+        platforms: Dict[str, Dict[str, int]] = {}
+        templates: Dict[str, Dict[str, int]] = {}
+        totals = {"sent": 0, "delivered": 0, "failed": 0, "opened": 0}
+        for platform, template, sent, delivered, failed, opened in rows:
+            counts = {"sent": sent, "delivered": delivered, "failed": failed, "opened": opened}
+            for bucket in (platforms.setdefault(platform, dict.fromkeys(counts, 0)), totals):
+                for key, value in counts.items():
+                    bucket[key] += value
+            if template:
+                template_counts = templates.setdefault(template, dict.fromkeys(counts, 0))
+                for key, value in counts.items():
+                    template_counts[key] += value
+        
+        top_templates = sorted(templates.items(), key=lambda item: item[1]["sent"], reverse=True)[:5]
+        return {
+            "days": days,
+            "total_sent": totals["sent"],
+            "total_delivered": totals["delivered"],
+            "total_failed": totals["failed"],
+            "total_opened": totals["opened"],
+            "delivery_rate": _rate(totals["delivered"], totals["sent"]),
+            "open_rate": _rate(totals["opened"], totals["delivered"]),
+            "platform_breakdown": {
+                platform: {"sent": counts["sent"], "delivered": counts["delivered"], "opened": counts["opened"]}
+                for platform, counts in platforms.items()
+            },
+            "top_templates": [
+                {"template": template, "sent": counts["sent"], "open_rate": _rate(counts["opened"], counts["delivered"])}
+                for template, counts in top_templates
+            ]
+        }
+
+# Global instance
+notification_history = NotificationHistoryStore()
+
+# ---------------------------------------------------------------------------
+# Durable notification scheduler
+# ---------------------------------------------------------------------------
+
+SCHEDULER_BATCH_SIZE = 100        # due notifications claimed per dispatcher pass
+SCHEDULER_MAX_IDLE_SECONDS = 30   # re-check the store at least this often
+SCHEDULER_LEASE_SECONDS = 300     # claims older than this are re-delivered
+SCHEDULER_MAX_ATTEMPTS = 5
+SCHEDULER_RETENTION_SECONDS = 7 * 24 * 3600   # sent/cancelled rows are pruned after this
+SCHEDULER_PRUNE_INTERVAL_SECONDS = 3600
+
+class NotificationScheduler(SQLiteStore):
+    """
+    Persisted, due-time indexed notification queue with a single dispatcher task.
+    
+    Scheduled notifications live in SQLite (indexed on status + due_at), so
+    nothing is lost on restart and memory use doesn't grow with the number
+    scheduled - the dispatcher only ever holds one batch of due rows.
+    Delivery is at-least-once: rows are claimed before sending, marked sent
+    afterwards, and claims left behind by a crash are retried.
+    """
+    
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS scheduled_notifications (
+            id TEXT PRIMARY KEY,
+            due_at REAL NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            claimed_at REAL,
+            last_error TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_scheduled_status_due ON scheduled_notifications (status, due_at)"
+    ]
+    
+    def __init__(self, db_file: str = NOTIFICATIONS_DB_FILE):
+        super().__init__(db_file)
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+    
+    def _insert(self, schedule_id: str, due_at: float, payload: str):
+        self._execute(
+            "INSERT INTO scheduled_notifications (id, due_at, payload) VALUES (?, ?, ?)",
+            (schedule_id, due_at, payload)
+        )
+    
+    def _claim_due(self, now: float) -> List[tuple]:
+        """
+        Claim due rows (and expired claims) in one write transaction.
+        BEGIN IMMEDIATE takes SQLite's write lock before the SELECT, so other
+        worker processes sharing the file can't claim the same rows.
+        """
+        with self._db_lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute("""
+                    SELECT id, payload, attempts FROM scheduled_notifications
+                    WHERE (status = 'pending' AND due_at <= ?)
+                       OR (status = 'sending' AND claimed_at <= ?)
+                    ORDER BY due_at
+                    LIMIT ?
+                """, (now, now - SCHEDULER_LEASE_SECONDS, SCHEDULER_BATCH_SIZE)).fetchall()
+                conn.executemany(
+                    "UPDATE scheduled_notifications SET status = 'sending', claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(now, row[0]) for row in rows]
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            # Report the attempt number this delivery represents
+            return [(schedule_id, payload, attempts + 1) for schedule_id, payload, attempts in rows]
+    
+    def _prune(self, now: float) -> int:
+        """Delete delivered and cancelled rows past the retention window"""
+        with self._db_lock:
+            conn = self._db()
+            cursor = conn.execute(
+                "DELETE FROM scheduled_notifications WHERE status IN ('sent', 'cancelled') AND due_at <= ?",
+                (now - SCHEDULER_RETENTION_SECONDS,)
+            )
+            conn.commit()
+            return cursor.rowcount
+    
+    def _next_due_at(self) -> Optional[float]:
+        rows = self._execute(
+            "SELECT MIN(due_at) FROM scheduled_notifications WHERE status = 'pending'"
+        )
+        return rows[0][0] if rows else None
+    
+    async def schedule(self, notification: NotificationRequest, send_at: datetime) -> str:
+        """Persist a notification for later delivery"""
+        schedule_id = str(uuid.uuid4())
+        payload = notification.dict()
+        payload["scheduled_time"] = None  # deliver immediately once due
+        await asyncio.to_thread(
+            self._insert, schedule_id, send_at.timestamp(), json.dumps(payload, default=str)
+        )
+        
+        self.start()
+        if self._wakeup:
+            # The new notification may be due before whatever the dispatcher is waiting on
+            self._wakeup.set()
+        logger.info(f"🗓️ Scheduled notification {schedule_id} for {send_at.isoformat()}")
+        return schedule_id
+    
+    def _cancel(self, schedule_id: str) -> bool:
+        with self._db_lock:
+            conn = self._db()
+            cursor = conn.execute(
+                "UPDATE scheduled_notifications SET status = 'cancelled' WHERE id = ? AND status = 'pending'",
+                (schedule_id,)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+    
+    async def cancel(self, schedule_id: str) -> bool:
+        return await asyncio.to_thread(self._cancel, schedule_id)
+    
+    async def pending_count(self) -> int:
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT COUNT(*) FROM scheduled_notifications WHERE status IN ('pending', 'sending')"
+        )
+        return rows[0][0]
+    
+    async def _deliver(self, schedule_id: str, payload: str, attempts: int):
+        try:
+            await send_push_notification(NotificationRequest(**json.loads(payload)))
+            await asyncio.to_thread(
+                self._execute,
+                "UPDATE scheduled_notifications SET status = 'sent' WHERE id = ?",
+                (schedule_id,)
+            )
+        except Exception as e:
+            # Retry with exponential backoff, then give up
+            if attempts >= SCHEDULER_MAX_ATTEMPTS:
+                status, due_at = "failed", time.time()
+                logger.error(f"❌ Scheduled notification {schedule_id} failed permanently: {e}")
+            else:
+                status, due_at = "pending", time.time() + min(3600, 30 * 2 ** attempts)
+                logger.warning(f"⚠️ Scheduled notification {schedule_id} failed (attempt {attempts}), retrying: {e}")
+            await asyncio.to_thread(
+                self._execute,
+                "UPDATE scheduled_notifications SET status = ?, due_at = ?, last_error = ? WHERE id = ?",
+                (status, due_at, str(e), schedule_id)
+            )
+    
+    async def _dispatch_loop(self, wakeup: asyncio.Event):
+        logger.info("✅ Notification scheduler dispatcher started")
+        last_pruned = 0.0
+        while True:
+            try:
+                due = await asyncio.to_thread(self._claim_due, time.time())
+                if due:
+                    await asyncio.gather(*(self._deliver(*row) for row in due))
+                    continue  # there may be more due rows
+                
+                if time.time() - last_pruned >= SCHEDULER_PRUNE_INTERVAL_SECONDS:
+                    last_pruned = time.time()
+                    pruned = await asyncio.to_thread(self._prune, last_pruned)
+                    if pruned:
+                        logger.info(f"🧹 Pruned {pruned} delivered/cancelled scheduled notifications")
+                
+                next_due_at = await asyncio.to_thread(self._next_due_at)
+                timeout = SCHEDULER_MAX_IDLE_SECONDS
+                if next_due_at is not None:
+                    timeout = max(0.0, min(timeout, next_due_at - time.time()))
+                
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Notification scheduler error: {e}")
+                await asyncio.sleep(5)
+    
+    def start(self):
+        """Start the dispatcher task (once per process)"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._dispatch_loop(self._wakeup))
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global instance
+notification_scheduler = NotificationScheduler()
+
+@router.on_event("startup")
+async def start_notification_scheduler():
+    """Resume delivery of notifications scheduled before a restart"""
+    notification_scheduler.start()
+
+@router.on_event("shutdown")
+async def close_push_connections():
+    """Stop the scheduler and close pooled provider connections"""
+    await notification_scheduler.stop()
+    await push_engine.close()
@@ -4,6 +4,8 @@ Roast Chat Feedback Router - handles feedback on AI chat messages
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+import asyncio
+import time
 import logging
 
 from utils.database import get_supabase
@@ -13,6 +15,13 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/roast-chat", tags=["Roast Chat Feedback"])
 
+NEGATIVE_FEEDBACK_TYPES = ['wrong_advice', 'too_late', 'confusing', 'not_relevant']
+
+# Analytics are cached briefly - they're read far more often than they change
+ANALYTICS_CACHE_TTL_SECONDS = 30
+_analytics_cache: Dict[str, Any] = {"data": None, "expires_at": 0.0}
+_analytics_lock = asyncio.Lock()
+
 class RoastChatFeedbackInput(BaseModel):
     roast_id: int
     chat_message_id: str
@@ -60,6 +69,9 @@ async def submit_feedback(
         
         feedback_id = result.data[0]['id']
         
+        # New feedback - let the next analytics request recompute
+        _analytics_cache["expires_at"] = 0.0
+        
         # Log feedback submission
         logger.info(f"✅ Feedback '{feedback.feedback_type}' recorded for message {feedback.chat_message_id}")
         
@@ -73,7 +85,7 @@ async def submit_feedback(
                 # Don't fail the request if golden examples processing fails
         
         # If negative feedback, log for review
-        if feedback.feedback_type in ['wrong_advice', 'too_late', 'confusing', 'not_relevant']:
+        if feedback.feedback_type in NEGATIVE_FEEDBACK_TYPES:
             try:
                 from RAG_system.roast_chat_learning import log_for_review
                 log_for_review(feedback, user_id)
@@ -102,24 +114,54 @@ async def get_feedback_analytics(
     Get feedback analytics (admin/developer use)
     """
     try:
-        # Query the analytics view
-        analytics_result = supabase.table('roast_chat_feedback_analytics').select('*').execute()
-        
-        # Query feedback by phase
-        phase_result = supabase.table('roast_chat_feedback_by_phase').select('*').execute()
-        
-        # Get recent negative feedback for review
-        negative_feedback = supabase.table('roast_chat_feedback').select('*').in_(
-            'feedback_type', ['wrong_advice', 'too_late', 'confusing', 'not_relevant']
-        ).order('created_at', desc=True).limit(10).execute()
+        cached = _analytics_cache["data"]
+        if cached is not None and time.time() < _analytics_cache["expires_at"]:
+            return cached
         
-        return {
-            "analytics": analytics_result.data[0] if analytics_result.data else {},
-            "by_phase": phase_result.data,
-            "recent_negative": negative_feedback.data,
-            "golden_examples_count": len(supabase.table('roast_chat_golden_examples').select('id').execute().data or [])
-        }
+        # Only one request recomputes; the rest wait and reuse its result
+        async with _analytics_lock:
+            cached = _analytics_cache["data"]
+            if cached is not None and time.time() < _analytics_cache["expires_at"]:
+                return cached
+            
+            analytics = await _compute_feedback_analytics(supabase)
+            _analytics_cache["data"] = analytics
+            _analytics_cache["expires_at"] = time.time() + ANALYTICS_CACHE_TTL_SECONDS
+            return analytics
         
     except Exception as e:
         logger.error(f"Error getting feedback analytics: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+async def _compute_feedback_analytics(supabase) -> Dict[str, Any]:
+    """Run the independent analytics queries concurrently"""
+    
+    def query_analytics_view():
+        return supabase.table('roast_chat_feedback_analytics').select('*').execute()
+    
+    def query_by_phase():
+        return supabase.table('roast_chat_feedback_by_phase').select('*').execute()
+    
+    def query_recent_negative():
+        # Get recent negative feedback for review
+        return supabase.table('roast_chat_feedback').select('*').in_(
+            'feedback_type', NEGATIVE_FEEDBACK_TYPES
+        ).order('created_at', desc=True).limit(10).execute()
+    
+    def query_golden_examples_count():
+        # Exact count from the Content-Range header - transfers at most one id
+        return supabase.table('roast_chat_golden_examples').select('id', count='exact').limit(1).execute()
+    
+    analytics_result, phase_result, negative_feedback, golden_count_result = await asyncio.gather(
+        asyncio.to_thread(query_analytics_view),
+        asyncio.to_thread(query_by_phase),
+        asyncio.to_thread(query_recent_negative),
+        asyncio.to_thread(query_golden_examples_count)
+    )
+    
+    return {
+        "analytics": analytics_result.data[0] if analytics_result.data else {},
+        "by_phase": phase_result.data,
+        "recent_negative": negative_feedback.data,
+        "golden_examples_count": golden_count_result.count or 0
+    }
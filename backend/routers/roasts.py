@@ -1,16 +1,29 @@
 """
 Roast-related API endpoints
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, BackgroundTasks
+from postgrest.types import CountMethod
+from typing import Dict, List, Optional
 import time
 from datetime import datetime
 
-from schemas import CreateRoastRequest, LogEventRequest, UpdateRoastRequest, SemanticSearchRequest
+from schemas import CreateRoastRequest, LogEventRequest, UpdateRoastRequest, SemanticSearchRequest, EVENT_KINDS
 from utils.environmental import get_environmental_conditions
 from utils.database import get_supabase, get_or_create_machine_id
 from utils.auth import verify_jwt_token
+from utils.curve_codec import (
+    CURVE_FILE_EXTENSION, CURVE_MEDIA_TYPE, decode_curves, encode_curves, to_artisan, to_artisan_bundle
+)
+from utils.pagination import (
+    NEXT_CURSOR_HEADER, apply_keyset, clamp_page_size, decode_cursor, fetch_roast_events, is_invalid_column_error,
+    page_results, select_columns
+)
 from RAG_system.weaviate.weaviate_integration import search_roasts_semantic, get_weaviate_integration
+from RAG_system.curve_analysis import analyze_curve, SMOOTHING_METHODS
+from RAG_system.roast_stream import roast_streams
+from RAG_system.phase_awareness import machine_phase_detector, phase_durations
+from RAG_system.temperature_calibration import temperature_calibrator
+from RAG_system.sensor_calibration import sensor_calibration
 
 router = APIRouter(prefix="", tags=["Roasts"])
 
@@ -130,8 +143,33 @@ async def create_roast(request: CreateRoastRequest, user_id: str = Depends(verif
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Milestone event kind -> roast_entries (seconds column, minutes column)
+MILESTONE_COLUMNS = {
+    "DRY_END": ("t_dry_end_sec", "t_dry_end"),
+    "FIRST_CRACK": ("t_first_crack_sec", "t_first_crack"),
+    "SECOND_CRACK": ("t_second_crack_sec", "t_second_crack"),
+    "COOL": ("t_drop_sec", "t_drop"),
+}
+
+
+def milestone_update(kind: str, t_offset_sec: int) -> Dict:
+    seconds_column, minutes_column = MILESTONE_COLUMNS[kind]
+    return {seconds_column: t_offset_sec, minutes_column: t_offset_sec // 60}
+
+
+STREAM_EVENT_COLUMNS = "kind, t_offset_sec, temp_f, heat_level, fan_level"
+
+
+def _update_sensor_calibration(roast_id: int):
+    try:
+        sensor_calibration.update_from_roast(get_supabase(), roast_id)
+    except Exception as e:
+        print(f"Sensor calibration update failed for roast {roast_id}: {e}")
+
+
 @router.post("/roasts/{roast_id}/events")
-async def log_event(roast_id: int, request: LogEventRequest, user_id: str = Depends(verify_jwt_token)):
+async def log_event(roast_id: int, request: LogEventRequest, background_tasks: BackgroundTasks,
+                    user_id: str = Depends(verify_jwt_token)):
     try:
         sb = get_supabase()
         
@@ -154,26 +192,42 @@ async def log_event(roast_id: int, request: LogEventRequest, user_id: str = Depe
             "fan_level": request.fan_level,
             "heat_level": request.heat_level,
             "temp_f": request.temp_f,
+            "probe_temp_f": request.probe_temp_f,
             "note": request.note,
         }
         
         # Remove None values
         event_data = {k: v for k, v in event_data.items() if v is not None}
         
+        # Line this worker's live state up with the stored events first (only when the
+        # roast is new here or due a recheck): other workers may have logged, edited
+        # or deleted some since it last saw them
+        if roast_streams.needs_sync(roast_id):
+            stored = sb.table("roast_events").select("id", count=CountMethod.exact).eq("roast_id", roast_id).limit(1).execute()
+            roast_streams.sync(roast_id, stored.count or 0, lambda after_t: fetch_roast_events(sb, roast_id, STREAM_EVENT_COLUMNS, after_t))
+
         sb.table("roast_events").insert(event_data).execute()
+        temp_analysis = roast_streams.record(roast_id, event_data)
         
         # Update milestone fields for special events
-        if request.kind in ["DRY_END", "FIRST_CRACK", "SECOND_CRACK", "COOL"]:
-            col_map = {
-                "DRY_END": {"t_dry_end_sec": t_offset_sec, "t_dry_end": t_offset_sec // 60},
-                "FIRST_CRACK": {"t_first_crack_sec": t_offset_sec, "t_first_crack": t_offset_sec // 60},
-                "SECOND_CRACK": {"t_second_crack_sec": t_offset_sec, "t_second_crack": t_offset_sec // 60},
-                "COOL": {"t_drop_sec": t_offset_sec, "t_drop": t_offset_sec // 60},
-            }
-            update_data = col_map[request.kind]
+        if request.kind in MILESTONE_COLUMNS:
+            update_data = milestone_update(request.kind, t_offset_sec)
             sb.table("roast_entries").update(update_data).eq("id", roast_id).execute()
+
+        # A finished roast refines the machine's learned sensor calibration (after the response).
+        # Only COOL triggers it: END is also a drop kind and would fold the roast in twice
+        if request.kind == "COOL":
+            background_tasks.add_task(_update_sensor_calibration, roast_id)
         
-        return {"success": True, "t_offset_sec": t_offset_sec}
+        return {
+            "success": True,
+            "t_offset_sec": t_offset_sec,
+            "ror_per_min": temp_analysis.get('smoothed_ror_per_min'),
+            "temperature_alerts": {
+                flag: temp_analysis.get(flag, False)
+                for flag in ("has_spike", "is_fast", "is_stalled", "has_crash", "has_flick")
+            }
+        }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -195,6 +249,245 @@ async def get_events(roast_id: int, user_id: str = Depends(verify_jwt_token)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+CURVE_EVENT_COLUMNS = "roast_id, kind, t_offset_sec, temp_f, probe_temp_f, heat_level, fan_level, note"
+CURVE_BUNDLE_MAX_ROASTS = 200
+CURVE_EVENT_PAGE_SIZE = 1000         # Supabase returns at most 1000 rows per request
+CURVE_DELETE_CHUNK_SIZE = 200        # event ids per delete request (keeps the URL short)
+MAX_CURVE_UPLOAD_BYTES = 1024 * 1024 # a compressed single-roast curve is a few KB
+
+
+def _owned_roasts(sb, user_id: str, roast_ids) -> Dict[int, Dict]:
+    """{roast_id: roast row} for the ids this user owns"""
+    result = sb.table("roast_entries").select("id, created_at").eq("user_id", user_id).in_("id", list(roast_ids)).execute()
+    return {row["id"]: row for row in result.data}
+
+
+def _fetch_curve_events(sb, roast_ids: List[int]) -> Dict[int, list]:
+    """{roast_id: events in time order}, paged past the per-request row cap"""
+    curves: Dict[int, list] = {roast_id: [] for roast_id in roast_ids}
+    start = 0
+    while True:
+        query = sb.table("roast_events").select(CURVE_EVENT_COLUMNS).in_("roast_id", roast_ids)
+        # postgrest-py 0.13 has no multi-column order(); a total order keeps the pages disjoint
+        query.params = query.params.add("order", "roast_id,t_offset_sec,id")
+        rows = query.range(start, start + CURVE_EVENT_PAGE_SIZE - 1).execute().data or []
+        for event in rows:
+            curves[event.pop("roast_id")].append(event)
+        if len(rows) < CURVE_EVENT_PAGE_SIZE:
+            return curves
+        start += CURVE_EVENT_PAGE_SIZE
+
+
+def _roast_event_ids(sb, roast_id: int) -> List[str]:
+    """Ids of every event currently stored for a roast (paged)"""
+    ids: List[str] = []
+    start = 0
+    while True:
+        rows = sb.table("roast_events").select("id").eq("roast_id", roast_id).order("id") \
+            .range(start, start + CURVE_EVENT_PAGE_SIZE - 1).execute().data or []
+        ids.extend(row["id"] for row in rows)
+        if len(rows) < CURVE_EVENT_PAGE_SIZE:
+            return ids
+        start += CURVE_EVENT_PAGE_SIZE
+
+
+def _delete_events(sb, event_ids: List[str]):
+    for start in range(0, len(event_ids), CURVE_DELETE_CHUNK_SIZE):
+        sb.table("roast_events").delete().in_("id", event_ids[start:start + CURVE_DELETE_CHUNK_SIZE]).execute()
+
+
+async def _read_limited_body(request: Request, max_bytes: int) -> bytes:
+    """Request body, or 413 as soon as it grows past max_bytes"""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Curve file larger than {max_bytes} bytes")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Curve file larger than {max_bytes} bytes")
+    return bytes(body)
+
+
+def _curve_response(curves: Dict[int, list], roasts: Dict[int, Dict], fmt: str, filename: str) -> Response:
+    if fmt == "artisan":
+        if len(curves) == 1:
+            roast_id, events = next(iter(curves.items()))
+            content = to_artisan(events, f"Roast {roast_id}", roasts[roast_id].get("created_at") or "")
+            return Response(content, media_type="text/plain",
+                            headers={"Content-Disposition": f'attachment; filename="{filename}.alog"'})
+        content = to_artisan_bundle((f"roast_{roast_id}", f"Roast {roast_id}", events) for roast_id, events in curves.items())
+        return Response(content, media_type="application/zip",
+                        headers={"Content-Disposition": f'attachment; filename="{filename}.zip"'})
+    return Response(encode_curves(curves), media_type=CURVE_MEDIA_TYPE,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}{CURVE_FILE_EXTENSION}"'})
+
+
+@router.get("/roasts/{roast_id}/curve")
+async def export_roast_curve(roast_id: int, format: str = "rbc", user_id: str = Depends(verify_jwt_token)):
+    """
+    A roast's events as a compact binary curve (format=rbc, the default) or an
+    Artisan .alog profile (format=artisan)
+    """
+    if format not in ("rbc", "artisan"):
+        raise HTTPException(status_code=400, detail="format must be 'rbc' or 'artisan'")
+    try:
+        sb = get_supabase()
+        roasts = _owned_roasts(sb, user_id, [roast_id])
+        if not roasts:
+            raise HTTPException(status_code=404, detail="Roast not found")
+
+        return _curve_response(_fetch_curve_events(sb, [roast_id]), roasts, format, f"roast_{roast_id}")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/roast-curves")
+async def export_roast_curves(ids: str, format: str = "rbc", user_id: str = Depends(verify_jwt_token)):
+    """
+    Several roasts in one download: a multi-roast curve bundle (format=rbc) or a
+    zip of Artisan profiles (format=artisan). `ids` is a comma-separated list.
+    """
+    if format not in ("rbc", "artisan"):
+        raise HTTPException(status_code=400, detail="format must be 'rbc' or 'artisan'")
+    try:
+        roast_ids = list(dict.fromkeys(int(roast_id) for roast_id in ids.split(",") if roast_id.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of roast ids")
+    if not roast_ids or len(roast_ids) > CURVE_BUNDLE_MAX_ROASTS:
+        raise HTTPException(status_code=400, detail=f"Request between 1 and {CURVE_BUNDLE_MAX_ROASTS} roasts")
+
+    try:
+        sb = get_supabase()
+        roasts = _owned_roasts(sb, user_id, roast_ids)
+        missing = [roast_id for roast_id in roast_ids if roast_id not in roasts]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Roasts not found: {', '.join(map(str, missing))}")
+
+        # Every roast's events in one paged query
+        return _curve_response(_fetch_curve_events(sb, roast_ids), roasts, format, "roast_curves")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/roasts/{roast_id}/curve")
+async def import_roast_curve(roast_id: int, request: Request, replace: bool = False,
+                             user_id: str = Depends(verify_jwt_token)):
+    """
+    Load events into a roast from a binary curve (the request body).
+
+    The body must hold exactly one roast; replace=true swaps out the roast's
+    existing events (removed only after the new ones are stored), otherwise
+    the imported events are appended.
+    """
+    body = await _read_limited_body(request, MAX_CURVE_UPLOAD_BYTES)
+    try:
+        curves = decode_curves(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(curves) != 1:
+        raise HTTPException(status_code=400, detail=f"Expected one roast in the curve file, found {len(curves)}")
+    unknown_kinds = {event["kind"] for event in next(iter(curves.values()))} - EVENT_KINDS
+    if unknown_kinds:
+        raise HTTPException(status_code=400, detail=f"Unknown event kinds in the curve file: {', '.join(sorted(unknown_kinds))}")
+
+    try:
+        sb = get_supabase()
+        if not _owned_roasts(sb, user_id, [roast_id]):
+            raise HTTPException(status_code=404, detail="Roast not found")
+
+        events = next(iter(curves.values()))
+        old_event_ids = _roast_event_ids(sb, roast_id) if replace else []
+        rows = [{**event, "roast_id": roast_id} for event in events]
+        # PostgREST bulk inserts need every object in a request to have the same keys
+        groups: Dict[frozenset, list] = {}
+        for row in rows:
+            groups.setdefault(frozenset(row), []).append(row)
+        inserted_ids: List[str] = []
+        try:
+            for group in groups.values():
+                result = sb.table("roast_events").insert(group).execute()
+                inserted_ids.extend(row["id"] for row in result.data or [] if "id" in row)
+        except Exception:
+            # Leave the roast as it was rather than half-imported
+            _delete_events(sb, inserted_ids)
+            raise
+        # Old events go only once the new ones are stored
+        _delete_events(sb, old_event_ids)
+        roast_streams.reset(roast_id)
+
+        # Same milestone columns log_event fills (events are in time order, so the last one wins)
+        update_data = {}
+        for event in events:
+            if event["kind"] in MILESTONE_COLUMNS:
+                update_data.update(milestone_update(event["kind"], event["t_offset_sec"]))
+        if update_data:
+            sb.table("roast_entries").update(update_data).eq("id", roast_id).execute()
+
+        return {"success": True, "imported_events": len(rows), "replaced": replace}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/roasts/{roast_id}/analysis")
+async def get_roast_analysis(roast_id: int, smoothing: str = "savgol", include_series: bool = False,
+                             include_phases: bool = False, calibrated: bool = False,
+                             user_id: str = Depends(verify_jwt_token)):
+    """
+    Curve metrics for a roast: smoothed ROR, phase durations, DTR, turning
+    point, ROR crash/flick and area under the curve. include_series adds the
+    resampled temperature and ROR arrays for charting; include_phases labels
+    every event with its roasting phase for the roast's machine. calibrated
+    analyzes estimated bean temperature (the machine's learned sensor
+    calibration, or the default schedule, applied to the whole curve) instead
+    of raw readings.
+    """
+    if smoothing not in SMOOTHING_METHODS:
+        raise HTTPException(status_code=400, detail=f"smoothing must be one of: {', '.join(SMOOTHING_METHODS)}")
+    try:
+        sb = get_supabase()
+        roast_result = sb.table("roast_entries").select(
+            "id, machine_id, weight_before_g, temperature_f, machines(model, has_extension, temp_sensor_type, probe_offset_f)"
+        ).eq("id", roast_id).eq("user_id", user_id).execute()
+        if not roast_result.data:
+            raise HTTPException(status_code=404, detail="Roast not found")
+
+        events = fetch_roast_events(sb, roast_id, "kind, t_offset_sec, temp_f")
+        machine = roast_result.data[0].get("machines") or {}
+        if calibrated:
+            roast = roast_result.data[0]
+            events = temperature_calibrator.calibrate_events(
+                events, machine.get("temp_sensor_type") or "builtin", machine.get("probe_offset_f"), interpolate=True,
+                model=sensor_calibration.fitted(sb, roast.get("machine_id")),
+                batch_g=roast.get("weight_before_g"), ambient_f=roast.get("temperature_f")
+            )
+        analysis = analyze_curve(events, method=smoothing).to_dict(include_series)
+
+        if include_phases and machine.get("model"):
+            labeled = machine_phase_detector.classify_events(
+                machine["model"], bool(machine.get("has_extension")), events
+            )
+            analysis["phases"] = {
+                "events": labeled,
+                "seconds": {phase: round(seconds, 1) for phase, seconds in phase_durations(labeled).items()}
+            }
+        return analysis
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/roasts/{roast_id}/events/{event_id}")
 async def delete_event(roast_id: int, event_id: str, user_id: str = Depends(verify_jwt_token)):
     try:
@@ -212,6 +505,7 @@ async def delete_event(roast_id: int, event_id: str, user_id: str = Depends(veri
         
         # Delete the event
         sb.table("roast_events").delete().eq("id", event_id).execute()
+        roast_streams.reset(roast_id)
         
         return {"success": True, "message": "Event deleted"}
         
@@ -249,6 +543,7 @@ async def update_event(roast_id: int, event_id: str, request: LogEventRequest, u
         update_data = {k: v for k, v in update_data.items() if v is not None}
         
         sb.table("roast_events").update(update_data).eq("id", event_id).execute()
+        roast_streams.reset(roast_id)
         
         return {"success": True, "message": "Event updated"}
         
@@ -309,53 +604,81 @@ async def update_roast(roast_id: int, request: UpdateRoastRequest, user_id: str
         raise HTTPException(status_code=500, detail=str(e))
 
 
+ROAST_FIELD_PRESETS = {
+    # Columns the history list, dashboard and compare views read
+    "summary": (
+        "id", "created_at", "updated_at", "machine_id", "bean_profile_id", "desired_roast_level",
+        "roast_status", "weight_before_g", "weight_after_g", "weight_loss_pct", "star_rating",
+        "temperature_f", "humidity_pct"
+    )
+}
+ROAST_JOINS = "machines(name), bean_profiles(name, origin, process_method, variety, bean_type)"
+
+
+def flatten_roast_row(roast: Dict) -> Dict:
+    """Lift the joined machine and bean profile fields onto the roast row (in place)"""
+    machine = roast.pop('machines', None)
+    roast['machine_label'] = machine.get('name') if machine else None
+
+    bean_profile = roast.pop('bean_profiles', None)
+    if not bean_profile:
+        roast['bean_profile_name'] = None
+        return roast
+
+    name = bean_profile.get('name')
+    roast['bean_profile_name'] = name or None
+    # Add bean profile origin and process to roast data for display
+    if bean_profile.get('origin'):
+        roast['coffee_region'] = bean_profile['origin']
+    elif name:
+        # Extract region from bean profile name (first word)
+        roast['coffee_region'] = name.split()[0]
+    if bean_profile.get('process_method'):
+        roast['coffee_process'] = bean_profile['process_method']
+    if bean_profile.get('variety'):
+        roast['variety'] = bean_profile['variety']
+    if bean_profile.get('bean_type'):
+        roast['coffee_type'] = bean_profile['bean_type']
+    return roast
+
+
 @router.get("/roasts")
-async def get_roasts(limit: int = 100, user_id: str = Depends(verify_jwt_token)):
+async def get_roasts(
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    user_id: str = Depends(verify_jwt_token)
+):
+    """
+    The user's roasts, newest first.
+
+    Keyset-paginated: when there are more roasts the X-Next-Cursor response
+    header holds the cursor for the next page. `fields` is "summary" or a
+    comma-separated column list (default: every column).
+    """
+    try:
+        limit = clamp_page_size(limit)
+        columns = select_columns(fields, ROAST_FIELD_PRESETS)
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
         sb = get_supabase()
         # Join with machines and bean_profiles tables to get machine name, bean profile name, origin, and process
-        result = sb.table("roast_entries").select("*, machines(name), bean_profiles(name, origin, process_method, variety, bean_type)").eq("user_id", user_id).order("created_at", desc=True).limit(limit).execute()
-        
-        # Flatten the machine name and bean profile data into the roast data
-        roasts = []
-        for roast in result.data:
-            roast_data = roast.copy()
-            if roast.get('machines') and roast['machines'].get('name'):
-                roast_data['machine_label'] = roast['machines']['name']
-            else:
-                roast_data['machine_label'] = None
-            
-            if roast.get('bean_profiles'):
-                bean_profile = roast['bean_profiles']
-                if bean_profile.get('name'):
-                    roast_data['bean_profile_name'] = bean_profile['name']
-                else:
-                    roast_data['bean_profile_name'] = None
-                
-                # Add bean profile origin and process to roast data for display
-                if bean_profile.get('origin'):
-                    roast_data['coffee_region'] = bean_profile['origin']
-                elif bean_profile.get('name'):
-                    # Extract region from bean profile name (first word)
-                    roast_data['coffee_region'] = bean_profile['name'].split()[0] if bean_profile['name'] else None
-                if bean_profile.get('process_method'):
-                    roast_data['coffee_process'] = bean_profile['process_method']
-                if bean_profile.get('variety'):
-                    roast_data['variety'] = bean_profile['variety']
-                if bean_profile.get('bean_type'):
-                    roast_data['coffee_type'] = bean_profile['bean_type']
-            else:
-                roast_data['bean_profile_name'] = None
-                print(f"DEBUG: Roast {roast.get('id')} has no linked bean profile")
-            
-            # Remove the nested objects
-            roast_data.pop('machines', None)
-            roast_data.pop('bean_profiles', None)
-            roasts.append(roast_data)
-        
-        return roasts
-        
+        query = sb.table("roast_entries").select(f"{columns}, {ROAST_JOINS}").eq("user_id", user_id)
+        result = apply_keyset(query, cursor, limit).execute()
+
+        rows, next_cursor = page_results(result.data, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return [flatten_roast_row(roast) for roast in rows]
+
     except Exception as e:
+        if is_invalid_column_error(e):
+            raise HTTPException(status_code=400, detail=f"Invalid fields: {getattr(e, 'message', None) or e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -374,6 +697,7 @@ async def delete_roast(roast_id: int, user_id: str = Depends(verify_jwt_token)):
         
         # Delete the roast entry
         sb.table("roast_entries").delete().eq("id", roast_id).execute()
+        roast_streams.reset(roast_id)
         
         return {"success": True, "message": "Roast and all associated events deleted"}
         
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tests for the coffee region catalog behind /coffee-regions
+
+The region file is read once and re-read only when its mtime changes,
+validation is a set lookup, names resolve case/accent-insensitively, search
+serves prefix then fuzzy matches, and the list endpoint answers 304 for a
+current ETag. Needs the API dependencies (FastAPI, Supabase, Weaviate
+client); without them every test is skipped.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from fastapi import Request
+    import routers.beans as beans
+    HAVE_API_DEPS = True
+except ImportError as e:
+    HAVE_API_DEPS = False
+    print(f"⚠️ Bean router tests skipped: {e}")
+
+REGIONS = ["Ethiopia", "Kenya", "Costa Rica", "Puerto Rico", "Côte d'Ivoire", "Papua New Guinea", "Guatemala", "Other"]
+
+
+def _write_regions(path, regions):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"regions": regions, "regions_by_continent": {"Africa": regions[:2]}}, f)
+
+
+def _catalog(regions=REGIONS):
+    """A catalog over a temporary region file"""
+    path = os.path.join(tempfile.mkdtemp(), "coffee_regions.json")
+    _write_regions(path, regions)
+    return beans.CoffeeRegionCatalog(path)
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/coffee-regions", "headers": headers})
+
+
+def test_validation_and_resolve():
+    if not HAVE_API_DEPS:
+        return
+    catalog = _catalog()
+    assert catalog.get_regions() == REGIONS
+    assert catalog.regions_by_continent == {"Africa": ["Ethiopia", "Kenya"]}
+    assert catalog.contains("Costa Rica") and not catalog.contains("costa rica")
+    assert catalog.resolve("  COTE d'ivoire ") == "Côte d'Ivoire"
+    assert catalog.resolve("cote-d-ivoire") == "Côte d'Ivoire"
+    assert catalog.resolve("Atlantis") is None
+
+
+def test_reloads_only_when_the_file_changes():
+    if not HAVE_API_DEPS:
+        return
+    catalog = _catalog()
+    etag = catalog.etag
+    catalog.get_regions()
+
+    _write_regions(catalog.path, ["Yemen", "Other"])
+    stat = os.stat(catalog.path)
+    os.utime(catalog.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert catalog.get_regions() == REGIONS                  # within the re-check interval
+    catalog._checked_at -= beans.REGION_RELOAD_CHECK_SECONDS
+    assert catalog.get_regions() == ["Yemen", "Other"]
+    assert catalog.contains("Yemen") and not catalog.contains("Kenya")
+    assert catalog.etag != etag
+
+
+def test_missing_or_broken_file_falls_back():
+    if not HAVE_API_DEPS:
+        return
+    missing = beans.CoffeeRegionCatalog(os.path.join(tempfile.mkdtemp(), "nope.json"))
+    assert missing.get_regions() == ["Other"] and missing.contains("Other")
+
+    catalog = _catalog()
+    catalog.get_regions()
+    with open(catalog.path, "w") as f:
+        f.write("{not json")
+    stat = os.stat(catalog.path)
+    os.utime(catalog.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    catalog._checked_at -= beans.REGION_RELOAD_CHECK_SECONDS
+    assert catalog.get_regions() == REGIONS                  # keeps the last good list
+
+
+def test_search():
+    if not HAVE_API_DEPS:
+        return
+    catalog = _catalog()
+    assert catalog.search("") == REGIONS
+    assert catalog.search("", limit=2) == ["Ethiopia", "Kenya"]
+    assert catalog.search("rica") == ["Costa Rica", "Puerto Rico"]             # any later word
+    assert catalog.search("gu") == ["Papua New Guinea", "Guatemala"]          # list order
+    assert catalog.search("kenia") == ["Kenya"]                                # fuzzy
+    assert catalog.search("ke") == ["Kenya"]
+    assert catalog.search("zz") == []                                          # too short for fuzzy
+
+
+def test_coffee_regions_etag():
+    if not HAVE_API_DEPS:
+        return
+    original = beans.coffee_region_catalog
+    beans.coffee_region_catalog = _catalog()
+    try:
+        response = asyncio.run(beans.get_coffee_regions(_request()))
+        etag = response.headers["etag"]
+        assert response.status_code == 200 and json.loads(bytes(response.body)) == {"regions": REGIONS}
+
+        for if_none_match in (etag, f'"stale", {etag}', "*"):
+            assert asyncio.run(beans.get_coffee_regions(_request(if_none_match))).status_code == 304
+        assert asyncio.run(beans.get_coffee_regions(_request('"stale"'))).status_code == 200
+
+        found = asyncio.run(beans.search_coffee_regions(q="rica", limit=1000))
+        assert found == {"query": "rica", "regions": ["Costa Rica", "Puerto Rico"]}
+        assert asyncio.run(beans.search_coffee_regions(q="", limit=0))["regions"] == ["Ethiopia"]
+    finally:
+        beans.coffee_region_catalog = original
+
+
+def main():
+    """Run all bean router tests"""
+    print("🚀 Starting Bean Router Tests\n")
+    if not HAVE_API_DEPS:
+        return
+
+    tests = [
+        test_validation_and_resolve,
+        test_reloads_only_when_the_file_changes,
+        test_missing_or_broken_file_falls_back,
+        test_search,
+        test_coffee_regions_etag
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
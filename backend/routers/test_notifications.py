@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Tests for the push notification pipeline
+
+Push fan-out: the token bucket sleeps off its debt outside the lock, the rate
+limit is charged per provider request (an FCM multicast carries 500 devices),
+and each provider chunks its tokens to its batch size while every platform
+sends concurrently.
+
+Scheduler: due rows are claimed once (BEGIN IMMEDIATE, so two stores sharing
+the file never claim the same row), expired leases are re-delivered, failures
+back off until SCHEDULER_MAX_ATTEMPTS, and old rows are pruned.
+
+Device tokens: segment memberships follow register/unregister and metadata
+changes, and an audience streams page by page without repeats.
+
+History: pages are id-keyset, opens count once per device, and analytics
+read the daily counters with the window clamped to MAX_ANALYTICS_DAYS. Needs the API dependencies (FastAPI); without them every
+test is skipped.
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import routers.notifications as notifications
+    HAVE_API_DEPS = True
+except ImportError as e:
+    HAVE_API_DEPS = False
+    print(f"⚠️ Notification tests skipped: {e}")
+
+
+def _notification(audience="all"):
+    return notifications.NotificationRequest(title="Roast day", body="Time to roast", audience=audience)
+
+
+def _tokens(n, platform="ios"):
+    return [{"user_id": f"user-{i}", "token": f"{platform}-{i}", "platform": platform} for i in range(n)]
+
+
+def _db_file():
+    return os.path.join(tempfile.mkdtemp(), "notifications.db")
+
+
+def test_requests_for():
+    if not HAVE_API_DEPS:
+        return
+    ios, android = notifications.PUSH_PROVIDERS["ios"], notifications.PUSH_PROVIDERS["android"]
+    assert ios.requests_for(100) == 100
+    assert android.requests_for(1) == 1
+    assert android.requests_for(500) == 1
+    assert android.requests_for(501) == 2
+
+
+def test_token_bucket_waiters_do_not_block_each_other():
+    if not HAVE_API_DEPS:
+        return
+    bucket = notifications.TokenBucket(rate_per_second=10.0, capacity=1.0)
+
+    async def run():
+        started = time.perf_counter()
+        await bucket.acquire()                                  # spends the only token
+        await asyncio.gather(*(bucket.acquire() for _ in range(3)))
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(run())
+    assert 0.25 <= elapsed < 0.45                               # 3 x 0.1s of debt, slept concurrently
+    assert bucket.tokens < 0
+
+
+def test_provider_chunks_and_charges_per_request():
+    if not HAVE_API_DEPS:
+        return
+    batches = []
+
+    async def send_batch(client, tokens, notification):
+        batches.append(len(tokens))
+        return {"sent": len(tokens), "failed": 0}
+
+    config = notifications.PushProviderConfig("android", "FCM", "", 500, 500, 1000.0, 4)
+    provider = notifications.PushProvider(config, send_batch)
+    result = asyncio.run(provider.send(_tokens(1200, "android"), _notification()))
+    assert sorted(batches) == [200, 500, 500]
+    assert result == {"provider": "FCM", "sent": 1200, "failed": 0, "batches": 3}
+    assert 996.0 < provider.rate_limiter.tokens < 998.0        # one request per multicast batch
+
+
+def test_failed_batch_counts_as_failed():
+    if not HAVE_API_DEPS:
+        return
+
+    async def send_batch(client, tokens, notification):
+        if tokens[0]["token"] == "web-0":
+            raise RuntimeError("gateway timeout")
+        return {"sent": len(tokens), "failed": 0}
+
+    config = notifications.PushProviderConfig("web", "Web Push", "", 2, 1, 1000.0, 4)
+    provider = notifications.PushProvider(config, send_batch)
+    result = asyncio.run(provider.send(_tokens(5, "web"), _notification()))
+    assert result["sent"] == 3 and result["failed"] == 2 and result["batches"] == 3
+
+
+def test_fan_out_sends_platforms_concurrently():
+    if not HAVE_API_DEPS:
+        return
+
+    async def slow_batch(client, tokens, notification):
+        await asyncio.sleep(0.2)
+        return {"sent": len(tokens), "failed": 0}
+
+    engine = notifications.PushFanoutEngine({
+        platform: notifications.PushProvider(
+            notifications.PushProviderConfig(platform, platform, "", 100, 1, 1000.0, 10), slow_batch
+        )
+        for platform in ("ios", "android")
+    })
+    tokens_by_platform = {"ios": _tokens(3, "ios"), "android": _tokens(2, "android"), "fax": _tokens(1, "fax")}
+
+    started = time.perf_counter()
+    results = asyncio.run(engine.fan_out(tokens_by_platform, _notification()))
+    assert time.perf_counter() - started < 0.35                # not 2 x 0.2s
+    assert sorted(results) == ["android", "ios"]                # unknown platforms are skipped
+    assert results["ios"]["sent"] == 3 and results["android"]["sent"] == 2
+
+
+def _registry(devices=()):
+    """A registry on a temporary file with `devices` (token, user_id, platform, premium, beta) registered"""
+    registry = notifications.DeviceTokenRegistry(_db_file())
+    for device in devices:
+        registry._register(*device)
+    return registry
+
+
+def _audience(registry, audience, page_size=2):
+    async def collect():
+        return [
+            [token["token"] for token in page]
+            async for page in registry.iter_pages(audience, page_size)
+        ]
+
+    return asyncio.run(collect())
+
+
+def test_segments_follow_registration():
+    if not HAVE_API_DEPS:
+        return
+    registry = _registry([
+        ("t1", "u1", "ios", True, False),
+        ("t2", "u2", "android", False, True),
+        ("t3", "u1", "web", True, False)
+    ])
+    assert _audience(registry, "all") == [["t1", "t2"], ["t3"]]
+    assert _audience(registry, "premium") == [["t1", "t3"]]
+    assert _audience(registry, "beta") == [["t2"]]
+
+    registry._register("t1", "u2", "android", False, True)     # token moved to another user/device
+    assert _audience(registry, "ios-users") == []
+    assert _audience(registry, "android-users") == [["t1", "t2"]]
+    assert asyncio.run(registry.segment_size("premium")) == 1
+
+
+def test_unregister_is_scoped_to_the_owner():
+    if not HAVE_API_DEPS:
+        return
+    registry = _registry([("t1", "u1", "ios", True, True)])
+    assert not registry._unregister("t1", "someone-else")
+    assert registry._unregister("t1", "u1")
+    assert not registry._unregister("t1")
+    for audience in ("all", "ios-users", "premium", "beta"):
+        assert asyncio.run(registry.segment_size(audience)) == 0
+
+
+def test_user_segments_resync():
+    if not HAVE_API_DEPS:
+        return
+    registry = _registry([("t1", "u1", "ios", False, False), ("t2", "u1", "web", False, False)])
+    registry._set_user_segments("u1", True, False)
+    assert _audience(registry, "premium") == [["t1", "t2"]]
+    registry._set_user_segments("u1", True, False)             # idempotent
+    registry._set_user_segments("u1", False, True)
+    assert _audience(registry, "premium") == []
+    assert _audience(registry, "beta") == [["t1", "t2"]]
+    assert notifications.segment_flags({"subscription_status": "pro", "beta_access": 1}) == (True, True)
+    assert notifications.segment_flags({"subscription_status": "free"}) == (False, False)
+
+
+def test_audience_paging():
+    if not HAVE_API_DEPS:
+        return
+    registry = _registry([(f"t{i:02d}", f"u{i}", "ios", False, False) for i in range(5)])
+    first = asyncio.run(registry.get_page("all", limit=2))
+    assert [t["token"] for t in first["tokens"]] == ["t00", "t01"] and first["next_cursor"] == "t01"
+    last = asyncio.run(registry.get_page("all", cursor="t03", limit=2))
+    assert [t["token"] for t in last["tokens"]] == ["t04"] and last["next_cursor"] is None
+    assert sum(_audience(registry, "all", page_size=3), []) == [f"t{i:02d}" for i in range(5)]
+    assert notifications.resolve_audience_segment("premium") == "premium"
+    assert notifications.resolve_audience_segment("everyone") == "all"
+
+
+def _history(sends=()):
+    """A history store on a temporary file with `sends` (template, results) recorded"""
+    history = notifications.NotificationHistoryStore(_db_file())
+    for template, results in sends:
+        notification = notifications.NotificationRequest(title="Roast day", body="Time to roast", template=template)
+        asyncio.run(history.record_sent(notification, results))
+    return history
+
+
+def test_history_records_and_pages():
+    if not HAVE_API_DEPS:
+        return
+    history = _history([(None, {"ios": {"sent": 1, "failed": 0}})] * 5)
+    record = asyncio.run(history.record_sent(
+        _notification(), {"ios": {"sent": 3, "failed": 1}, "web": {"sent": 0, "failed": 0}}
+    ))
+    assert record["status"] == "partial" and record["targeted"] == 4 and record["delivery_rate"] == 75.0
+
+    first = asyncio.run(history.get_page(limit=4))
+    assert [item["id"] for item in first] == [6, 5, 4, 3]
+    rest = asyncio.run(history.get_page(cursor=first[-1]["id"], limit=4))
+    assert [item["id"] for item in rest] == [2, 1]
+
+
+def test_opens_count_once_per_device():
+    if not HAVE_API_DEPS:
+        return
+    history = _history([("roast_reminder", {"ios": {"sent": 2, "failed": 0}})])
+    assert asyncio.run(history.record_open(1, "ios", "u1:device-a"))
+    assert asyncio.run(history.record_open(1, "ios", "u1:device-a"))
+    assert asyncio.run(history.record_open(1, "ios", "u2:device-b"))
+    assert not asyncio.run(history.record_open(99, "ios", "u1:device-a"))
+    record = asyncio.run(history.get_page())[0]
+    assert record["opened"] == 2 and record["open_rate"] == 100.0
+
+
+def test_analytics_from_counters():
+    if not HAVE_API_DEPS:
+        return
+    history = _history([
+        ("roast_reminder", {"ios": {"sent": 8, "failed": 2}, "android": {"sent": 10, "failed": 0}}),
+        ("roast_reminder", {"ios": {"sent": 2, "failed": 0}}),
+        ("new_bean", {"web": {"sent": 1, "failed": 0}}),
+        (None, {"web": {"sent": 5, "failed": 0}})
+    ])
+    history._increment_open(1, "ios", "u1:device-a")
+    analytics = asyncio.run(history.get_analytics(days=7))
+    assert analytics["total_sent"] == 28 and analytics["total_delivered"] == 26
+    assert analytics["total_failed"] == 2 and analytics["total_opened"] == 1
+    assert analytics["platform_breakdown"]["ios"] == {"sent": 12, "delivered": 10, "opened": 1}
+    assert [t["template"] for t in analytics["top_templates"]] == ["roast_reminder", "new_bean"]
+    assert analytics["top_templates"][0]["sent"] == 22
+
+
+def test_analytics_window_is_clamped():
+    if not HAVE_API_DEPS:
+        return
+    history = _history([(None, {"ios": {"sent": 1, "failed": 0}})])
+    assert asyncio.run(history.get_analytics(days=10 ** 9))["days"] == notifications.MAX_ANALYTICS_DAYS
+    assert asyncio.run(history.get_analytics(days=0))["days"] == 1
+    assert asyncio.run(history.get_analytics(days=-5))["total_sent"] == 1     # today is always included
+
+
+def _scheduler(db_file=None, due=()):
+    """A scheduler on a temporary file with `due` (id, due_at) rows inserted"""
+    scheduler = notifications.NotificationScheduler(db_file or _db_file())
+    payload = _notification().model_dump_json()
+    for schedule_id, due_at in due:
+        scheduler._insert(schedule_id, due_at, payload)
+    return scheduler
+
+
+def _status(scheduler, schedule_id):
+    return scheduler._execute(
+        "SELECT status, attempts FROM scheduled_notifications WHERE id = ?", (schedule_id,)
+    )[0]
+
+
+def test_claims_only_due_rows_once():
+    if not HAVE_API_DEPS:
+        return
+    now = time.time()
+    scheduler = _scheduler(due=[("late", now + 60), ("b", now - 5), ("a", now - 10)])
+    claimed = scheduler._claim_due(now)
+    assert [(schedule_id, attempts) for schedule_id, _, attempts in claimed] == [("a", 1), ("b", 1)]
+    assert scheduler._claim_due(now) == []
+    assert _status(scheduler, "a") == ("sending", 1)
+    assert scheduler._next_due_at() == now + 60
+
+
+def test_stores_sharing_a_file_never_claim_the_same_row():
+    if not HAVE_API_DEPS:
+        return
+    now = time.time()
+    db_file = _db_file()
+    _scheduler(db_file, due=[(f"n-{i}", now - i) for i in range(notifications.SCHEDULER_BATCH_SIZE)])
+    workers = [notifications.NotificationScheduler(db_file) for _ in range(4)]
+    claimed = []
+    barrier = threading.Barrier(len(workers))
+
+    def claim(worker):
+        barrier.wait()
+        for _ in range(10):
+            claimed.extend(row[0] for row in worker._claim_due(now))
+
+    threads = [threading.Thread(target=claim, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(f"n-{i}" for i in range(notifications.SCHEDULER_BATCH_SIZE))
+
+
+def test_expired_lease_is_redelivered():
+    if not HAVE_API_DEPS:
+        return
+    now = time.time()
+    scheduler = _scheduler(due=[("a", now)])
+    scheduler._claim_due(now)
+    assert scheduler._claim_due(now + notifications.SCHEDULER_LEASE_SECONDS - 1) == []
+    reclaimed = scheduler._claim_due(now + notifications.SCHEDULER_LEASE_SECONDS)
+    assert [(row[0], row[2]) for row in reclaimed] == [("a", 2)]
+
+
+def _deliver(scheduler, attempts, error=None):
+    """Run _deliver for row "a" with send_push_notification replaced"""
+    async def send(notification):
+        if error:
+            raise Exception(error)
+        return {"sent_count": 1}
+
+    original = notifications.send_push_notification
+    notifications.send_push_notification = send
+    try:
+        asyncio.run(scheduler._deliver("a", _notification().model_dump_json(), attempts))
+    finally:
+        notifications.send_push_notification = original
+
+
+def test_failed_delivery_backs_off_then_gives_up():
+    if not HAVE_API_DEPS:
+        return
+    now = time.time()
+    scheduler = _scheduler(due=[("a", now)])
+    scheduler._claim_due(now)
+    _deliver(scheduler, 1, error="provider down")
+    status, due_at, last_error = scheduler._execute(
+        "SELECT status, due_at, last_error FROM scheduled_notifications WHERE id = 'a'"
+    )[0]
+    assert status == "pending" and due_at >= now + 60 and last_error == "provider down"
+
+    _deliver(scheduler, notifications.SCHEDULER_MAX_ATTEMPTS, error="provider down")
+    assert _status(scheduler, "a")[0] == "failed"
+    assert scheduler._claim_due(now + 10 ** 6) == []
+
+
+def test_delivered_rows_are_marked_sent():
+    if not HAVE_API_DEPS:
+        return
+    now = time.time()
+    scheduler = _scheduler(due=[("a", now)])
+    scheduler._claim_due(now)
+    _deliver(scheduler, 1)
+    assert _status(scheduler, "a") == ("sent", 1)
+    assert asyncio.run(scheduler.pending_count()) == 0
+
+
+def test_cancel_and_prune():
+    if not HAVE_API_DEPS:
+        return
+    now = time.time()
+    scheduler = _scheduler(due=[("a", now + 60), ("b", now - 10)])
+    assert asyncio.run(scheduler.cancel("a"))
+    assert not asyncio.run(scheduler.cancel("a"))
+    scheduler._claim_due(now)
+    assert not asyncio.run(scheduler.cancel("b"))               # already claimed for delivery
+
+    assert scheduler._prune(now) == 0
+    assert scheduler._prune(now + 60 + notifications.SCHEDULER_RETENTION_SECONDS) == 1
+    assert asyncio.run(scheduler.pending_count()) == 1          # "b" is still in flight
+
+
+def main():
+    """Run all notification tests"""
+    print("🚀 Starting Notification Tests\n")
+    if not HAVE_API_DEPS:
+        return
+
+    tests = [
+        test_requests_for,
+        test_token_bucket_waiters_do_not_block_each_other,
+        test_provider_chunks_and_charges_per_request,
+        test_failed_batch_counts_as_failed,
+        test_fan_out_sends_platforms_concurrently,
+        test_claims_only_due_rows_once,
+        test_stores_sharing_a_file_never_claim_the_same_row,
+        test_expired_lease_is_redelivered,
+        test_failed_delivery_backs_off_then_gives_up,
+        test_delivered_rows_are_marked_sent,
+        test_cancel_and_prune,
+        test_segments_follow_registration,
+        test_unregister_is_scoped_to_the_owner,
+        test_user_segments_resync,
+        test_audience_paging,
+        test_history_records_and_pages,
+        test_opens_count_once_per_device,
+        test_analytics_from_counters,
+        test_analytics_window_is_clamped
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
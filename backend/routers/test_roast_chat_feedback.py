@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Tests for the roast-chat feedback analytics endpoint
+
+The four analytics queries run concurrently and the golden example count is
+count-only. Results are cached for ANALYTICS_CACHE_TTL_SECONDS, concurrent
+requests share one recomputation, and new feedback invalidates the cache.
+Needs the API dependencies (FastAPI, Supabase); without them every test is
+skipped.
+"""
+
+import os
+import sys
+import asyncio
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import routers.roast_chat_feedback as feedback_router
+    HAVE_API_DEPS = True
+except ImportError as e:
+    HAVE_API_DEPS = False
+    print(f"⚠️ Roast chat feedback tests skipped: {e}")
+
+
+class _Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _Query:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.columns = None
+        self.count = None
+        self.inserted = None
+
+    def select(self, columns, count=None):
+        self.columns = columns
+        self.count = count
+        return self
+
+    def insert(self, row):
+        self.inserted = row
+        return self
+
+    def in_(self, column, values):
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def execute(self):
+        return self.client.execute(self)
+
+
+class _Supabase:
+    """Stand-in for the Supabase client, with a small delay per query"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def execute(self, query):
+        with self.lock:
+            self.queries.append((query.table, query.columns, query.count))
+        time.sleep(self.delay)
+        if query.inserted is not None:
+            return _Result([dict(query.inserted, id=1)])
+        if query.table == "roast_chat_golden_examples":
+            return _Result([{"id": 1}], count=42)
+        if query.table == "roast_chat_feedback_analytics":
+            return _Result([{"total_feedback": 7}])
+        return _Result([])
+
+
+def _reset_cache():
+    feedback_router._analytics_cache.update(data=None, expires_at=0.0)
+
+
+def test_queries_run_concurrently():
+    if not HAVE_API_DEPS:
+        return
+    _reset_cache()
+    supabase = _Supabase(delay=0.2)
+    started = time.perf_counter()
+    analytics = asyncio.run(feedback_router.get_feedback_analytics(user_id="admin", supabase=supabase))
+    assert time.perf_counter() - started < 0.6                  # not 4 x 0.2s
+    assert analytics["analytics"] == {"total_feedback": 7}
+    assert analytics["golden_examples_count"] == 42
+    assert ("roast_chat_golden_examples", "id", "exact") in supabase.queries
+
+
+def test_cached_and_shared_between_concurrent_requests():
+    if not HAVE_API_DEPS:
+        return
+    _reset_cache()
+    supabase = _Supabase()
+
+    async def burst():
+        return await asyncio.gather(*(
+            feedback_router.get_feedback_analytics(user_id="admin", supabase=supabase) for _ in range(5)
+        ))
+
+    results = asyncio.run(burst())
+    assert all(result is results[0] for result in results)
+    asyncio.run(feedback_router.get_feedback_analytics(user_id="admin", supabase=supabase))
+    assert len(supabase.queries) == 4
+
+
+def test_new_feedback_invalidates_the_cache():
+    if not HAVE_API_DEPS:
+        return
+    _reset_cache()
+    supabase = _Supabase(delay=0.0)
+    asyncio.run(feedback_router.get_feedback_analytics(user_id="admin", supabase=supabase))
+
+    feedback = feedback_router.RoastChatFeedbackInput(
+        roast_id=1, chat_message_id="msg-1", feedback_type="confusing",
+        ai_message_text="Raise the fan.", roast_context={"phase": "Drying"}
+    )
+    asyncio.run(feedback_router.submit_feedback(feedback, user_id="user-1", supabase=supabase))
+    supabase.queries.clear()
+    asyncio.run(feedback_router.get_feedback_analytics(user_id="admin", supabase=supabase))
+    assert len(supabase.queries) == 4
+
+
+def main():
+    """Run all roast chat feedback tests"""
+    print("🚀 Starting Roast Chat Feedback Tests\n")
+    if not HAVE_API_DEPS:
+        return
+
+    tests = [
+        test_queries_run_concurrently,
+        test_cached_and_shared_between_concurrent_requests,
+        test_new_feedback_invalidates_the_cache
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
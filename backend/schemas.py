@@ -72,11 +72,19 @@ class SemanticSearchRequest(BaseModel):
     limit: int = 10
 
 
+# Event kinds the app logs (milestones, control changes and readings)
+EVENT_KINDS = frozenset({
+    "CHARGE", "SET", "READING", "TEMP", "DRY_END", "FIRST_CRACK", "SECOND_CRACK",
+    "COOL", "DROP", "END", "PAUSE", "RESUME"
+})
+
+
 class LogEventRequest(BaseModel):
     kind: str
     fan_level: Optional[int] = None
     heat_level: Optional[int] = None
     temp_f: Optional[float] = None
+    probe_temp_f: Optional[float] = None  # reference probe reading logged next to a built-in temp_f
     note: Optional[str] = None
 
 
@@ -28,7 +28,7 @@ def setup_admin_user():
         return False
     
     # Add admin to development flag
-    feature_manager.flags["ai_copilot_development"].admin_users.append(admin_user_id)
+    feature_manager.flags["ai_copilot_development"].admin_users.add(admin_user_id)
     print(f"✅ Added {admin_user_id} as admin user")
     return True
 
@@ -45,7 +45,7 @@ def setup_beta_users():
     
     if beta_users:
         # Add beta users to the beta flag
-        feature_manager.flags["ai_copilot_beta"].beta_users.extend(beta_users)
+        feature_manager.flags["ai_copilot_beta"].beta_users.update(beta_users)
         print(f"✅ Added {len(beta_users)} beta users: {', '.join(beta_users)}")
     else:
         print("ℹ️  No beta users added")
@@ -85,9 +85,9 @@ def show_current_status():
         print(f"   Description: {flag.description}")
         
         if flag.admin_users:
-            print(f"   Admin Users: {', '.join(flag.admin_users)}")
+            print(f"   Admin Users: {', '.join(sorted(flag.admin_users))}")
         if flag.beta_users:
-            print(f"   Beta Users: {', '.join(flag.beta_users)}")
+            print(f"   Beta Users: {', '.join(sorted(flag.beta_users))}")
 
 def main():
     """Main setup function"""
@@ -111,6 +111,9 @@ def main():
         # Configure flags
         configure_feature_flags()
         
+        # Publish so every backend worker picks up the changes
+        feature_manager.save()
+        
         # Show final status
         print("\n" + "=" * 40)
         print("✅ Setup Complete!")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for the feature flag manager
+
+Covers per-user evaluation (development, beta and premium flags), the
+evaluation cache (callers get copies, mutations invalidate it) and the
+snapshot poll, which must not block reads while it talks to Supabase.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from feature_flags import FeatureFlagManager, check_ai_copilot_access
+
+
+def _manager() -> FeatureFlagManager:
+    """A manager with only the default flags, publishing to a temporary file"""
+    manager = FeatureFlagManager()
+    manager.flags = {}
+    manager.version = 0
+    manager._initialize_default_flags()
+    manager._evaluation_cache.clear()
+    manager.storage_file = os.path.join(tempfile.mkdtemp(), "feature_flags.json")
+    manager._last_sync = time.time()
+    return manager
+
+
+def test_flag_types():
+    manager = _manager()
+    manager.flags["ai_copilot_beta"].enabled = True
+    assert manager.is_feature_enabled("ai_copilot_development", "admin")
+    assert manager.is_feature_enabled("ai_copilot_development", "someone", {"role": "admin"})
+    assert not manager.is_feature_enabled("ai_copilot_beta", "someone")
+    assert manager.is_feature_enabled("ai_copilot_beta", "someone", {"beta_access": True})
+    assert manager.is_feature_enabled("ai_copilot_premium", "someone", {"subscription_status": "pro"})
+    assert not manager.is_feature_enabled("ai_copilot_premium", "someone", {"subscription_status": "free"})
+    assert not manager.is_feature_enabled("no_such_flag", "admin")
+
+
+def test_access_is_a_copy_of_the_cached_evaluation():
+    """Changing a returned dict must not leak into other callers' results"""
+    manager = _manager()
+    access = manager.get_user_feature_access("someone")
+    access["ai_copilot_premium"] = True
+    assert not manager.get_user_feature_access("someone")["ai_copilot_premium"]
+
+
+def test_cache_is_keyed_on_metadata():
+    manager = _manager()
+    assert not manager.get_user_feature_access("someone")["ai_copilot_premium"]
+    assert manager.get_user_feature_access("someone", {"subscription_status": "premium"})["ai_copilot_premium"]
+
+
+def test_mutation_publishes_and_invalidates():
+    manager = _manager()
+    assert manager.enable_feature("ai_copilot_beta")
+    assert not manager.is_feature_enabled("ai_copilot_beta", "tester")
+    assert manager.add_beta_user("ai_copilot_beta", "tester")
+    assert manager.version == 2
+    assert manager.is_feature_enabled("ai_copilot_beta", "tester")
+    assert os.path.exists(manager.storage_file)
+
+    assert manager.remove_beta_user("ai_copilot_beta", "tester")
+    assert not manager.is_feature_enabled("ai_copilot_beta", "tester")
+    assert not manager.add_beta_user("no_such_flag", "tester")
+
+
+def test_copilot_access_summary():
+    access = check_ai_copilot_access("someone", {"subscription_status": "enterprise"})
+    assert access["has_access"] and access["access_type"] == "premium"
+    assert check_ai_copilot_access("someone")["subscription_status"] == "unknown"
+
+
+def test_poll_does_not_block_reads():
+    """A slow Supabase check runs in the background; reads keep the current flags"""
+    manager = _manager()
+    published = manager._snapshot()
+    published["version"] = 5
+    for flag in published["flags"]:
+        if flag["name"] == "ai_copilot_beta":
+            flag.update(enabled=True, beta_users=["tester"])
+
+    release = threading.Event()
+    def slow_version():
+        release.wait(5)
+        return 5
+    manager._fetch_remote_version = slow_version
+    manager._fetch_remote_snapshot = lambda: published
+    manager._last_sync = 0.0
+
+    started = time.time()
+    assert not manager.is_feature_enabled("ai_copilot_beta", "tester")
+    assert not manager.is_feature_enabled("ai_copilot_beta", "tester")    # no second poll
+    assert time.time() - started < 1.0
+
+    release.set()
+    for _ in range(100):
+        if manager.version == 5:
+            break
+        time.sleep(0.01)
+    assert manager.version == 5
+    assert manager.is_feature_enabled("ai_copilot_beta", "tester")
+
+
+def main():
+    """Run all feature flag tests"""
+    print("🚀 Starting Feature Flag Tests\n")
+
+    tests = [
+        test_flag_types,
+        test_access_is_a_copy_of_the_cached_evaluation,
+        test_cache_is_keyed_on_metadata,
+        test_mutation_publishes_and_invalidates,
+        test_copilot_access_summary,
+        test_poll_does_not_block_reads
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
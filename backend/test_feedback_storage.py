@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Tests for the feedback storage fan-out
+
+Checks the concurrent writes to Supabase and the JSON backup, the bounded
+wait on the primary, the durable retry queue, the summary counters and the
+chunked, resumable migration engine. The summary counters must count each
+entry exactly once. Runs against an in-memory stand-in for the Supabase
+feedback table.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import feedback_storage as storage_module
+from feedback_storage import FeedbackStorage
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _FeedbackQuery:
+    def __init__(self, client, rows=None, result=False):
+        self.client = client
+        self.rows = rows
+        self.result = result
+        self.row_limit = None
+
+    def upsert(self, rows, on_conflict=None):
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def select(self, columns):
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def execute(self):
+        if self.result:
+            return _Result(self.rows)
+        return self.client.execute(self)
+
+
+class _Supabase:
+    """Stand-in for the Supabase client holding the feedback table"""
+
+    def __init__(self, delay=0.0, fail_upsert=None):
+        self.rows = {}
+        self.delay = delay
+        self.failing = False
+        self.fail_upsert = fail_upsert       # fail only this (1-based) upsert
+        self.upserts = 0
+        self.rpc_calls = []
+        self.lock = threading.Lock()
+
+    def rpc(self, name, params):
+        """feedback_summary_counts(exclude_ids) from create_feedback_summary_function.sql"""
+        assert name == "feedback_summary_counts"
+        self.rpc_calls.append(params["exclude_ids"])
+        rows = [r for r in self.rows.values() if r["id"] not in params["exclude_ids"]]
+        counts = Counter()
+        for row in rows:
+            counts[("feature_type", row["feature"], row["feedback_type"])] += 1
+            for dimension in ("sentiment", "priority", "status"):
+                counts[(dimension, None, row[dimension])] += 1
+        data = [{"dimension": d, "feature": f, "value": v, "total": n} for (d, f, v), n in counts.items()]
+        return _FeedbackQuery(self, rows=data, result=True)
+
+    def table(self, name):
+        assert name == "feedback"
+        return _FeedbackQuery(self)
+
+    def execute(self, query):
+        time.sleep(self.delay)
+        if self.failing:
+            raise Exception("connection refused")
+        with self.lock:
+            if query.rows is None:
+                return _Result(list(self.rows.values())[:query.row_limit])
+            self.upserts += 1
+            if self.upserts == self.fail_upsert:
+                raise Exception("statement timeout")
+            for row in query.rows:
+                self.rows[row["id"]] = row
+            return _Result(list(query.rows))
+
+
+def _storage(supabase=None) -> FeedbackStorage:
+    """A storage instance writing its files to a temporary directory"""
+    directory = tempfile.mkdtemp()
+    storage = FeedbackStorage()
+    storage.storage_file = os.path.join(directory, "feedback_data.json")
+    storage.retry_queue_file = os.path.join(directory, "feedback_retry_queue.jsonl")
+    storage.migration_checkpoint_file = os.path.join(directory, "feedback_migration_checkpoint.json")
+    storage.feedback_data = []
+    storage.weaviate_client = None
+    storage.supabase_client = supabase
+    return storage
+
+
+def _drain(storage: FeedbackStorage):
+    """Wait for every background write (the supervisor waits on the I/O pool)"""
+    storage._supervisor.shutdown(wait=True)
+    storage._io_executor.shutdown(wait=True)
+
+
+def test_writes_primary_and_backup():
+    supabase = _Supabase()
+    storage = _storage(supabase)
+    feedback_id = storage.store_feedback("user-1", "a@example.com", "Great app")
+    assert feedback_id in supabase.rows
+    _drain(storage)
+    assert os.path.exists(storage.storage_file)
+    assert storage.get_retry_queue_size() == 0
+    stats = storage.get_write_latency_stats()
+    assert stats["supabase"]["count"] == 1 and stats["json"]["count"] == 1
+
+
+def test_ids_never_repeat():
+    storage = _storage(_Supabase())
+    ids = {storage.store_feedback("user-1", "a@example.com", f"note {i}") for i in range(50)}
+    _drain(storage)
+    assert len(ids) == 50
+
+
+def test_failed_primary_is_queued_and_replayed():
+    supabase = _Supabase()
+    supabase.failing = True
+    storage = _storage(supabase)
+    feedback_id = storage.store_feedback("user-1", "a@example.com", "Offline")
+    _drain(storage)
+    assert storage.get_retry_queue_size() == 1
+    assert storage.get_write_latency_stats()["supabase"]["failures"] == 1
+
+    supabase.failing = False
+    assert storage.retry_failed_writes() == {"retried": 1, "succeeded": 1, "remaining": 0, "dropped": 0}
+    assert feedback_id in supabase.rows
+    assert storage.get_retry_queue_size() == 0
+
+
+def test_slow_primary_times_out_without_blocking():
+    timeouts = dict(storage_module.BACKEND_TIMEOUTS)
+    storage_module.BACKEND_TIMEOUTS["supabase"] = 0.05
+    try:
+        storage = _storage(_Supabase(delay=0.5))
+        started = time.perf_counter()
+        storage.store_feedback("user-1", "a@example.com", "Slow")
+        assert time.perf_counter() - started < 0.4
+        _drain(storage)
+    finally:
+        storage_module.BACKEND_TIMEOUTS.update(timeouts)
+
+    stats = storage.get_write_latency_stats()["supabase"]
+    assert stats["timeouts"] == 1
+    assert stats["count"] == 1 and stats["failures"] == 0      # the late write still landed
+    assert storage.get_retry_queue_size() == 1                   # and is replayed idempotently
+
+
+def test_saturated_supervisor_queues_secondary_writes():
+    storage = _storage(_Supabase())
+    for _ in range(storage_module.MAX_SUPERVISED_WRITES):
+        storage._supervisor_slots.acquire()
+    storage.store_feedback("user-1", "a@example.com", "Busy")
+    _drain(storage)
+    records = storage._read_retry_queue()
+    assert [record["backend"] for record in records] == ["json"]
+
+
+def test_summary_from_json_backup():
+    storage = _storage()
+    storage.store_feedback("user-1", "a@example.com", "Coach is great")
+    storage.store_feedback("user-2", "b@example.com", "Crash on save", feature="general_app",
+                           status="new", feedback_type="bug_report")
+    _drain(storage)
+
+    summary = storage.get_feedback_summary()
+    assert summary["counts_source"] == "json"
+    assert summary["total_feedback"] == 2
+    assert summary["by_type"] == {"AI Copilot": 1, "Bug Report": 1}
+    assert summary["by_status"] == {"development": 1, "new": 1}
+    assert [item["feedback_text"] for item in summary["recent_feedback"]] == ["Crash on save", "Coach is great"]
+
+
+def test_summary_seeds_once_from_supabase():
+    supabase = _Supabase()
+    storage = _storage(supabase)
+    supabase.rows["old"] = storage._to_supabase_row(
+        {"id": "old", "feature": "general_app", "feedback_type": "feature_request"}
+    )
+    assert storage.get_feedback_summary()["total_feedback"] == 1
+    storage.store_feedback("user-1", "a@example.com", "More presets")
+    summary = storage.get_feedback_summary()
+    _drain(storage)
+
+    assert summary["counts_source"] == "supabase"
+    assert summary["total_feedback"] == 2
+    assert summary["by_type"] == {"Feature Request": 1, "AI Copilot": 1}
+    assert len(supabase.rpc_calls) == 1                      # counters kept up to date in-process
+
+
+def test_unpersisted_entries_stay_out_of_supabase_counts():
+    supabase = _Supabase()
+    storage = _storage(supabase)
+    storage.get_feedback_summary()
+    supabase.failing = True
+    storage.store_feedback("user-1", "a@example.com", "Lost in transit")
+    _drain(storage)
+    assert storage.get_feedback_summary()["total_feedback"] == 0
+
+
+def test_in_flight_entry_counted_once_across_a_seed():
+    """An entry stored while the seed runs is excluded from the query and counted on completion"""
+    supabase = _Supabase()
+    storage = _storage(supabase)
+    entry = {"id": "fb-1", "feature": "ai_copilot", "feedback_type": "general",
+             "sentiment": "neutral", "priority": "medium", "status": "new"}
+    storage._begin_summary_entry(entry)
+    supabase.rows["fb-1"] = storage._to_supabase_row(entry)     # landed, not yet counted
+    storage.refresh_summary_counters()
+    assert supabase.rpc_calls == [["fb-1"]]
+
+    storage._update_summary_counters(entry, persisted=True)
+    assert storage.get_feedback_summary()["total_feedback"] == 1
+
+
+def _local_entries(storage: FeedbackStorage, n: int):
+    storage.feedback_data = [
+        {"id": f"fb-{i}", "user_id": "user-1", "feedback_text": f"note {i}", "feature": "ai_copilot"}
+        for i in range(n)
+    ]
+
+
+def test_migration_upserts_in_chunks():
+    supabase = _Supabase()
+    storage = _storage(supabase)
+    _local_entries(storage, 5)
+    storage.feedback_data.append(dict(storage.feedback_data[0], feedback_text="edited"))
+
+    result = storage.migrate_to_supabase(chunk_size=2)
+    assert result["success"] and result["migrated"] == 5 and result["total"] == 5
+    assert supabase.upserts == 3
+    assert supabase.rows["fb-0"]["feedback_text"] == "edited"           # latest entry wins
+    assert not os.path.exists(storage.migration_checkpoint_file)
+
+
+def test_failed_migration_resumes_from_checkpoint():
+    supabase = _Supabase(fail_upsert=2)
+    storage = _storage(supabase)
+    _local_entries(storage, 5)
+
+    failed = storage.migrate_to_supabase(chunk_size=2)
+    assert not failed["success"] and failed["migrated"] == 2
+    assert "resume from 2/5" in failed["message"]
+
+    resumed = storage.migrate_to_supabase(chunk_size=2)
+    assert resumed["success"] and resumed["resumed_from"] == 2 and resumed["migrated"] == 3
+    assert sorted(supabase.rows) == [f"fb-{i}" for i in range(5)]
+
+
+def test_changed_data_restarts_the_migration():
+    supabase = _Supabase(fail_upsert=2)
+    storage = _storage(supabase)
+    _local_entries(storage, 5)
+    storage.migrate_to_supabase(chunk_size=2)
+
+    _local_entries(storage, 6)
+    assert storage.migrate_to_supabase(chunk_size=2)["resumed_from"] == 0
+
+
+def test_migration_jobs():
+    storage = _storage(_Supabase())
+    _local_entries(storage, 3)
+    job = storage.create_migration_job("supabase", chunk_size=2)
+    assert job is not None
+    assert storage.create_migration_job("supabase") is None              # one per target at a time
+
+    storage.run_migration_job(job["job_id"])
+    status = storage.get_migration_job(job["job_id"])
+    assert status is not None
+    assert status["status"] == "completed" and status["processed"] == 3 and status["migrated"] == 3
+    status["status"] = "tampered"
+    assert storage.migration_jobs[job["job_id"]]["status"] == "completed"
+    assert storage.create_migration_job("supabase") is not None
+
+
+def test_migration_without_target():
+    storage = _storage()
+    assert storage.migrate_to_supabase()["message"] == "Supabase not available"
+    assert storage.migrate_to_weaviate()["message"] == "Weaviate not available"
+
+
+def main():
+    """Run all feedback storage tests"""
+    print("🚀 Starting Feedback Storage Tests\n")
+
+    tests = [
+        test_writes_primary_and_backup,
+        test_ids_never_repeat,
+        test_failed_primary_is_queued_and_replayed,
+        test_slow_primary_times_out_without_blocking,
+        test_saturated_supervisor_queues_secondary_writes,
+        test_summary_from_json_backup,
+        test_summary_seeds_once_from_supabase,
+        test_unpersisted_entries_stay_out_of_supabase_counts,
+        test_in_flight_entry_counted_once_across_a_seed,
+        test_migration_upserts_in_chunks,
+        test_failed_migration_resumes_from_checkpoint,
+        test_changed_data_restarts_the_migration,
+        test_migration_jobs,
+        test_migration_without_target
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
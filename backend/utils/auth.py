@@ -2,6 +2,7 @@
 Authentication utilities
 """
 import os
+from typing import Dict, Any
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
@@ -52,3 +53,19 @@ def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Depends(securit
     except Exception as e:
         print(f"DEBUG: Unexpected error in token verification: {e}")
         raise HTTPException(status_code=500, detail=f"Token verification failed: {str(e)}")
+
+
+def get_current_user(user_id: str = Depends(verify_jwt_token)) -> Dict[str, Any]:
+    """Authenticated user as a dict: user_metadata fields plus id, email and is_admin"""
+    from utils.user_cache import user_cache
+    
+    cached = user_cache.get_user(user_id)
+    if not cached:
+        raise HTTPException(status_code=401, detail="User not found")
+    
+    return {
+        **cached.user_metadata,
+        "id": cached.id,
+        "email": cached.email,
+        "is_admin": cached.is_admin
+    }
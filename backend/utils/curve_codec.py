@@ -0,0 +1,325 @@
+"""
+Compact columnar roast curve format
+
+Roast events are stored column by column so each column compresses well:
+  - t_offset_sec: zigzag varint deltas from the previous event
+  - temp_f:       quantized to 0.1°F, zigzag varint deltas between readings
+  - probe_temp_f: same encoding as temp_f (reference probe readings, since v2)
+  - heat/fan:     one packed byte per event (heat in the high nibble, fan low)
+  - kind:         one byte per event indexing a per-roast kind table
+  - note:         sparse (event index, UTF-8 text) pairs
+Nullable columns carry a presence bitmap. The whole payload is zlib-compressed
+behind a 4-byte header, and any number of roasts fit in one bundle.
+
+to_artisan() writes the same events as an Artisan .alog profile.
+"""
+import io
+import zlib
+import bisect
+import struct
+import zipfile
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+CURVE_MAGIC = b"RBC"
+CURVE_VERSION = 2
+SUPPORTED_CURVE_VERSIONS = (1, 2)   # v1 files have no probe_temp_f column
+CURVE_MEDIA_TYPE = "application/vnd.roastbuddy.curve"
+CURVE_FILE_EXTENSION = ".rbc"
+
+# Decompressed payload limit - real bundles are a few MB at most, so anything
+# bigger is a corrupt file or a zlib bomb
+MAX_DECODED_BYTES = 32 * 1024 * 1024
+
+TEMP_SCALE = 10          # temp_f stored in tenths of a degree
+NIBBLE_NULL = 0x0F       # heat/fan nibble meaning "not set"
+FLAG_WIDE_LEVELS = 0x01  # heat/fan outside 0-14: two full bytes per event instead of one
+
+# Artisan event types (specialeventstype) and their labels
+ARTISAN_FAN_TYPE = 0     # "Air"
+ARTISAN_HEAT_TYPE = 3    # "Burner"
+ARTISAN_TIMEINDEX_SLOTS = {"CHARGE": 0, "DRY_END": 1, "FIRST_CRACK": 2, "SECOND_CRACK": 4, "COOL": 6, "END": 7}
+
+RoastEvents = List[Dict[str, Any]]
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def varint(self) -> int:
+        result = shift = 0
+        while True:
+            if self.pos >= len(self.data):
+                raise ValueError("Truncated curve data")
+            byte = self.data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def take(self, size: int) -> bytes:
+        if self.pos + size > len(self.data):
+            raise ValueError("Truncated curve data")
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return chunk
+
+
+def _pack_bitmap(flags: List[bool]) -> bytes:
+    bitmap = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            bitmap[i >> 3] |= 1 << (i & 7)
+    return bytes(bitmap)
+
+
+def _unpack_bitmap(bitmap: bytes, count: int) -> List[bool]:
+    return [bool(bitmap[i >> 3] & (1 << (i & 7))) for i in range(count)]
+
+
+def _encode_temps(out: bytearray, temps: List[Optional[float]]):
+    out += _pack_bitmap([temp is not None for temp in temps])
+    previous = 0
+    for temp in temps:
+        if temp is None:
+            continue
+        quantized = int(round(float(temp) * TEMP_SCALE))
+        _write_varint(out, _zigzag(quantized - previous))
+        previous = quantized
+
+
+def _decode_temps(reader: _Reader, count: int) -> List[Optional[float]]:
+    has_temp = _unpack_bitmap(reader.take((count + 7) // 8), count)
+    temps: List[Optional[float]] = []
+    quantized = 0
+    for present in has_temp:
+        if present:
+            quantized += _unzigzag(reader.varint())
+            temps.append(quantized / TEMP_SCALE)
+        else:
+            temps.append(None)
+    return temps
+
+
+def _encode_roast(out: bytearray, roast_id: int, events: RoastEvents):
+    events = sorted(events, key=lambda e: e.get("t_offset_sec") or 0)
+    count = len(events)
+    _write_varint(out, roast_id)
+    _write_varint(out, count)
+
+    # Time column
+    previous = 0
+    for event in events:
+        t_offset = int(event.get("t_offset_sec") or 0)
+        _write_varint(out, _zigzag(t_offset - previous))
+        previous = t_offset
+
+    # Kind column
+    kinds: List[str] = []
+    kind_index: Dict[str, int] = {}
+    codes = bytearray()
+    for event in events:
+        kind = event.get("kind") or ""
+        if kind not in kind_index:
+            if len(kinds) == 256:
+                raise ValueError("Too many distinct event kinds in one roast")
+            kind_index[kind] = len(kinds)
+            kinds.append(kind)
+        codes.append(kind_index[kind])
+    _write_varint(out, len(kinds))
+    for kind in kinds:
+        encoded = kind.encode("utf-8")
+        _write_varint(out, len(encoded))
+        out += encoded
+    out += codes
+
+    # Temperature columns
+    _encode_temps(out, [event.get("temp_f") for event in events])
+    _encode_temps(out, [event.get("probe_temp_f") for event in events])
+
+    # Heat/fan column
+    levels = [(event.get("heat_level"), event.get("fan_level")) for event in events]
+    wide = any(level is not None and not 0 <= level < NIBBLE_NULL for pair in levels for level in pair)
+    out.append(FLAG_WIDE_LEVELS if wide else 0)
+    if wide:
+        out += _pack_bitmap([heat is not None for heat, _ in levels])
+        out += _pack_bitmap([fan is not None for _, fan in levels])
+        for heat, fan in levels:
+            out += struct.pack("<hh", heat or 0, fan or 0)
+    else:
+        out += bytes(
+            ((NIBBLE_NULL if heat is None else heat) << 4) | (NIBBLE_NULL if fan is None else fan)
+            for heat, fan in levels
+        )
+
+    # Notes (sparse)
+    notes = [(i, event["note"]) for i, event in enumerate(events) if event.get("note")]
+    _write_varint(out, len(notes))
+    previous = 0
+    for index, note in notes:
+        encoded = note.encode("utf-8")
+        _write_varint(out, index - previous)
+        _write_varint(out, len(encoded))
+        out += encoded
+        previous = index
+
+
+def _decode_roast(reader: _Reader, version: int = CURVE_VERSION) -> Tuple[int, RoastEvents]:
+    roast_id = reader.varint()
+    count = reader.varint()
+
+    offsets, t_offset = [], 0
+    for _ in range(count):
+        t_offset += _unzigzag(reader.varint())
+        offsets.append(t_offset)
+
+    kinds = [reader.take(reader.varint()).decode("utf-8") for _ in range(reader.varint())]
+    codes = reader.take(count)
+
+    temps = _decode_temps(reader, count)
+    probe_temps = _decode_temps(reader, count) if version >= 2 else [None] * count
+
+    flags = reader.take(1)[0]
+    if flags & FLAG_WIDE_LEVELS:
+        has_heat = _unpack_bitmap(reader.take((count + 7) // 8), count)
+        has_fan = _unpack_bitmap(reader.take((count + 7) // 8), count)
+        levels = []
+        for i in range(count):
+            heat, fan = struct.unpack("<hh", reader.take(4))
+            levels.append((heat if has_heat[i] else None, fan if has_fan[i] else None))
+    else:
+        levels = [
+            (None if byte >> 4 == NIBBLE_NULL else byte >> 4, None if byte & 0x0F == NIBBLE_NULL else byte & 0x0F)
+            for byte in reader.take(count)
+        ]
+
+    notes: Dict[int, str] = {}
+    index = 0
+    for _ in range(reader.varint()):
+        index += reader.varint()
+        notes[index] = reader.take(reader.varint()).decode("utf-8")
+
+    events = []
+    for i in range(count):
+        event = {"kind": kinds[codes[i]], "t_offset_sec": offsets[i]}
+        heat, fan = levels[i]
+        for key, value in (("temp_f", temps[i]), ("probe_temp_f", probe_temps[i]), ("heat_level", heat),
+                           ("fan_level", fan), ("note", notes.get(i))):
+            if value is not None:
+                event[key] = value
+        events.append(event)
+    return roast_id, events
+
+
+def encode_curves(curves: Dict[int, RoastEvents]) -> bytes:
+    """Encode {roast_id: events} (one roast or a whole bundle) into the compact format"""
+    payload = bytearray()
+    _write_varint(payload, len(curves))
+    for roast_id, events in curves.items():
+        _encode_roast(payload, int(roast_id), events)
+    return CURVE_MAGIC + bytes([CURVE_VERSION]) + zlib.compress(bytes(payload), 9)
+
+
+def decode_curves(data: bytes) -> Dict[int, RoastEvents]:
+    """Inverse of encode_curves(); ValueError if the data isn't a valid curve file"""
+    if data[:3] != CURVE_MAGIC:
+        raise ValueError("Not a roast curve file")
+    if len(data) < 4 or data[3] not in SUPPORTED_CURVE_VERSIONS:
+        raise ValueError(f"Unsupported roast curve version: {data[3:4].hex()}")
+    version = data[3]
+    decompressor = zlib.decompressobj()
+    try:
+        payload = decompressor.decompress(data[4:], MAX_DECODED_BYTES)
+    except zlib.error as e:
+        raise ValueError(f"Corrupt roast curve data: {e}")
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Roast curve data expands past {MAX_DECODED_BYTES} bytes")
+    if not decompressor.eof:
+        raise ValueError("Truncated roast curve data")
+    reader = _Reader(payload)
+    try:
+        return dict(_decode_roast(reader, version) for _ in range(reader.varint()))
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Corrupt roast curve data: {e}")
+
+
+def to_artisan(events: RoastEvents, title: str = "", roast_date: str = "") -> str:
+    """
+    Artisan .alog profile (a Python-literal dict) for one roast.
+
+    temp_f readings become the bean temperature curve; heat/fan changes become
+    Burner/Air special events and milestones fill Artisan's timeindex.
+    """
+    events = sorted(events, key=lambda e: e.get("t_offset_sec") or 0)
+    readings = [e for e in events if e.get("temp_f") is not None]
+    timex = [float(e["t_offset_sec"]) for e in readings]
+
+    def nearest_reading(t_offset: int) -> int:
+        i = bisect.bisect_left(timex, t_offset)
+        if i == len(timex) or (i > 0 and t_offset - timex[i - 1] <= timex[i] - t_offset):
+            return max(i - 1, 0)
+        return i
+
+    timeindex = [-1, 0, 0, 0, 0, 0, 0, 0]
+    special_events, special_types, special_values, special_strings = [], [], [], []
+    last_levels = {ARTISAN_HEAT_TYPE: None, ARTISAN_FAN_TYPE: None}
+    for event in events:
+        t_offset = event.get("t_offset_sec") or 0
+        slot = ARTISAN_TIMEINDEX_SLOTS.get(event.get("kind") or "")
+        if slot is not None:
+            timeindex[slot] = nearest_reading(t_offset)
+        for event_type, key in ((ARTISAN_HEAT_TYPE, "heat_level"), (ARTISAN_FAN_TYPE, "fan_level")):
+            level = event.get(key)
+            if level is None or level == last_levels[event_type]:
+                continue
+            last_levels[event_type] = level
+            special_events.append(nearest_reading(t_offset))
+            special_types.append(event_type)
+            # Artisan stores slider values as value / 10 + 1
+            special_values.append(level / 10.0 + 1.0)
+            special_strings.append(event.get("note") or "")
+    if timeindex[0] == -1 and timex:
+        timeindex[0] = 0
+
+    profile = {
+        "version": "2.8.0",
+        "mode": "F",
+        "title": title,
+        "roastdate": roast_date,
+        "timex": timex,
+        "temp1": [-1.0] * len(timex),
+        "temp2": [e["temp_f"] for e in readings],
+        "timeindex": timeindex,
+        "specialevents": special_events,
+        "specialeventstype": special_types,
+        "specialeventsvalue": special_values,
+        "specialeventsStrings": special_strings,
+        "etypes": ["Air", "Drum", "Damper", "Burner", "--"],
+    }
+    return repr(profile)
+
+
+def to_artisan_bundle(curves: Iterable[Tuple[str, str, RoastEvents]]) -> bytes:
+    """Zip of .alog files from (file stem, title, events) triples"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for stem, title, events in curves:
+            archive.writestr(f"{stem}.alog", to_artisan(events, title))
+    return buffer.getvalue()
@@ -0,0 +1,143 @@
+"""
+Keyset pagination and column projection for list endpoints
+
+Pages are ordered newest first on (created_at, id); the cursor is the
+(created_at, id) of the last row on the previous page, so fetching page N
+costs the same as page 1 regardless of how many rows the user has.
+
+fetch_range_pages() walks offset ranges instead, for reading every row of a
+query (e.g. a roast's events) past PostgREST's per-request row cap.
+"""
+import re
+import json
+import base64
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 500
+SUPABASE_MAX_ROWS = 1000   # rows Supabase returns per request, whatever the query asks for
+
+# PostgREST error codes for a select/order column the table doesn't have
+INVALID_COLUMN_ERROR_CODES = {"42703", "PGRST100"}
+
+_COLUMN_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past this row"""
+    payload = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Any]:
+    """(created_at, id) from a cursor; ValueError if it was tampered with"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(row_id, (int, str)):
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+
+def select_columns(fields: Optional[str], presets: Mapping[str, Sequence[str]]) -> str:
+    """
+    PostgREST column list for a `fields` query parameter.
+
+    None means every column; a preset name ("summary") or a comma-separated
+    column list selects only those. created_at and id are always included
+    because the cursor needs them. ValueError on an invalid column name.
+    """
+    if not fields or fields == "*":
+        return "*"
+    columns = list(presets[fields]) if fields in presets else [c.strip() for c in fields.split(",") if c.strip()]
+    for column in columns:
+        if not _COLUMN_NAME.match(column):
+            raise ValueError(f"Invalid field: {column}")
+    for required in ("id", "created_at"):
+        if required not in columns:
+            columns.append(required)
+    return ",".join(dict.fromkeys(columns))
+
+
+def _quote(value: Any) -> str:
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def apply_keyset(query, cursor: Optional[str], limit: int):
+    """
+    Order a PostgREST query newest first and start it after `cursor`.
+
+    Fetches one extra row so page_results() can tell whether there is a next page.
+    """
+    # postgrest-py 0.13 has no multi-column order() or or_(), so these params are added directly
+    query.params = query.params.add("order", "created_at.desc,id.desc")
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # (created_at, id) < (cursor created_at, cursor id)
+        query.params = query.params.add(
+            "or",
+            f"(created_at.lt.{_quote(created_at)},"
+            f"and(created_at.eq.{_quote(created_at)},id.lt.{_quote(row_id)}))"
+        )
+    return query.limit(limit + 1)
+
+
+def page_results(rows: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim the look-ahead row and return (page rows, next cursor or None)"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def clamp_page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def is_invalid_column_error(error: Exception) -> bool:
+    """True if PostgREST rejected the query for naming an unknown column (a client error)"""
+    return str(getattr(error, "code", "")) in INVALID_COLUMN_ERROR_CODES
+
+
+def fetch_all_pages(build_query, page_size: int = MAX_PAGE_SIZE) -> List[Dict[str, Any]]:
+    """
+    Every row of a keyset-ordered query, newest first.
+
+    build_query() must return a fresh filtered query each call; pages are
+    walked with the same cursor as the paginated endpoints.
+    """
+    rows: List[Dict[str, Any]] = []
+    cursor = None
+    while True:
+        page, cursor = page_results(apply_keyset(build_query(), cursor, page_size).execute().data, page_size)
+        rows.extend(page)
+        if not cursor:
+            return rows
+
+
+def fetch_range_pages(build_query, order: str, page_size: int = SUPABASE_MAX_ROWS) -> List[Dict[str, Any]]:
+    """
+    Every row of build_query() in `order` (comma-separated columns, which must
+    form a total order so the pages are disjoint), one range request per page.
+    """
+    rows: List[Dict[str, Any]] = []
+    start = 0
+    while True:
+        query = build_query()
+        # postgrest-py 0.13 has no multi-column order(); set the parameter directly
+        query.params = query.params.add("order", order)
+        page = query.range(start, start + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+def fetch_roast_events(sb, roast_id: int, columns: str, after_t: Optional[float] = None) -> List[Dict[str, Any]]:
+    """A roast's stored events in time order (only those after after_t if given), paged"""
+    def build_query():
+        query = sb.table("roast_events").select(columns).eq("roast_id", roast_id)
+        return query.gt("t_offset_sec", after_t) if after_t is not None else query
+    return fetch_range_pages(build_query, "t_offset_sec,id")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for the compact roast curve format
+
+Every event field must survive encode_curves() -> decode_curves(), and bad
+input (wrong magic, truncated or oversized payloads) must raise ValueError.
+"""
+
+import os
+import sys
+import zlib
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from curve_codec import CURVE_MAGIC, CURVE_VERSION, MAX_DECODED_BYTES, decode_curves, encode_curves
+
+ROAST_EVENTS = [
+    {"kind": "SET", "t_offset_sec": 0, "heat_level": 9, "fan_level": 9},
+    {"kind": "READING", "t_offset_sec": 30, "temp_f": 212.4},
+    {"kind": "READING", "t_offset_sec": 60, "temp_f": 268.0, "note": "Colour turning 🌾"},
+    {"kind": "SET", "t_offset_sec": 90, "heat_level": 7, "fan_level": 8, "note": "Less heat"},
+    {"kind": "FIRST_CRACK", "t_offset_sec": 455, "temp_f": 391.7},
+    {"kind": "READING", "t_offset_sec": 480, "temp_f": 385.1},
+    {"kind": "COOL", "t_offset_sec": 600}
+]
+
+
+def test_single_roast_round_trip():
+    """Times, kinds, temperatures, levels and notes come back unchanged"""
+    decoded = decode_curves(encode_curves({42: ROAST_EVENTS}))
+    assert list(decoded) == [42]
+    assert decoded[42] == ROAST_EVENTS
+
+
+def test_bundle_round_trip():
+    """Several roasts (including one with no events) fit in one bundle"""
+    curves = {
+        1: ROAST_EVENTS,
+        2: [dict(event, t_offset_sec=event["t_offset_sec"] * 2) for event in ROAST_EVENTS],
+        3: []
+    }
+    assert decode_curves(encode_curves(curves)) == curves
+
+
+def test_probe_readings_round_trip():
+    """Reference probe readings (the sensor calibration's paired samples) survive a replace import"""
+    events = [
+        {"kind": "READING", "t_offset_sec": 60, "temp_f": 268.0, "probe_temp_f": 231.5},
+        {"kind": "READING", "t_offset_sec": 90, "temp_f": 281.2},
+        {"kind": "READING", "t_offset_sec": 120, "temp_f": 295.4, "probe_temp_f": 259.9}
+    ]
+    assert decode_curves(encode_curves({9: events}))[9] == events
+
+
+def test_events_are_sorted_by_time():
+    decoded = decode_curves(encode_curves({7: list(reversed(ROAST_EVENTS))}))
+    assert decoded[7] == ROAST_EVENTS
+
+
+def test_wide_levels_round_trip():
+    """Levels outside the packed 0-14 nibble range use the wide encoding"""
+    events = [
+        {"kind": "SET", "t_offset_sec": 0, "heat_level": 100, "fan_level": 0},
+        {"kind": "SET", "t_offset_sec": 10, "heat_level": -1},
+        {"kind": "READING", "t_offset_sec": 20, "temp_f": -40.5}
+    ]
+    assert decode_curves(encode_curves({5: events}))[5] == events
+
+
+def test_temperatures_are_quantized_to_tenths():
+    events = [{"kind": "READING", "t_offset_sec": 0, "temp_f": 300.04}]
+    assert decode_curves(encode_curves({1: events}))[1][0]["temp_f"] == 300.0
+
+
+def test_kind_table_limit():
+    """Up to 256 distinct kinds fit the one-byte kind codes; one more is a ValueError, not a crash"""
+    events = [{"kind": f"K{i}", "t_offset_sec": i} for i in range(256)]
+    assert decode_curves(encode_curves({1: events}))[1] == events
+    try:
+        encode_curves({1: events + [{"kind": "K256", "t_offset_sec": 256}]})
+    except ValueError:
+        return
+    assert False, "expected ValueError"
+
+
+def _raises_value_error(data: bytes) -> bool:
+    try:
+        decode_curves(data)
+    except ValueError:
+        return True
+    return False
+
+
+def test_rejects_bad_input():
+    encoded = encode_curves({1: ROAST_EVENTS})
+    assert _raises_value_error(b"")
+    assert _raises_value_error(b"XYZ" + encoded[3:])
+    assert _raises_value_error(encoded[:3] + bytes([CURVE_VERSION + 1]) + encoded[4:])
+    assert _raises_value_error(encoded[:-5])
+    assert _raises_value_error(encoded[:4] + b"not zlib data")
+
+
+def test_rejects_truncated_payload():
+    """A valid zlib stream whose payload stops mid-roast"""
+    header = CURVE_MAGIC + bytes([CURVE_VERSION])
+    assert _raises_value_error(header + zlib.compress(bytes([1, 1, 50])))
+
+
+def test_rejects_oversized_payload():
+    """A tiny file that would inflate past MAX_DECODED_BYTES (zlib bomb)"""
+    bomb = CURVE_MAGIC + bytes([CURVE_VERSION]) + zlib.compress(bytes(MAX_DECODED_BYTES + 1), 9)
+    assert len(bomb) < 100 * 1024
+    assert _raises_value_error(bomb)
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"🎉 {len(tests)} curve codec tests passed")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for keyset pagination and column projection
+
+Cursors must round-trip (and reject tampering), `fields` must resolve to a
+safe PostgREST column list, and walking pages with the cursor must visit
+every row exactly once, including rows that share a created_at.
+"""
+
+import os
+import sys
+from typing import Any, Dict, List
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pagination import (
+    apply_keyset, clamp_page_size, decode_cursor, encode_cursor, fetch_all_pages,
+    page_results, select_columns, MAX_PAGE_SIZE
+)
+
+PRESETS = {"summary": ("id", "name", "created_at"), "card": ("name", "origin")}
+
+
+class _Params:
+    """Immutable multi-value query parameters, like httpx.QueryParams"""
+
+    def __init__(self, items=()):
+        self.items = tuple(items)
+
+    def add(self, key, value):
+        return _Params(self.items + ((key, value),))
+
+    def get(self, key):
+        return next((value for k, value in self.items if k == key), None)
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """A PostgREST query over in-memory rows, honouring the keyset params"""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.params = _Params()
+        self.row_limit = None
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def execute(self):
+        assert self.params.get("order") == "created_at.desc,id.desc"
+        rows = sorted(self.rows, key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        after = self.params.get("or")
+        if after is not None:
+            # (created_at.lt."C",and(created_at.eq."C",id.lt."I"))
+            created_at = after.split('"')[1]
+            row_id = int(after.split('"')[5])
+            rows = [r for r in rows if (r["created_at"], r["id"]) < (created_at, row_id)]
+        return _Result(rows[:self.row_limit])
+
+
+def _rows(n) -> List[Dict[str, Any]]:
+    # Three rows per timestamp, so ties on created_at are broken by id
+    return [{"id": i, "created_at": f"2026-01-{1 + i // 3:02d}T00:00:00+00:00"} for i in range(n)]
+
+
+def test_cursor_round_trip():
+    row = {"id": 42, "created_at": "2026-10-19T07:00:00.123456+00:00", "name": "ignored"}
+    assert decode_cursor(encode_cursor(row)) == (row["created_at"], 42)
+    assert decode_cursor(encode_cursor({"id": "a-uuid", "created_at": "x"})) == ("x", "a-uuid")
+
+
+def _invalid_cursor(cursor):
+    try:
+        decode_cursor(cursor)
+    except ValueError:
+        return True
+    return False
+
+
+def test_rejects_tampered_cursors():
+    assert _invalid_cursor("not a cursor!")
+    assert _invalid_cursor(encode_cursor({"id": 1, "created_at": "x"})[:-3])
+    assert _invalid_cursor(encode_cursor({"id": [1], "created_at": "x"}))
+    assert _invalid_cursor(encode_cursor({"id": 1, "created_at": 5}))
+
+
+def test_select_columns():
+    assert select_columns(None, PRESETS) == "*"
+    assert select_columns("*", PRESETS) == "*"
+    assert select_columns("summary", PRESETS) == "id,name,created_at"
+    assert select_columns("card", PRESETS) == "name,origin,id,created_at"
+    assert select_columns("name, id,name", PRESETS) == "name,id,created_at"
+    try:
+        select_columns("name,origin)", PRESETS)
+    except ValueError:
+        return
+    assert False, "expected ValueError"
+
+
+def test_page_results_and_clamp():
+    rows = _rows(4)
+    page, cursor = page_results(rows, 3)
+    assert page == rows[:3] and cursor == encode_cursor(rows[2])
+    assert page_results(rows, 4) == (rows, None)
+    assert clamp_page_size(0) == 1 and clamp_page_size(10 ** 6) == MAX_PAGE_SIZE
+
+
+def test_keyset_params():
+    query = apply_keyset(_Query([]), encode_cursor({"id": 7, "created_at": 'a"b'}), 20)
+    assert query.row_limit == 21
+    assert query.params.get("or") == '(created_at.lt."a\\"b",and(created_at.eq."a\\"b",id.lt."7"))'
+    assert apply_keyset(_Query([]), None, 20).params.get("or") is None
+
+
+def test_walks_every_row_once():
+    rows = _rows(10)
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = page_results(apply_keyset(_Query(rows), cursor, 4).execute().data, 4)
+        seen.extend(row["id"] for row in page)
+        if not cursor:
+            break
+    assert seen == list(range(9, -1, -1))
+    assert [row["id"] for row in fetch_all_pages(lambda: _Query(rows), page_size=3)] == seen
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"🎉 {len(tests)} pagination tests passed")
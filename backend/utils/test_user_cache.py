@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared user-metadata cache
+
+Hits, TTL expiry and LRU eviction, the admin fast path (and its revocation
+on invalidate/set_metadata), and listeners running off the caller's thread.
+Needs FastAPI (for HTTPException); without it every test is skipped.
+"""
+
+import os
+import sys
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from fastapi import HTTPException
+    from utils.user_cache import CachedUser, UserMetadataCache
+    HAVE_FASTAPI = True
+except ImportError as e:
+    HAVE_FASTAPI = False
+    print(f"⚠️ User cache tests skipped: {e}")
+
+
+def _cache(users, **kwargs):
+    """A cache whose auth lookups read from `users` (id -> user_metadata)"""
+    class _Cache(UserMetadataCache):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.fetches = []
+
+        def _fetch(self, user_id):
+            self.fetches.append(user_id)
+            if user_id not in users:
+                return None
+            return CachedUser(id=user_id, email=f"{user_id}@example.com", user_metadata=dict(users[user_id]))
+
+    return _Cache(**kwargs)
+
+
+def test_hit_after_first_fetch():
+    if not HAVE_FASTAPI:
+        return
+    cache = _cache({"u1": {"subscription_status": "premium"}})
+    assert cache.get_metadata("u1") == {"subscription_status": "premium"}
+    assert cache.get_metadata("u1") == {"subscription_status": "premium"}
+    assert cache.fetches == ["u1"]
+    assert cache.get_stats()["hits"] == 1 and cache.get_stats()["misses"] == 1
+
+
+def test_ttl_expiry_and_missing_users():
+    if not HAVE_FASTAPI:
+        return
+    cache = _cache({"u1": {}}, ttl_seconds=0)
+    cache.get_user("u1")
+    cache.get_user("u1")
+    assert cache.fetches == ["u1", "u1"]
+    assert cache.get_user("nobody") is None
+    assert cache.get_metadata("nobody") == {}
+
+
+def test_lru_eviction():
+    if not HAVE_FASTAPI:
+        return
+    cache = _cache({"u1": {}, "u2": {}, "u3": {}}, max_entries=2)
+    cache.get_user("u1")
+    cache.get_user("u2")
+    cache.get_user("u1")
+    cache.get_user("u3")                    # evicts u2, the least recently used
+    cache.fetches.clear()
+    cache.get_user("u1")
+    cache.get_user("u2")
+    assert cache.fetches == ["u2"]
+
+
+def test_admin_fast_path_survives_eviction():
+    if not HAVE_FASTAPI:
+        return
+    cache = _cache({"admin": {"role": "admin"}, "u1": {}, "u2": {}}, max_entries=1)
+    assert cache.is_admin("admin")
+    cache.get_user("u1")
+    cache.get_user("u2")
+    cache.fetches.clear()
+    assert cache.require_admin("admin").id == "admin"
+    assert cache.fetches == []
+
+
+def test_admin_fast_path_expires_and_is_revocable():
+    if not HAVE_FASTAPI:
+        return
+    users = {"admin": {"role": "admin"}}
+    cache = _cache(users, admin_ttl_seconds=0)
+    assert cache.is_admin("admin")
+    users["admin"] = {}
+    cache.invalidate("admin")
+    assert not cache.is_admin("admin")
+
+    cache = _cache({"admin": {"role": "admin"}})
+    cache.is_admin("admin")
+    cache.set_metadata("admin", {"role": "user"})
+    assert not cache.is_admin("admin")
+    assert cache.get_stats()["cached_admins"] == 0
+
+
+def test_require_admin_errors():
+    if not HAVE_FASTAPI:
+        return
+    cache = _cache({"u1": {}})
+    for user_id, status in (("nobody", 404), ("u1", 403)):
+        try:
+            cache.require_admin(user_id)
+        except HTTPException as e:
+            assert e.status_code == status
+        else:
+            assert False, f"expected {status}"
+
+
+def test_listeners_run_off_the_calling_thread():
+    if not HAVE_FASTAPI:
+        return
+    cache = _cache({"u1": {"subscription_status": "free"}})
+    seen = []
+    done = threading.Event()
+
+    def listener(user, previous):
+        seen.append((user.user_metadata.get("subscription_status"), previous is None,
+                     threading.current_thread() is not caller))
+        if len(seen) == 2:
+            done.set()
+
+    def failing_listener(user, previous):
+        raise RuntimeError("listener bug")
+
+    caller = threading.current_thread()
+    cache.add_listener(failing_listener)
+    cache.add_listener(listener)
+    cache.get_user("u1")
+    cache.set_metadata("u1", {"subscription_status": "premium"})
+    assert done.wait(2)
+    assert seen == [("free", True, True), ("premium", False, True)]
+
+
+def main():
+    """Run all user cache tests"""
+    print("🚀 Starting User Cache Tests\n")
+    if not HAVE_FASTAPI:
+        return
+
+    tests = [
+        test_hit_after_first_fetch,
+        test_ttl_expiry_and_missing_users,
+        test_lru_eviction,
+        test_admin_fast_path_survives_eviction,
+        test_admin_fast_path_expires_and_is_revocable,
+        test_require_admin_errors,
+        test_listeners_run_off_the_calling_thread
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"❌ {test.__name__} failed {e}")
+
+    print(f"\n🎉 Test Results: {passed}/{len(tests)} passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Shared user-metadata cache
+
+Subscription checks, profile reads and admin checks all need the same small
+slice of the Supabase auth user record (email, user_metadata, timestamps).
+This caches it per user with a TTL so those requests don't each pay an
+auth-API round-trip. Writers must call invalidate()/set_metadata() after
+updating a user. Listeners (add_listener) see every freshly stored record,
+e.g. to keep derived state in step with subscription changes; they run on a
+background thread because get_user is called from async endpoints.
+"""
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Callable
+from fastapi import HTTPException
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How long cached user records are trusted (seconds)
+USER_CACHE_TTL_SECONDS = 300
+
+# Confirmed admins are kept apart from the LRU so user churn never evicts them;
+# the TTL is short so a revoked role stops working within a minute
+ADMIN_CACHE_TTL_SECONDS = 60
+
+# Maximum number of cached users
+USER_CACHE_MAX_ENTRIES = 10000
+
+
+@dataclass
+class CachedUser:
+    """Cached slice of a Supabase auth user"""
+    id: str
+    email: Optional[str]
+    user_metadata: Dict[str, Any]
+    created_at: Any = None
+    last_sign_in_at: Any = None
+    fetched_at: float = field(default_factory=time.time)
+
+    @property
+    def is_admin(self) -> bool:
+        return self.user_metadata.get("role") == "admin"
+
+
+class UserMetadataCache:
+    """TTL + LRU cache of auth user records shared by all endpoints"""
+
+    def __init__(self, ttl_seconds: int = USER_CACHE_TTL_SECONDS,
+                 admin_ttl_seconds: int = ADMIN_CACHE_TTL_SECONDS,
+                 max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.admin_ttl_seconds = admin_ttl_seconds
+        self.max_entries = max_entries
+        self._users: "OrderedDict[str, CachedUser]" = OrderedDict()
+        self._admins: Dict[str, CachedUser] = {}
+        self._listeners: List[Callable[[CachedUser, Optional[CachedUser]], None]] = []
+        self._listener_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-cache-listeners")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _fetch(self, user_id: str) -> Optional[CachedUser]:
+        """Load a user from the Supabase Admin API"""
+        from utils.database import get_supabase
+
+        sb = get_supabase()
+        user_response = sb.auth.admin.get_user_by_id(user_id)
+        if not user_response.user:
+            return None
+
+        user = user_response.user
+        return CachedUser(
+            id=user.id,
+            email=user.email,
+            user_metadata=dict(user.user_metadata or {}),
+            created_at=user.created_at,
+            last_sign_in_at=user.last_sign_in_at
+        )
+
+    def _store(self, cached: CachedUser):
+        """Insert a record (callers hold the lock)"""
+        self._users[cached.id] = cached
+        self._users.move_to_end(cached.id)
+        if len(self._users) > self.max_entries:
+            self._users.popitem(last=False)
+        if cached.is_admin:
+            self._admins[cached.id] = cached
+        else:
+            self._admins.pop(cached.id, None)
+
+    def _cached_admin(self, user_id: str) -> Optional[CachedUser]:
+        """Fast path: a recently confirmed admin, without touching the LRU"""
+        with self._lock:
+            cached = self._admins.get(user_id)
+            if cached and time.time() - cached.fetched_at < self.admin_ttl_seconds:
+                self.hits += 1
+                return cached
+        return None
+
+    def get_user(self, user_id: str) -> Optional[CachedUser]:
+        """Get a user record, fetching it on a miss or after the TTL"""
+        now = time.time()
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached and now - cached.fetched_at < self.ttl_seconds:
+                self._users.move_to_end(user_id)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        # Fetch outside the lock so one slow lookup doesn't block other users
+        fetched = self._fetch(user_id)
+        if fetched is None:
+            self.invalidate(user_id)
+            return None
+
+        with self._lock:
+            self._store(fetched)
+        self._notify(fetched, cached)
+        return fetched
+
+    def get_metadata(self, user_id: str) -> Dict[str, Any]:
+        """user_metadata for a user ({} if the user doesn't exist)"""
+        cached = self.get_user(user_id)
+        return cached.user_metadata if cached else {}
+
+    def is_admin(self, user_id: str) -> bool:
+        """Admin check with a fast path for recently confirmed admins"""
+        if self._cached_admin(user_id):
+            return True
+        cached = self.get_user(user_id)
+        return bool(cached and cached.is_admin)
+
+    def require_admin(self, user_id: str) -> CachedUser:
+        """Raise 404/403 unless the user exists and has the admin role"""
+        cached = self._cached_admin(user_id) or self.get_user(user_id)
+        if not cached:
+            raise HTTPException(status_code=404, detail="User not found")
+        if not cached.is_admin:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        return cached
+
+    def set_metadata(self, user_id: str, user_metadata: Dict[str, Any]):
+        """Write-through after a successful metadata update"""
+        with self._lock:
+            cached = self._users.get(user_id)
+            if not cached:
+                self._admins.pop(user_id, None)
+                return
+            updated = CachedUser(
+                id=cached.id,
+                email=cached.email,
+                user_metadata=dict(user_metadata),
+                created_at=cached.created_at,
+                last_sign_in_at=cached.last_sign_in_at
+            )
+            self._store(updated)
+        self._notify(updated, cached)
+
+    def add_listener(self, listener: Callable[[CachedUser, Optional[CachedUser]], None]):
+        """Call listener(user, previous) whenever a fresh record is stored (previous is None if uncached)"""
+        self._listeners.append(listener)
+
+    def _notify(self, user: CachedUser, previous: Optional[CachedUser]):
+        """Run the listeners in order on the listener thread (they may do blocking I/O)"""
+        if self._listeners:
+            self._listener_executor.submit(self._run_listeners, user, previous)
+
+    def _run_listeners(self, user: CachedUser, previous: Optional[CachedUser]):
+        for listener in self._listeners:
+            try:
+                listener(user, previous)
+            except Exception as e:
+                logger.warning(f"⚠️ User cache listener failed for {user.id}: {e}")
+
+    def invalidate(self, user_id: str):
+        """Drop a user so the next read goes to Supabase"""
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._admins.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._admins.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "cached_users": len(self._users),
+                "cached_admins": len(self._admins),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "ttl_seconds": self.ttl_seconds,
+                "admin_ttl_seconds": self.admin_ttl_seconds
+            }
+
+
+# Global instance
+user_cache = UserMetadataCache()